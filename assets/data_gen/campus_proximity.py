@@ -0,0 +1,170 @@
+"""Distance from every room to the nearest HES-SO campus.
+
+The campus coordinates are the HES-SO entries of institutionCoords in
+lib/services/utils.dart and the distance is the same haversine as
+haversineKm() in the app. Distances to all campuses are computed for a whole
+chunk of rooms in one NumPy pass. populate_firebase.py stores the result on
+every imported room (proximHessoKm, nearestCampus); --backfill does the same
+for rooms already in Firestore and only rewrites the rooms whose values
+changed.
+
+Usage:
+    python campus_proximity.py --rooms synthetic_valais_price.csv   (checks against proxim_hesso_km and times it)
+    python campus_proximity.py --backfill                           (uses firebase-service-account.json)
+    python campus_proximity.py --backfill --fake                    (dry run on the CSV imported in memory)
+"""
+import argparse
+import csv
+import itertools
+import math
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from firestore_writer import BatchWriter, InMemoryFirestore, MAX_BATCH_SIZE
+
+CAMPUSES = {
+    'HES-SO Valais-Wallis (Sion - HEI, ingénierie)': (46.226395, 7.359848),
+    'HES-SO Valais-Wallis (Sion - HEdS, santé)': (46.22518, 7.37132),
+    'HES-SO Valais-Wallis (Sierre - HEG, gestion)': (46.29305, 7.53645),
+    'HEdS - Filière Physiothérapie (Loèche-les-Bains)': (46.37806, 7.62722),
+}
+EARTH_RADIUS_KM = 6371.0
+PROXIM_FIELD = "proximHessoKm"  # same field as price_model.PROXIM_FIELD
+CAMPUS_FIELD = "nearestCampus"
+COLLECTION = "rooms"
+
+
+def haversine_km(lat, lng, campus_lat, campus_lng):
+    """Great-circle distance in km, broadcast like NumPy (haversineKm in the app)"""
+    lat, lng = np.radians(lat), np.radians(lng)
+    campus_lat, campus_lng = np.radians(campus_lat), np.radians(campus_lng)
+    h = (np.sin((campus_lat - lat) / 2) ** 2
+         + np.cos(lat) * np.cos(campus_lat) * np.sin((campus_lng - lng) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+
+class CampusIndex:
+    """Campus names and coordinates; nearest() answers for arrays of rooms"""
+
+    def __init__(self, campuses=CAMPUSES):
+        self.names = np.array(list(campuses))
+        coords = np.array(list(campuses.values()), dtype=np.float64)
+        self.lat, self.lng = coords[:, 0], coords[:, 1]
+
+    def distances(self, lat, lng):
+        """(rooms, campuses) matrix of distances in km"""
+        lat = np.asarray(lat, dtype=np.float64)[:, None]
+        lng = np.asarray(lng, dtype=np.float64)[:, None]
+        return haversine_km(lat, lng, self.lat, self.lng)
+
+    def nearest(self, lat, lng):
+        """(campus names, distances in km) of the nearest campus of every room"""
+        distances = self.distances(np.atleast_1d(lat), np.atleast_1d(lng))
+        idx = distances.argmin(axis=1)
+        return self.names[idx], distances[np.arange(len(idx)), idx]
+
+
+def campus_fields(index, lat, lng):
+    """{proximHessoKm, nearestCampus} per room, None where the coordinates are missing"""
+    lat, lng = np.asarray(lat, dtype=np.float64), np.asarray(lng, dtype=np.float64)
+    found = [None] * len(lat)
+    valid = np.flatnonzero(np.isfinite(lat) & np.isfinite(lng))
+    if len(valid):
+        names, km = index.nearest(lat[valid], lng[valid])
+        for i, name, distance in zip(valid.tolist(), names.tolist(), np.round(km, 2).tolist()):
+            found[i] = {PROXIM_FIELD: distance, CAMPUS_FIELD: name}
+    return found
+
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) else float('nan')
+
+
+def proximity_updates(index, snapshots, chunk_size=10_000, stats=None):
+    """Yield (doc_id, fields) for the rooms whose stored campus fields differ from the computed ones"""
+    snapshots = iter(snapshots)
+    for chunk in iter(lambda: list(itertools.islice(snapshots, chunk_size)), []):
+        rooms = [snapshot.to_dict() for snapshot in chunk]
+        lat = [_number(room.get('lat')) for room in rooms]
+        lng = [_number(room.get('lng')) for room in rooms]
+        for snapshot, room, fields in zip(chunk, rooms, campus_fields(index, lat, lng)):
+            stats["scanned"] += 1
+            if fields is None:
+                stats["no_coordinates"] += 1
+                continue
+            stored = room.get(PROXIM_FIELD)
+            if (room.get(CAMPUS_FIELD) == fields[CAMPUS_FIELD] and isinstance(stored, (int, float))
+                    and math.isclose(stored, fields[PROXIM_FIELD], abs_tol=0.005)):
+                stats["unchanged"] += 1
+                continue
+            yield snapshot.id, fields
+
+
+def backfill(db, index=None, batch_size=MAX_BATCH_SIZE, concurrency=4):
+    """Add or fix the campus fields of every room in Firestore; writes only the changed rooms"""
+    stats = {"scanned": 0, "unchanged": 0, "no_coordinates": 0}
+    writer = BatchWriter(db, COLLECTION, batch_size=batch_size, concurrency=concurrency, merge=True)
+    start = time.perf_counter()
+    written = writer.write(proximity_updates(index or CampusIndex(), db.collection(COLLECTION).stream(), stats=stats))
+    seconds = time.perf_counter() - start
+    print(f"🎓 {stats['scanned']} rooms scanned in {seconds:.1f}s: {written['written']} updated, "
+          f"{stats['unchanged']} unchanged, {stats['no_coordinates']} without coordinates, {written['failed']} failed")
+    return {**stats, **written}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", default="synthetic_valais_price.csv", help="CSV with latitude/longitude columns")
+    parser.add_argument("--repeat", type=int, default=200, help="tile the rooms this many times for timing")
+    parser.add_argument("--backfill", action="store_true", help="update the rooms collection instead")
+    parser.add_argument("--fake", action="store_true", help="with --backfill: in-memory rooms imported from --rooms")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE, help="Firestore writes per batch")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    index = CampusIndex()
+    if args.backfill:
+        if args.fake:
+            import populate_firebase
+            db = InMemoryFirestore()
+            with tempfile.TemporaryDirectory() as tmp:
+                populate_firebase.populate_firebase(db, csv_file=args.rooms,
+                                                    checkpoint_file=os.path.join(tmp, "checkpoint.json"))
+            # simulate rooms imported before the campus fields existed
+            for data in itertools.islice(db.collections[COLLECTION].values(), 0, None, 2):
+                data.pop(PROXIM_FIELD, None)
+                data.pop(CAMPUS_FIELD, None)
+        else:
+            from populate_firebase import init_firestore
+            db = init_firestore()
+        backfill(db, index, args.batch_size, args.concurrency)
+        if args.fake:
+            backfill(db, index, args.batch_size, args.concurrency)  # nothing left to write
+        return
+
+    with open(args.rooms, "r", encoding="utf-8", newline="") as f:
+        rooms = list(csv.DictReader(f))
+    lat = np.array([float(r["latitude"]) for r in rooms])
+    lng = np.array([float(r["longitude"]) for r in rooms])
+    _, km = index.nearest(lat, lng)
+    error = np.abs(km - np.array([float(r["proxim_hesso_km"]) for r in rooms]))
+    print(f"🎓 {len(rooms)} rooms: |distance - proxim_hesso_km| mean {error.mean():.2f} km, max {error.max():.2f} km")
+
+    lat, lng = np.tile(lat, args.repeat), np.tile(lng, args.repeat)
+    start = time.perf_counter()
+    index.nearest(lat, lng)
+    numpy_s = time.perf_counter() - start
+    sample = min(len(lat), 20_000)
+    start = time.perf_counter()
+    for la, lo in zip(lat[:sample].tolist(), lng[:sample].tolist()):
+        min(CAMPUSES, key=lambda name: haversine_km(la, lo, *CAMPUSES[name]))
+    loop_s = (time.perf_counter() - start) / sample * len(lat)
+    print(f"numpy: {len(lat)} rooms in {numpy_s:.3f}s ({len(lat) / numpy_s:,.0f} rooms/s)")
+    print(f"loop:  {len(lat)} rooms in {loop_s:.3f}s ({len(lat) / loop_s:,.0f} rooms/s, extrapolated from {sample})")
+
+
+if __name__ == "__main__":
+    main()
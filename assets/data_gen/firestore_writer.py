@@ -0,0 +1,359 @@
+"""Bulk Firestore writes for the population scripts.
+
+BatchWriter groups documents into Firestore write batches (at most 500
+writes each, the Firestore limit) and commits several batches at once from a
+small thread pool, retrying transient failures with exponential backoff.
+
+ImportCheckpoint records which CSV rows have been committed so an
+interrupted import can resume where it stopped.
+
+InMemoryFirestore is a stand-in client with the subset of the Firestore API
+used here, for dry runs and tests without credentials. The scripts also work
+against the Firestore emulator: set FIRESTORE_EMULATOR_HOST=localhost:8080
+and the Admin SDK talks to it instead of the real project.
+"""
+import bisect
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+MAX_BATCH_SIZE = 500  # Firestore rejects batches with more writes
+
+try:
+    from google.api_core import exceptions as api_exceptions
+    RETRYABLE_ERRORS = (
+        api_exceptions.Aborted,
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.InternalServerError,
+        api_exceptions.ResourceExhausted,
+        api_exceptions.ServiceUnavailable,
+        ConnectionError,
+    )
+except ImportError:
+    RETRYABLE_ERRORS = (ConnectionError,)
+
+
+class TransientError(ConnectionError):
+    """Retryable failure raised by InMemoryFirestore when asked to simulate errors"""
+
+
+class BatchWriter:
+    """Writes (doc_id, data) pairs to one collection with concurrent batch commits"""
+
+    def __init__(self, db, collection, batch_size=MAX_BATCH_SIZE, concurrency=4,
+                 max_retries=5, base_delay=0.5, max_delay=30.0, on_commit=None, merge=False, keep_fields=()):
+        if not 1 <= batch_size <= MAX_BATCH_SIZE:
+            raise ValueError(f"batch_size must be between 1 and {MAX_BATCH_SIZE}, got {batch_size}")
+        self.db = db
+        self.collection = collection
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_commit = on_commit  # called with (batch_number, doc_ids) after each successful commit
+        self.merge = merge  # update the given fields of existing documents instead of replacing them
+        self.keep_fields = tuple(keep_fields)  # fields an existing document keeps, e.g. createdAt
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.retries = 0
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def _commit(self, number, docs):
+        """Commit one batch, retrying transient errors; returns the number of documents written"""
+        collection = self.db.collection(self.collection)
+        for attempt in range(self.max_retries + 1):
+            try:
+                batch = self.db.batch()
+                for doc_id, data in self._keep_existing(collection, docs):
+                    batch.set(collection.document(doc_id) if doc_id else collection.document(), data, merge=self.merge)
+                batch.commit()
+                break
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    print(f"Batch {number} failed after {attempt + 1} attempts: {e}")
+                    with self._lock:
+                        self.failed += len(docs)
+                    return 0
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+                with self._lock:
+                    self.retries += 1
+                time.sleep(delay)
+            except Exception as e:
+                print(f"Batch {number} failed: {e}")
+                with self._lock:
+                    self.failed += len(docs)
+                return 0
+
+        with self._lock:
+            self.written += len(docs)
+            self.batches += 1
+        if self.on_commit is not None:
+            self.on_commit(number, [doc_id for doc_id, _ in docs])
+        return len(docs)
+
+    def _keep_existing(self, collection, docs):
+        """docs with keep_fields replaced by the values of the documents that already exist (one read per batch)"""
+        if not self.keep_fields:
+            return docs
+        references = [collection.document(doc_id) for doc_id, _ in docs if doc_id]
+        existing = {
+            snapshot.id: snapshot.to_dict()
+            for snapshot in self.db.get_all(references, field_paths=list(self.keep_fields)) if snapshot.exists
+        }
+        kept = []
+        for doc_id, data in docs:
+            old = existing.get(doc_id)
+            if old:
+                data = {**data, **{field: old[field] for field in self.keep_fields if field in old}}
+            kept.append((doc_id, data))
+        return kept
+
+    def write(self, docs, progress_every=5000):
+        """Write every (doc_id, data) of the iterable; doc_id None lets Firestore pick one.
+
+        At most `concurrency` batches are in flight, so the iterable is consumed
+        lazily and large imports never sit in memory. Returns stats().
+        """
+        start = time.perf_counter()
+        docs = iter(docs)
+        pending = set()
+        next_report = progress_every
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for number in itertools.count(1):
+                chunk = list(itertools.islice(docs, self.batch_size))
+                if not chunk:
+                    break
+                if len(pending) >= self.concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(pool.submit(self._commit, number, chunk))
+                if progress_every and self.written >= next_report:
+                    print(f"Written {self.written} documents ({self._rate(start):.0f} docs/s)")
+                    next_report += progress_every
+            for future in pending:
+                future.result()
+        self.elapsed += time.perf_counter() - start
+        return self.stats()
+
+    def _rate(self, start):
+        return self.written / max(time.perf_counter() - start, 1e-9)
+
+    def stats(self):
+        return {
+            "written": self.written,
+            "failed": self.failed,
+            "batches": self.batches,
+            "retries": self.retries,
+            "seconds": round(self.elapsed, 3),
+            "docs_per_second": round(self.written / self.elapsed, 1) if self.elapsed else 0.0,
+        }
+
+
+# -------------------------------
+# Resumable imports
+# -------------------------------
+class ImportCheckpoint:
+    """Committed source-row offsets of an import, persisted as JSON after every commit.
+
+    Offsets are stored as merged [start, end) ranges, so a finished import of
+    any size is a single range. Batches commit out of order; track() remembers
+    the offsets of documents still in flight and on_commit() (the BatchWriter
+    hook) moves them to the committed ranges. The file is replaced atomically,
+    so a crash leaves either the previous or the new checkpoint.
+    """
+
+    def __init__(self, path, source, seed, ranges=None):
+        self.path = path
+        self.source = source
+        self.seed = seed
+        self.ranges = [list(r) for r in ranges or []]
+        self._in_flight = {}  # doc_id -> [offsets]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, source, seed):
+        """Checkpoint at `path`, or an empty one if the file does not exist"""
+        if not path or not os.path.exists(path):
+            return cls(path, source, seed)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("source") != source or data.get("seed") != seed:
+            raise ValueError(
+                f"Checkpoint {path} belongs to source={data.get('source')!r} seed={data.get('seed')!r}, "
+                f"not source={source!r} seed={seed!r}"
+            )
+        return cls(path, source, seed, data.get("committed"))
+
+    @property
+    def committed(self):
+        return sum(end - start for start, end in self.ranges)
+
+    def done(self, offset):
+        with self._lock:
+            i = bisect.bisect_right(self.ranges, [offset, float("inf")]) - 1
+            return i >= 0 and self.ranges[i][0] <= offset < self.ranges[i][1]
+
+    def track(self, docs):
+        """Pass (offset, doc_id, data) through as (doc_id, data), remembering the offsets"""
+        for offset, doc_id, data in docs:
+            with self._lock:
+                self._in_flight.setdefault(doc_id, []).append(offset)
+            yield doc_id, data
+
+    def on_commit(self, number, doc_ids):
+        with self._lock:
+            offsets = [offset for doc_id in doc_ids for offset in self._in_flight.pop(doc_id, [])]
+        self.mark(offsets)
+
+    def mark(self, offsets):
+        with self._lock:
+            for offset in offsets:
+                self._add(offset)
+            self._save()
+
+    def _add(self, offset):
+        i = bisect.bisect_right(self.ranges, [offset, float("inf")])
+        if i and self.ranges[i - 1][1] >= offset + 1:
+            return  # already committed
+        if i and self.ranges[i - 1][1] == offset:
+            self.ranges[i - 1][1] = offset + 1
+        else:
+            self.ranges.insert(i, [offset, offset + 1])
+            i += 1
+        # merge with the following range if the gap closed
+        if i < len(self.ranges) and self.ranges[i - 1][1] == self.ranges[i][0]:
+            self.ranges[i - 1][1] = self.ranges.pop(i)[1]
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "seed": self.seed, "committed": self.ranges}, f)
+        os.replace(tmp, self.path)
+
+
+# -------------------------------
+# In-memory stand-in for firestore.client()
+# -------------------------------
+class InMemoryFirestore:
+    """Dict-backed client: collection().document().set(), batch(), get_all() and get()/stream().
+
+    `latency` (seconds) is slept on every round trip (set or commit) and
+    `failure_rate` makes that fraction of round trips raise TransientError,
+    to exercise the retry path.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.collections = {}  # name -> {doc_id: data}
+        self.round_trips = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+            fail = self._random.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise TransientError("simulated transient failure")
+
+    def _store(self, collection, doc_id, data, merge):
+        """Caller holds the lock"""
+        documents = self.collections[collection]
+        if merge and doc_id in documents:
+            documents[doc_id] = {**documents[doc_id], **data}
+        else:
+            documents[doc_id] = data
+
+    def collection(self, name):
+        with self._lock:
+            self.collections.setdefault(name, {})
+        return _Collection(self, name)
+
+    def batch(self):
+        return _Batch(self)
+
+    def get_all(self, references, field_paths=None):
+        """Snapshots of several documents in one round trip; field_paths limits the returned fields"""
+        self._round_trip()
+        with self._lock:
+            found = [(reference.id, self.collections[reference._collection].get(reference.id))
+                     for reference in references]
+        for doc_id, data in found:
+            if data is not None and field_paths is not None:
+                data = {field: data[field] for field in field_paths if field in data}
+            yield _Snapshot(doc_id, data)
+
+
+class _Collection:
+    def __init__(self, client, name):
+        self._client = client
+        self.id = name
+
+    def document(self, doc_id=None):
+        return _Document(self._client, self.id, doc_id or uuid.uuid4().hex[:20])
+
+    def stream(self):
+        with self._client._lock:
+            items = list(self._client.collections[self.id].items())
+        return [_Snapshot(doc_id, data) for doc_id, data in items]
+
+
+class _Document:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+
+    def set(self, data, merge=False):
+        self._client._round_trip()
+        with self._client._lock:
+            self._client._store(self._collection, self.id, dict(data), merge)
+
+    def get(self, field_paths=None):
+        with self._client._lock:
+            data = self._client.collections[self._collection].get(self.id)
+        if data is not None and field_paths is not None:
+            data = {field: data[field] for field in field_paths if field in data}
+        return _Snapshot(self.id, data)
+
+
+class _Snapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class _Batch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        if len(self._writes) >= MAX_BATCH_SIZE:
+            raise ValueError(f"Firestore batches are limited to {MAX_BATCH_SIZE} writes")
+        self._writes.append((reference, dict(data), merge))
+
+    def commit(self):
+        # all-or-nothing like Firestore: a failed commit writes nothing
+        self._client._round_trip()
+        with self._client._lock:
+            for reference, data, merge in self._writes:
+                self._client._store(reference._collection, reference.id, data, merge)
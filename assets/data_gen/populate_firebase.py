@@ -1,19 +1,38 @@
+import argparse
 import csv
+import hashlib
+import itertools
 import random
+import time
 import firebase_admin
 from firebase_admin import credentials, firestore
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import json
+import numpy as np
+import os
+
+from firestore_writer import BatchWriter, ImportCheckpoint, InMemoryFirestore, MAX_BATCH_SIZE
+from synthetic_generator import ListingModel, iter_rows
+from transport_stops import STOPS_CSV, StopIndex, walk_minutes
+from campus_proximity import CampusIndex, campus_fields
 
 # Configuration
 OWNER_UID = "aeVihIkzCzWVfunVtkpeZdcL5aJ3"
 CSV_FILE = "synthetic_valais_price.csv"
-
-# Initialize Firebase Admin SDK
+COLLECTION = "rooms"
 # Firebase service account key JSON file path
-cred = credentials.Certificate("firebase-service-account.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+SERVICE_ACCOUNT_FILE = "firebase-service-account.json"
+# Availability ranges are generated around this day (--reference-date), not
+# around today, so an import run again or resumed rebuilds the same documents
+REFERENCE_DATE = date(2025, 9, 1)
+# Fields an existing room keeps when an import writes it again
+CREATE_ONLY_FIELDS = ("createdAt",)
+
+def init_firestore(service_account_file=SERVICE_ACCOUNT_FILE):
+    """Initialize Firebase Admin SDK and return the Firestore client"""
+    cred = credentials.Certificate(service_account_file)
+    firebase_admin.initialize_app(cred)
+    return firestore.client()
 
 # Sample data for generating realistic properties
 PROPERTY_TITLES = [
@@ -111,9 +130,13 @@ def generate_street_name(city):
         ]
         return random.choice(default_streets)
 
-def generate_availability_ranges():
-    """Generate realistic availability ranges (mix of past and future dates)"""
-    now = datetime.now()
+def month_start(day, months):
+    """First day of the month `months` months after (negative: before) the month of `day`"""
+    month = day.month - 1 + months
+    return datetime(day.year + month // 12, month % 12 + 1, 1)
+
+def generate_availability_ranges(reference_date=REFERENCE_DATE):
+    """Generate realistic availability ranges (mix of dates before and after reference_date)"""
     ranges = []
 
     # Generate 3-4 availability ranges
@@ -121,19 +144,11 @@ def generate_availability_ranges():
         if j < 2:
             # Past dates (for realistic reviews)
             past_months = random.randint(1, 6)
-            start_month = now.month - past_months
-            start_year = now.year
-
-            if start_month <= 0:
-                start_month += 12
-                start_year -= 1
-
-            start_date = datetime(start_year, start_month, 1 + random.randint(0, 20))
+            start_date = month_start(reference_date, -past_months) + timedelta(days=random.randint(0, 20))
             end_date = start_date + timedelta(days=15 + random.randint(0, 30))
         else:
             # Future dates (for current availability)
-            start_month = now.month + 1 + (j - 2) * 2
-            start_date = datetime(now.year, start_month, 1 + random.randint(0, 15))
+            start_date = month_start(reference_date, 1 + (j - 2) * 2) + timedelta(days=random.randint(0, 15))
             end_date = start_date + timedelta(days=30 + random.randint(0, 60))
 
         ranges.append({
@@ -166,81 +181,253 @@ def generate_photo_urls():
         'https://images.unsplash.com/photo-1560448204-603b3fc33ddc?w=500',
     ]
 
-def populate_firebase():
-    """Main function to populate Firebase with properties from CSV"""
-    print(f"Starting to populate Firebase with properties for owner: {OWNER_UID}")
+def build_property(row, stop=None, campus=None, reference_date=REFERENCE_DATE):
+    """Create the room document for one CSV row.
 
-    with open(CSV_FILE, 'r', encoding='utf-8') as file:
+    stop is (stop id, distance in m) of its nearest stop, campus the
+    {proximHessoKm, nearestCampus} fields of its nearest HES-SO campus.
+    createdAt is the write time; the writers keep the value of a room
+    that already exists (CREATE_ONLY_FIELDS).
+    """
+    # Generate random property data
+    title = random.choice(PROPERTY_TITLES)
+    description = random.choice(PROPERTY_DESCRIPTIONS)
+    street_name = generate_street_name(row['city'])
+    house_number = str(random.randint(1, 50))
+
+    # Calculate walk time from the nearest stop, or from the CSV distance
+    if stop is not None:
+        walk_mins = walk_minutes(stop[1])
+    else:
+        walk_mins = int(float(row['dist_public_transport_km']) * 1000 / 80)  # 80m/min walking speed
+
+    # Generate amenities
+    amenities = generate_amenities(row)
+
+    # Generate availability ranges
+    availability_ranges = generate_availability_ranges(reference_date)
+
+    # Generate photo URLs
+    photo_urls = generate_photo_urls()
+
+    # Create property document
+    property_data = {
+        'title': title,
+        'price': float(row['price_chf']),
+        'street': street_name,
+        'houseNumber': house_number,
+        'city': row['city'],
+        'postcode': row['postal_code'],
+        'country': 'Switzerland',
+        'description': description,
+        'lat': float(row['latitude']),
+        'lng': float(row['longitude']),
+        'ownerUid': OWNER_UID,
+        'photoUrls': photo_urls,
+        'walkMins': walk_mins,
+        'type': 'whole' if row['type'] == 'entire_home' else 'room',
+        'furnished': row['is_furnished'] == 'True',
+        'sizeSqm': int(float(row['surface_m2'])),
+        'rooms': int(float(row['num_rooms'])),
+        'bathrooms': random.randint(1, 2),
+        'utilitiesIncluded': row['charges_incl'] == 'True',
+        'internetMbps': int(50 + random.randint(0, 150)) if row['wifi_incl'] == 'True' else None,
+        'availabilityRanges': availability_ranges,
+        'amenities': amenities,
+        'status': 'active',
+        'createdAt': firestore.SERVER_TIMESTAMP,
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+    }
+    if stop is not None:
+        property_data['nearestStopId'] = stop[0]
+    if campus is not None:
+        property_data.update(campus)
+    return property_data
+
+def document_id(row, seed=0):
+    """Deterministic 20-character document ID from the row content and the seed"""
+    payload = json.dumps([seed, row], sort_keys=True).encode('utf-8')
+    return hashlib.blake2b(payload, digest_size=10).hexdigest()
+
+def read_rows(csv_file, limit=None):
+    """Yield (offset, row) for the CSV data rows, offset counting from 0"""
+    with open(csv_file, 'r', encoding='utf-8', newline='') as file:
         reader = csv.DictReader(file)
+        for offset, row in enumerate(reader):
+            if limit is not None and offset >= limit:
+                break
+            yield offset, row
 
-        for i, row in enumerate(reader):
-            try:
-                # Generate random property data
-                title = random.choice(PROPERTY_TITLES)
-                description = random.choice(PROPERTY_DESCRIPTIONS)
-                street_name = generate_street_name(row['city'])
-                house_number = str(random.randint(1, 50))
-
-                # Calculate walk time from distance
-                walk_mins = int(float(row['dist_public_transport_km']) * 1000 / 80)  # 80m/min walking speed
-
-                # Generate amenities
-                amenities = generate_amenities(row)
-
-                # Generate availability ranges
-                availability_ranges = generate_availability_ranges()
-
-                # Generate photo URLs
-                photo_urls = generate_photo_urls()
-
-                # Create property document
-                property_data = {
-                    'title': title,
-                    'price': float(row['price_chf']),
-                    'street': street_name,
-                    'houseNumber': house_number,
-                    'city': row['city'],
-                    'postcode': row['postal_code'],
-                    'country': 'Switzerland',
-                    'description': description,
-                    'lat': float(row['latitude']),
-                    'lng': float(row['longitude']),
-                    'ownerUid': OWNER_UID,
-                    'photoUrls': photo_urls,
-                    'walkMins': walk_mins,
-                    'type': 'whole' if row['type'] == 'entire_home' else 'room',
-                    'furnished': row['is_furnished'] == 'True',
-                    'sizeSqm': int(float(row['surface_m2'])),
-                    'rooms': int(float(row['num_rooms'])),
-                    'bathrooms': random.randint(1, 2),
-                    'utilitiesIncluded': row['charges_incl'] == 'True',
-                    'internetMbps': int(50 + random.randint(0, 150)) if row['wifi_incl'] == 'True' else None,
-                    'availabilityRanges': availability_ranges,
-                    'amenities': amenities,
-                    'status': 'active',
-                    'createdAt': firestore.SERVER_TIMESTAMP,
-                    'updatedAt': firestore.SERVER_TIMESTAMP,
-                }
-
-                # Add to Firestore
-                doc_ref = db.collection('rooms').document()
-                doc_ref.set(property_data)
-
-                print(f"Created property {i+1}: {title} in {row['city']}")
+def nearest_stops(rows, stops):
+    """(stop id, distance in m) per row, looked up for the whole chunk at once; None without coordinates"""
+    if stops is None:
+        return [None] * len(rows)
+    coords = np.array([[_coordinate(row, 'latitude'), _coordinate(row, 'longitude')] for _, row in rows])
+    found = [None] * len(rows)
+    valid = np.flatnonzero(np.isfinite(coords).all(axis=1))
+    if len(valid):
+        ids, distances = stops.nearest(coords[valid, 0], coords[valid, 1])
+        for i, stop_id, distance in zip(valid.tolist(), ids.tolist(), distances.tolist()):
+            found[i] = (stop_id, distance)
+    return found
+
+def _coordinate(row, key):
+    try:
+        return float(row[key])
+    except (KeyError, TypeError, ValueError):
+        return float('nan')
 
+def to_documents(rows, seed=0, stops=None, chunk_size=10_000, reference_date=REFERENCE_DATE):
+    """Yield (offset, doc_id, property_data); the generated fields are seeded per document"""
+    rows = iter(rows)
+    campuses = CampusIndex()
+    for chunk in iter(lambda: list(itertools.islice(rows, chunk_size)), []):
+        nearest_campuses = campus_fields(campuses, [_coordinate(row, 'latitude') for _, row in chunk],
+                                         [_coordinate(row, 'longitude') for _, row in chunk])
+        for (offset, row), stop, campus in zip(chunk, nearest_stops(chunk, stops), nearest_campuses):
+            doc_id = document_id(row, seed)
+            random.seed(doc_id)  # reruns rebuild the same document, not just the same ID
+            try:
+                yield offset, doc_id, build_property(row, stop, campus, reference_date)
             except Exception as e:
-                print(f"Error creating property {i+1}: {e}")
+                print(f"Error creating property {offset+1}: {e}")
                 continue
 
-    print(f"Successfully populated Firebase with properties for owner: {OWNER_UID}")
+def populate_sequential(db, properties, progress_every=100, on_commit=None):
+    """One set() round trip per document, the original import path (kept for comparison)"""
+    start = time.perf_counter()
+    written = failed = 0
+    collection = db.collection(COLLECTION)
+    for i, (doc_id, property_data) in enumerate(properties):
+        try:
+            doc_ref = collection.document(doc_id) if doc_id else collection.document()
+            if doc_id:
+                existing = doc_ref.get(field_paths=list(CREATE_ONLY_FIELDS))
+                if existing.exists:
+                    property_data = {**property_data, **existing.to_dict()}
+            doc_ref.set(property_data)
+            written += 1
+        except Exception as e:
+            print(f"Error writing property {i+1}: {e}")
+            failed += 1
+            continue
+        if on_commit is not None:
+            on_commit(i + 1, [doc_id])
+        if written % progress_every == 0:
+            print(f"Created {written} properties")
+    seconds = time.perf_counter() - start
+    return {
+        "written": written,
+        "failed": failed,
+        "seconds": round(seconds, 3),
+        "docs_per_second": round(written / seconds, 1) if seconds else 0.0,
+    }
+
+def populate_firebase(db, mode="batch", csv_file=CSV_FILE, batch_size=MAX_BATCH_SIZE, concurrency=4, limit=None,
+                      seed=0, checkpoint_file=None, resume=False, synthetic=None, stops_file=None,
+                      reference_date=REFERENCE_DATE):
+    """Main function to populate Firebase with properties from CSV.
+
+    Document IDs derive from the row content and `seed` and the generated
+    fields from the document ID and `reference_date`, so rerunning an import
+    overwrites the same rooms with the same content instead of duplicating
+    them; rooms that already exist keep their createdAt. Committed rows are
+    recorded in `checkpoint_file` (default: <csv>.checkpoint.json) and
+    `resume=True` skips them. With `synthetic=N` the rows are N listings sampled
+    from distributions fitted on the CSV (synthetic_generator.py) instead of the
+    CSV rows themselves. With `stops_file` (PointExploitation.csv) walkMins and
+    nearestStopId come from the nearest stop instead of the CSV distance column.
+    Every room also gets proximHessoKm and nearestCampus (campus_proximity.py).
+    """
+    print(f"Starting to populate Firebase with properties for owner: {OWNER_UID}")
+
+    source = os.path.basename(csv_file)
+    if synthetic:
+        source = f"{source}+synthetic:{synthetic}"
+    if reference_date != REFERENCE_DATE:
+        source = f"{source}@{reference_date.isoformat()}"  # resuming with other dates would mix two imports
+    checkpoint_file = checkpoint_file or f"{csv_file}{'.synthetic' if synthetic else ''}.checkpoint.json"
+    if resume:
+        checkpoint = ImportCheckpoint.load(checkpoint_file, source, seed)
+        print(f"Resuming from {checkpoint_file}: {checkpoint.committed} rows already committed")
+    else:
+        checkpoint = ImportCheckpoint(checkpoint_file, source, seed)
+
+    if synthetic:
+        rows = iter_rows(ListingModel.fit(csv_file), synthetic, seed)
+        rows = itertools.islice(rows, limit) if limit is not None else rows
+    else:
+        rows = read_rows(csv_file, limit)
+    rows = (item for item in rows if not checkpoint.done(item[0]))
+    stops = None
+    if stops_file:
+        stops = StopIndex(stops_file)
+        print(f"Loaded {len(stops.ids)} transport stops from {stops_file}")
+    properties = checkpoint.track(to_documents(rows, seed, stops, reference_date=reference_date))
+    if mode == "sequential":
+        stats = populate_sequential(db, properties, on_commit=checkpoint.on_commit)
+    else:
+        writer = BatchWriter(db, COLLECTION, batch_size=batch_size, concurrency=concurrency,
+                             on_commit=checkpoint.on_commit, keep_fields=CREATE_ONLY_FIELDS)
+        stats = writer.write(properties)
+
+    print(f"Successfully populated Firebase with {stats['written']} properties for owner: {OWNER_UID} "
+          f"({stats['docs_per_second']} rows/s, {stats['failed']} failed, "
+          f"{checkpoint.committed} rows committed in {checkpoint_file})")
+    return stats
+
+def parse_args(service_account=SERVICE_ACCOUNT_FILE):
+    parser = argparse.ArgumentParser(description="Populate the Firestore rooms collection from the synthetic CSV")
+    parser.add_argument("--service-account", default=service_account,
+                        help=f"Firebase service account key JSON file (default: {service_account})")
+    parser.add_argument("--csv", default=CSV_FILE, help="CSV file to import")
+    parser.add_argument("--mode", choices=("batch", "sequential"), default="batch",
+                        help="batch: concurrent batched commits, sequential: one write per row")
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE,
+                        help=f"documents per batch (max {MAX_BATCH_SIZE})")
+    parser.add_argument("--concurrency", type=int, default=4, help="batches committed in parallel")
+    parser.add_argument("--limit", type=int, help="only import the first N rows")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for document IDs and generated fields (same seed = same documents)")
+    parser.add_argument("--reference-date", type=date.fromisoformat, default=REFERENCE_DATE,
+                        help=f"YYYY-MM-DD the availability ranges are generated around (default: {REFERENCE_DATE})")
+    parser.add_argument("--synthetic", type=int, metavar="N",
+                        help="import N synthetic listings fitted on the CSV instead of the CSV rows")
+    parser.add_argument("--stops", default=STOPS_CSV,
+                        help="PointExploitation.csv used to compute walkMins and nearestStopId")
+    parser.add_argument("--no-stops", action="store_true",
+                        help="derive walkMins from the CSV dist_public_transport_km column instead")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <csv>.checkpoint.json)")
+    parser.add_argument("--resume", action="store_true", help="skip the rows committed in the checkpoint")
+    parser.add_argument("--fake", action="store_true",
+                        help="write to an in-memory stand-in instead of Firebase (dry run, no credentials)")
+    parser.add_argument("--fake-latency", type=float, default=0.0,
+                        help="simulated seconds per round trip with --fake")
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0,
+                        help="fraction of simulated round trips that fail with --fake")
+    args = parser.parse_args()
+    if not 1 <= args.batch_size <= MAX_BATCH_SIZE:
+        parser.error(f"--batch-size must be between 1 and {MAX_BATCH_SIZE}")
+    return args
+
+def main(service_account=SERVICE_ACCOUNT_FILE):
+    """Command line entry point, also used by the populate_firebase.py wrapper at the repository root"""
+    args = parse_args(service_account)
 
-if __name__ == "__main__":
     # Instructions for setup
     print("SETUP INSTRUCTIONS:")
-    print("1. Firebase service account key is already configured at: assets/face-api_server")
+    print(f"1. Firebase service account key: {args.service_account} (--service-account to change it)")
     print("2. Make sure the CSV file is in the same directory")
-    print("3. Run: python populate_firebase.py")
+    print("3. Run: python populate_firebase.py (--fake for a dry run, --help for options)")
     print()
 
-    # Uncomment the line below to run the population
-    populate_firebase()
+    if args.fake:
+        db = InMemoryFirestore(latency=args.fake_latency, failure_rate=args.fake_failure_rate)
+    else:
+        db = init_firestore(args.service_account)
+    populate_firebase(db, args.mode, args.csv, args.batch_size, args.concurrency, args.limit,
+                      args.seed, args.checkpoint, args.resume, args.synthetic,
+                      None if args.no_stops else args.stops, args.reference_date)
+
+if __name__ == "__main__":
+    main()
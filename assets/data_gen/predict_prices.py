@@ -0,0 +1,123 @@
+"""Bulk price prediction with ss2_unistay_price.tflite.
+
+Scores every row of a CSV, or every room of the Firestore collection, in
+batches (price_model.PricePredictor from assets/face-api_server, the same
+12 features as the app's PricePredictionService) and, for Firestore, writes
+`predictedPrice` back with merged batch writes. Rooms whose stored
+prediction is already within 0.01 CHF are not rewritten, rooms missing a
+field the model needs (price_model.REQUIRED_FIELDS) are skipped and counted.
+
+Usage:
+    python predict_prices.py --csv synthetic_valais_price.csv [--out scored.csv]
+    python predict_prices.py --firestore            (uses firebase-service-account.json)
+    python predict_prices.py --firestore --fake     (dry run on rooms imported from the CSV in memory)
+"""
+import argparse
+import csv
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "face-api_server"))
+
+from price_model import PricePredictor, features_from_csv, features_from_rooms, invalid_fields
+from firestore_writer import BatchWriter, InMemoryFirestore, MAX_BATCH_SIZE
+
+COLLECTION = "rooms"
+PRICE_FIELD = "predictedPrice"
+
+
+def score_csv(predictor, csv_file, out=None):
+    with open(csv_file, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        fields = reader.fieldnames
+    start = time.perf_counter()
+    columns = {name: [row[name] for row in rows] for name in fields}
+    prices = predictor.predict(features_from_csv(columns))
+    seconds = time.perf_counter() - start
+
+    actual = np.asarray(columns["price_chf"], dtype=np.float64)
+    print(f"💰 {len(rows)} rows scored in {seconds * 1000:.1f} ms ({len(rows) / seconds:,.0f} rows/s), "
+          f"mean absolute error vs price_chf {np.nanmean(np.abs(prices - actual)):.1f} CHF")
+    if out:
+        with open(out, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([*fields, "predicted_price"])
+            for row, price in zip(rows, prices.tolist()):
+                writer.writerow([*(row[name] for name in fields), f"{price:.2f}"])
+        print(f"✅ Written to {out}")
+    return prices
+
+
+def predicted_updates(predictor, snapshots, chunk_size=4096, stats=None):
+    """Yield (doc_id, {predictedPrice}) for the rooms whose prediction changed"""
+    snapshots = iter(snapshots)
+    for chunk in iter(lambda: list(itertools.islice(snapshots, chunk_size)), []):
+        scorable = [(snapshot, snapshot.to_dict()) for snapshot in chunk]
+        scorable = [(snapshot, room) for snapshot, room in scorable if not invalid_fields(room)]
+        stats["invalid"] += len(chunk) - len(scorable)
+        if not scorable:
+            continue
+        prices = predictor.predict(features_from_rooms([room for _, room in scorable]))
+        for (snapshot, room), price in zip(scorable, prices.tolist()):
+            stats["scored"] += 1
+            if price != price:  # NaN, the model could not score this room
+                continue
+            price = round(price, 2)
+            previous = room.get(PRICE_FIELD)
+            if isinstance(previous, (int, float)) and abs(previous - price) < 0.01:
+                stats["unchanged"] += 1
+                continue
+            yield snapshot.id, {PRICE_FIELD: price}
+
+
+def score_firestore(predictor, db, batch_size=MAX_BATCH_SIZE, concurrency=4):
+    stats = {"scored": 0, "unchanged": 0, "invalid": 0}
+    writer = BatchWriter(db, COLLECTION, batch_size=batch_size, concurrency=concurrency, merge=True)
+    start = time.perf_counter()
+    written = writer.write(predicted_updates(predictor, db.collection(COLLECTION).stream(), stats=stats))
+    seconds = time.perf_counter() - start
+    print(f"💰 {stats['scored']} rooms scored in {seconds:.1f}s ({stats['scored'] / max(seconds, 1e-9):,.0f} rooms/s): "
+          f"{written['written']} updated, {stats['unchanged']} unchanged, {stats['invalid']} skipped (missing fields), "
+          f"{written['failed']} failed")
+    return {**stats, **written}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default="synthetic_valais_price.csv", help="CSV to score (or to import with --fake)")
+    parser.add_argument("--out", help="write the scored CSV here")
+    parser.add_argument("--firestore", action="store_true", help="score the rooms collection and write predictedPrice")
+    parser.add_argument("--fake", action="store_true", help="with --firestore: in-memory rooms imported from --csv")
+    parser.add_argument("--model", help="path to ss2_unistay_price.tflite (default: assets/)")
+    parser.add_argument("--max-batch", type=int, default=4096)
+    parser.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE, help="Firestore writes per batch")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    predictor = PricePredictor(args.model, max_batch=args.max_batch)
+    if not args.firestore:
+        score_csv(predictor, args.csv, args.out)
+        return
+
+    if args.fake:
+        import populate_firebase
+        db = InMemoryFirestore()
+        with tempfile.TemporaryDirectory() as tmp:
+            populate_firebase.populate_firebase(db, csv_file=args.csv, checkpoint_file=os.path.join(tmp, "checkpoint.json"))
+    else:
+        from populate_firebase import init_firestore
+        db = init_firestore()
+    score_firestore(predictor, db, args.batch_size, args.concurrency)
+    if args.fake:
+        # a second pass finds nothing to rewrite
+        score_firestore(predictor, db, args.batch_size, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
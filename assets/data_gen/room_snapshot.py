@@ -0,0 +1,432 @@
+"""Export the rooms collection to a local snapshot and import it back.
+
+A snapshot is a fixed copy of the rooms, so a staging or emulator reset
+replays the same documents (same IDs, same fields) instead of generating
+random ones again. Two formats, chosen by the file name:
+- *.ndjson.gz (or *.ndjson): one JSON document per line after a header line,
+  timestamps as {"$date": ISO 8601}. Exact round trip, no extra dependency.
+- *.parquet (needs pyarrow): one typed column per Room field, with
+  availabilityRanges as list<struct<start, end: timestamp>> and amenities and
+  photoUrls as list<string>. Values that do not fit their column (an int
+  price, a server timestamp, fields the Room model does not know) go to a
+  JSON `extra` column, so nothing is lost. Timestamps come back in UTC.
+
+Import checks every room against the Room model of the app
+(lib/models/room.dart): required fields present and every field of the type
+Room.fromFirestore casts it to. By default one invalid room stops the import
+before anything is written; --skip-invalid writes the valid ones. Documents
+are written with concurrent batch commits (firestore_writer.BatchWriter).
+--dry-run reads and validates the snapshot without touching Firestore; with
+--out it writes the validated rooms to another snapshot file instead (e.g.
+NDJSON to Parquet).
+
+Usage:
+    python room_snapshot.py export --out rooms.ndjson.gz         (uses firebase-service-account.json)
+    python room_snapshot.py export --fake --out rooms.parquet    (rooms imported from the CSV in memory)
+    python room_snapshot.py import rooms.ndjson.gz
+    python room_snapshot.py import rooms.ndjson.gz --dry-run --out rooms.parquet
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python room_snapshot.py import rooms.parquet
+"""
+import argparse
+import gzip
+import io
+import itertools
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from firestore_writer import BatchWriter, InMemoryFirestore, MAX_BATCH_SIZE
+
+try:
+    from google.cloud.firestore import SERVER_TIMESTAMP
+except ImportError:
+    SERVER_TIMESTAMP = None
+
+COLLECTION = "rooms"
+SNAPSHOT_FORMAT = "unistay-rooms-snapshot"
+SNAPSHOT_VERSION = 1
+
+NUMBER = (int, float)
+STRINGS = "list of strings"
+RANGES = "list of {start, end} timestamps"
+TIMESTAMP = "timestamp"
+
+# Room.fromFirestore: field -> (type it is cast to, required for a usable listing)
+ROOM_FIELDS = {
+    "title": (str, True),
+    "price": (NUMBER, True),
+    "street": (str, False),
+    "houseNumber": (str, False),
+    "city": (str, True),
+    "postcode": (str, True),
+    "country": (str, False),
+    "description": (str, False),
+    "lat": (NUMBER, True),
+    "lng": (NUMBER, True),
+    "ownerUid": (str, True),
+    "photoUrls": (STRINGS, False),
+    "walkMins": (int, False),
+    "type": (str, False),
+    "furnished": (bool, False),
+    "sizeSqm": (int, False),
+    "rooms": (int, False),
+    "bathrooms": (int, False),
+    "utilitiesIncluded": (bool, False),
+    "internetMbps": (int, False),
+    "availabilityRanges": (RANGES, False),
+    "amenities": (STRINGS, False),
+    "status": (str, False),
+    "proximHessoKm": (NUMBER, False),
+    "nearestCampus": (str, False),
+}
+ROOM_CHOICES = {"type": ("room", "whole"), "status": ("active", "deleted")}
+# Written by the data_gen scripts, not read by the Room model
+OTHER_FIELDS = {
+    "nearestStopId": (str, False),
+    "predictedPrice": (NUMBER, False),
+    "createdAt": (TIMESTAMP, False),
+    "updatedAt": (TIMESTAMP, False),
+}
+
+
+# -------------------------------
+# Validation
+# -------------------------------
+def _is_kind(value, kind):
+    if kind is STRINGS:
+        return isinstance(value, list) and all(isinstance(item, str) for item in value)
+    if kind is RANGES:
+        return isinstance(value, list) and all(
+            isinstance(item, dict) and isinstance(item.get("start"), datetime) and isinstance(item.get("end"), datetime)
+            for item in value
+        )
+    if kind is TIMESTAMP:
+        return isinstance(value, datetime) or (SERVER_TIMESTAMP is not None and value is SERVER_TIMESTAMP)
+    if isinstance(value, bool) and kind is not bool:
+        return False  # bool is an int in Python, not in Dart
+    return isinstance(value, kind)
+
+
+def _kind_name(kind):
+    if isinstance(kind, str):
+        return kind
+    if kind is NUMBER:
+        return "number"
+    return {str: "string", int: "int", bool: "bool"}[kind]
+
+
+def _utc(value):
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)  # like the Firestore client
+
+
+def validate_room(data):
+    """Problems that would make Room.fromFirestore fail or produce a broken listing, [] when valid"""
+    errors = []
+    for field, (kind, required) in {**ROOM_FIELDS, **OTHER_FIELDS}.items():
+        value = data.get(field)
+        if value is None:
+            if required:
+                errors.append(f"{field} is missing")
+            continue
+        if not _is_kind(value, kind):
+            errors.append(f"{field} should be of type {_kind_name(kind)}, got {type(value).__name__}")
+        elif field in ROOM_CHOICES and value not in ROOM_CHOICES[field]:
+            errors.append(f"{field} should be one of {ROOM_CHOICES[field]}, got {value!r}")
+        elif kind is RANGES:
+            if any(_utc(item["start"]) > _utc(item["end"]) for item in value):
+                errors.append(f"{field} has a range ending before it starts")
+    return errors
+
+
+def validated(docs, stats, sample=5):
+    """Yield the valid (doc_id, data) of docs; counts in stats, the first `sample` problems in stats["errors"]"""
+    for doc_id, data in docs:
+        stats["rooms"] += 1
+        errors = validate_room(data)
+        if errors:
+            stats["invalid"] += 1
+            if len(stats["errors"]) < sample:
+                stats["errors"].append(f"{doc_id}: {'; '.join(errors)}")
+            continue
+        yield doc_id, data
+
+
+# -------------------------------
+# NDJSON snapshots
+# -------------------------------
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    if SERVER_TIMESTAMP is not None and value is SERVER_TIMESTAMP:
+        return {"$serverTimestamp": True}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    raise TypeError(f"Cannot store a {type(value).__name__} in a snapshot")
+
+
+def _decode(obj):
+    if len(obj) == 1:
+        if "$date" in obj:
+            return datetime.fromisoformat(obj["$date"])
+        if "$serverTimestamp" in obj:
+            return SERVER_TIMESTAMP
+    return obj
+
+
+def _dumps(value):
+    return json.dumps(_encode(value), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_ndjson(path, docs, compress=True):
+    count = 0
+    with open(path, "wb") as raw:
+        # no file name and mtime=0 in the gzip header: the same rooms always give the same bytes
+        stream = gzip.GzipFile(filename="", fileobj=raw, mode="wb", compresslevel=6, mtime=0) if compress else raw
+        with io.TextIOWrapper(stream, encoding="utf-8", newline="\n") as f:
+            f.write(_dumps({"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION, "collection": COLLECTION}) + "\n")
+            for doc_id, data in docs:
+                f.write(_dumps({"id": doc_id, "data": data}) + "\n")
+                count += 1
+    return count
+
+
+def read_ndjson(path):
+    with (gzip.open(path, "rt", encoding="utf-8") if path.endswith(".gz") else open(path, encoding="utf-8")) as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} is not a rooms snapshot")
+        if header.get("version", 0) > SNAPSHOT_VERSION:
+            raise ValueError(f"{path} has snapshot version {header['version']}, this tool reads up to {SNAPSHOT_VERSION}")
+        for line in f:
+            if line.strip():
+                doc = json.loads(line, object_hook=_decode)
+                yield doc["id"], doc["data"]
+
+
+# -------------------------------
+# Parquet snapshots
+# -------------------------------
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet snapshots require the pyarrow package") from None
+    return pa, pq
+
+
+def _parquet_type(kind, pa, tz="UTC"):
+    timestamp = pa.timestamp("us", tz=tz)
+    if kind is STRINGS:
+        return pa.list_(pa.string())
+    if kind is RANGES:
+        return pa.list_(pa.struct([("start", timestamp), ("end", timestamp)]))
+    if kind is TIMESTAMP:
+        return timestamp
+    return {str: pa.string(), NUMBER: pa.float64(), int: pa.int64(), bool: pa.bool_()}[kind]
+
+
+def _columnar(value, kind):
+    """True when value is stored as is in its typed column (a float for numbers, no server timestamp)"""
+    if kind is NUMBER:
+        return isinstance(value, float)
+    if kind is TIMESTAMP:
+        return isinstance(value, datetime)
+    if kind is RANGES:
+        return _is_kind(value, kind) and all(set(item) == {"start", "end"} for item in value)
+    return _is_kind(value, kind)
+
+
+def parquet_schema(pa, tz="UTC"):
+    fields = [pa.field("id", pa.string(), nullable=False)]
+    fields += [pa.field(name, _parquet_type(kind, pa, tz)) for name, (kind, _) in {**ROOM_FIELDS, **OTHER_FIELDS}.items()]
+    fields.append(pa.field("extra", pa.string()))  # JSON of everything that has no typed column
+    return pa.schema(fields, metadata={"format": SNAPSHOT_FORMAT, "version": str(SNAPSHOT_VERSION),
+                                       "collection": COLLECTION})
+
+
+def _parquet_row(doc_id, data):
+    typed = {**ROOM_FIELDS, **OTHER_FIELDS}
+    row = {"id": doc_id}
+    extra = {}
+    for field, value in data.items():
+        kind = typed.get(field, (None,))[0]
+        if kind is not None and value is not None and _columnar(value, kind):
+            row[field] = value
+        else:
+            extra[field] = value  # includes explicit nulls, so absent and null fields stay apart
+    row["extra"] = _dumps(extra) if extra else None
+    return row
+
+
+def write_parquet(path, docs, chunk_size=10_000):
+    pa, pq = _pyarrow()
+    schema = parquet_schema(pa)
+    docs = iter(docs)
+    count = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for chunk in iter(lambda: list(itertools.islice(docs, chunk_size)), []):
+            writer.write_table(pa.Table.from_pylist([_parquet_row(doc_id, data) for doc_id, data in chunk], schema))
+            count += len(chunk)
+    return count
+
+
+def _as_utc(value, kind):
+    if kind is TIMESTAMP:
+        return value.replace(tzinfo=timezone.utc)
+    return [{"start": item["start"].replace(tzinfo=timezone.utc), "end": item["end"].replace(tzinfo=timezone.utc)}
+            for item in value]
+
+
+def read_parquet(path, chunk_size=10_000):
+    pa, pq = _pyarrow()
+    file = pq.ParquetFile(path)
+    metadata = file.schema_arrow.metadata or {}
+    if metadata.get(b"format", b"").decode() != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is not a rooms snapshot")
+    # converting tz-aware timestamps to Python is about 50x slower, they are made UTC again below
+    naive = parquet_schema(pa, tz=None)
+    timestamps = [(name, kind) for name, (kind, _) in {**ROOM_FIELDS, **OTHER_FIELDS}.items()
+                  if kind in (TIMESTAMP, RANGES)]
+    for batch in file.iter_batches(batch_size=chunk_size):
+        for row in pa.Table.from_batches([batch]).cast(naive).to_pylist():
+            doc_id = row.pop("id")
+            extra = row.pop("extra")
+            for name, kind in timestamps:
+                if row[name] is not None:
+                    row[name] = _as_utc(row[name], kind)
+            data = {field: value for field, value in row.items() if value is not None}
+            if extra:
+                data.update(json.loads(extra, object_hook=_decode))
+            yield doc_id, data
+
+
+# -------------------------------
+# Snapshot files
+# -------------------------------
+def write_snapshot(path, docs):
+    """Write (doc_id, data) pairs to `path`, Parquet for *.parquet, NDJSON otherwise; returns the count"""
+    tmp = f"{path}.tmp"
+    try:
+        if path.endswith(".parquet"):
+            count = write_parquet(tmp, docs)
+        else:
+            count = write_ndjson(tmp, docs, compress=path.endswith(".gz"))
+        os.replace(tmp, path)  # never leave a truncated snapshot behind
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return count
+
+
+def read_snapshot(path):
+    """(doc_id, data) pairs of a snapshot, streamed"""
+    return read_parquet(path) if path.endswith(".parquet") else read_ndjson(path)
+
+
+def export_rooms(db, path):
+    """Stream the rooms collection into a snapshot file"""
+    start = time.perf_counter()
+    snapshots = db.collection(COLLECTION).stream()
+    count = write_snapshot(path, ((snapshot.id, snapshot.to_dict()) for snapshot in snapshots))
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(path)
+    print(f"📦 Exported {count} rooms to {path} ({size / 1024:.0f} KB, {size / max(count, 1):.0f} bytes/room) "
+          f"in {seconds:.1f}s")
+    return {"rooms": count, "bytes": size, "seconds": round(seconds, 3)}
+
+
+def import_rooms(db, path, batch_size=MAX_BATCH_SIZE, concurrency=4, skip_invalid=False, out=None):
+    """Validate a snapshot and write its rooms to db, or with db None (dry run) to the `out` snapshot if given"""
+    stats = {"rooms": 0, "invalid": 0, "errors": []}
+    if not skip_invalid:
+        # check everything first: a bad snapshot must not leave a half-written collection
+        for _ in validated(read_snapshot(path), stats):
+            pass
+        if stats["invalid"]:
+            for error in stats["errors"]:
+                print(f"❌ {error}")
+            raise ValueError(f"{stats['invalid']} of {stats['rooms']} rooms in {path} are invalid, nothing was "
+                             "written (--skip-invalid writes the valid ones)")
+        stats = {"rooms": 0, "invalid": 0, "errors": []}
+
+    start = time.perf_counter()
+    rooms = validated(read_snapshot(path), stats)
+    if db is not None:
+        result = BatchWriter(db, COLLECTION, batch_size=batch_size, concurrency=concurrency).write(rooms)
+        target = "Firestore"
+    elif out:
+        result = {"written": write_snapshot(out, rooms), "failed": 0}
+        target = out
+    else:
+        result = {"written": 0, "failed": 0}
+        target = "nothing (dry run)"
+        for _ in rooms:
+            pass
+    seconds = time.perf_counter() - start
+
+    for error in stats["errors"]:
+        print(f"⚠️ Skipped {error}")
+    print(f"📥 {stats['rooms']} rooms read from {path} in {seconds:.1f}s, {stats['invalid']} invalid, "
+          f"{result['written']} written to {target}, {result['failed']} failed")
+    return {**stats, **result, "seconds": round(seconds, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write the rooms collection to a snapshot")
+    export.add_argument("--out", required=True, help="*.ndjson.gz, *.ndjson or *.parquet")
+    export.add_argument("--fake", action="store_true", help="export the rooms of --csv imported in memory instead")
+    export.add_argument("--csv", default="synthetic_valais_price.csv", help="CSV imported with --fake")
+    export.add_argument("--limit", type=int, help="with --fake: only the first N rows")
+
+    restore = commands.add_parser("import", help="write a snapshot's rooms to Firestore")
+    restore.add_argument("snapshot")
+    restore.add_argument("--dry-run", action="store_true", help="read and validate only, Firestore is not touched")
+    restore.add_argument("--out", help="with --dry-run: write the validated rooms to this snapshot file")
+    restore.add_argument("--skip-invalid", action="store_true", help="write the valid rooms, skip the others")
+    restore.add_argument("--fake", action="store_true", help="write to an in-memory stand-in instead of Firebase")
+    restore.add_argument("--batch-size", type=int, default=MAX_BATCH_SIZE, help="Firestore writes per batch")
+    restore.add_argument("--concurrency", type=int, default=4, help="batches committed in parallel")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        if args.fake:
+            import populate_firebase
+            db = InMemoryFirestore()
+            with tempfile.TemporaryDirectory() as tmp:
+                populate_firebase.populate_firebase(db, csv_file=args.csv, limit=args.limit,
+                                                    checkpoint_file=os.path.join(tmp, "checkpoint.json"))
+        else:
+            from populate_firebase import init_firestore
+            db = init_firestore()
+        export_rooms(db, args.out)
+        return
+
+    if not 1 <= args.batch_size <= MAX_BATCH_SIZE:
+        parser.error(f"--batch-size must be between 1 and {MAX_BATCH_SIZE}")
+    if args.out and not args.dry_run:
+        parser.error("--out needs --dry-run")
+    if args.dry_run:
+        db = None
+    elif args.fake:
+        db = InMemoryFirestore()
+    else:
+        from populate_firebase import init_firestore
+        db = init_firestore()
+    try:
+        import_rooms(db, args.snapshot, args.batch_size, args.concurrency, args.skip_invalid, args.out)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+
+
+if __name__ == "__main__":
+    main()
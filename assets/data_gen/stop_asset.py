@@ -0,0 +1,282 @@
+"""Compact binary transport-stop asset built from PointExploitation.csv.
+
+The app parses the whole 28k-line CSV with a hand-written parser at runtime
+and scans every stop per lookup. `build` keeps only the passenger stops of
+a region and transport modes, drops the unused columns and writes:
+
+    header   "USTP", version, stop count, grid size, cell size, LV95 origin
+    e, n     float32 per stop, meters from the origin, sorted by grid cell
+    cells    uint32 CSR offsets: the stops of cell c are [cells[c], cells[c+1])
+    id, name, commune, mode
+             uint32 per stop, indexes into the string table
+    strings  uint32 offsets + UTF-8 blob, every distinct string stored once
+
+Every section is 8-byte aligned, so StopAsset maps the file and views the
+sections as NumPy arrays without parsing or copying, and queries them with
+the StopGrid of transport_stops.py.
+
+Usage:
+    python stop_asset.py build --out transport_stops_valais.bin
+    python stop_asset.py bench --asset transport_stops_valais.bin --out stop_asset_bench.json
+"""
+import argparse
+import csv
+import json
+import mmap
+import os
+import random
+import struct
+import time
+import tracemalloc
+
+import numpy as np
+
+from transport_stops import STOP_TYPES, STOPS_CSV, StopGrid, brute_force_nearest, wgs84_to_lv95
+
+MAGIC = b"USTP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIIdddI")  # magic, version, reserved, count, grid w, grid h, cell, origin e/n, strings
+# Swiss commune (BFS) number ranges
+REGIONS = {"valais": (6000, 6399), "switzerland": None}
+# A stop is kept if one of its " / "-separated modes is listed (chairlifts and gondolas are not)
+DEFAULT_MODES = ("Bus", "Train", "Tram", "Métro", "Funiculaire", "Chemin de fer à crémaillère", "Bateau")
+DEFAULT_CELL_M = 1000
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+def read_stop_rows(path=STOPS_CSV, region="valais", modes=DEFAULT_MODES, stop_types=STOP_TYPES):
+    """Filtered stops of PointExploitation.csv as (id, name, commune, mode, e, n) tuples"""
+    communes = REGIONS[region]
+    kept = []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            if stop_types and row["TypePointExploitation_Designation"] not in stop_types:
+                continue
+            if modes and not set(row["MoyenTransport_Designation"].split(" / ")) & set(modes):
+                continue
+            if communes and not communes[0] <= int(row["Commune_Numero"] or 0) <= communes[1]:
+                continue
+            if not row["E"] or not row["N"]:
+                continue
+            kept.append((row["xtf_id"], row["Nom"], row["Commune_Nom"], row["MoyenTransport_Designation"],
+                         float(row["E"]), float(row["N"])))
+    return kept
+
+
+def build_asset(stops, path, cell_size=DEFAULT_CELL_M):
+    """Write the stops (see read_stop_rows) to `path`; returns the file size"""
+    e = np.array([s[4] for s in stops])
+    n = np.array([s[5] for s in stops])
+    origin = (float(np.floor(e.min())), float(np.floor(n.min())))
+    grid = StopGrid(e - origin[0], n - origin[1], cell_size)
+
+    strings, refs = {}, np.empty((len(stops), 4), dtype=np.uint32)
+    for row, i in zip(refs, grid.order):
+        row[:] = [strings.setdefault(value, len(strings)) for value in stops[i][:4]]
+    encoded = [value.encode("utf-8") for value in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    np.cumsum([len(b) for b in encoded], out=string_offsets[1:])
+
+    sections = [
+        grid.e.astype(np.float32), grid.n.astype(np.float32),
+        grid.offsets.astype(np.uint32),
+        *(np.ascontiguousarray(refs[:, k]) for k in range(4)),
+        string_offsets,
+    ]
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(stops), grid.shape[0], grid.shape[1],
+                            cell_size, origin[0], origin[1], len(encoded)))
+        f.write(b"\0" * (_align(HEADER.size) - HEADER.size))
+        for array in sections:
+            data = array.tobytes()
+            f.write(data + b"\0" * (_align(len(data)) - len(data)))
+        f.write(b"".join(encoded))
+    return os.path.getsize(path)
+
+
+class StopAsset:
+    """Memory-mapped reader: arrays are views into the file, strings are decoded on access"""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, width, height, cell_size, origin_e, origin_n, n_strings = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} stop asset")
+        self.count = count
+        self.origin = (origin_e, origin_n)
+
+        offset = _align(HEADER.size)
+        sizes = [(np.float32, count), (np.float32, count), (np.uint32, width * height + 1),
+                 (np.uint32, count), (np.uint32, count), (np.uint32, count), (np.uint32, count),
+                 (np.uint32, n_strings + 1)]
+        arrays = []
+        for dtype, length in sizes:
+            arrays.append(np.frombuffer(self._map, dtype=dtype, count=length, offset=offset))
+            offset += _align(length * np.dtype(dtype).itemsize)
+        self.e, self.n, cells, self.id_ref, self.name_ref, self.commune_ref, self.mode_ref, self._string_offsets = arrays
+        self._blob = offset
+        self.grid = StopGrid.from_layout(self.e, self.n, cells, (width, height), cell_size)
+
+    def string(self, ref):
+        start = self._blob + int(self._string_offsets[ref])
+        end = self._blob + int(self._string_offsets[ref + 1])
+        return self._map[start:end].decode("utf-8")
+
+    def stop(self, i):
+        return {
+            "id": self.string(self.id_ref[i]),
+            "name": self.string(self.name_ref[i]),
+            "commune": self.string(self.commune_ref[i]),
+            "mode": self.string(self.mode_ref[i]),
+            "e": float(self.e[i]) + self.origin[0],
+            "n": float(self.n[i]) + self.origin[1],
+        }
+
+    def nearest_lv95(self, e, n):
+        """(stop indices, distances in meters) for LV95 query coordinates"""
+        return self.grid.nearest(np.asarray(e) - self.origin[0], np.asarray(n) - self.origin[1])
+
+    def nearest(self, lat, lng):
+        return self.nearest_lv95(*wgs84_to_lv95(lat, lng))
+
+    def close(self):
+        # the NumPy views must go before the map can be closed
+        self.e = self.n = self.id_ref = self.name_ref = self.commune_ref = self.mode_ref = None
+        self._string_offsets = self.grid = None
+        self._map.close()
+        self._file.close()
+
+
+# -------------------------------
+# Benchmark against the app's approach
+# -------------------------------
+def parse_csv_line(line):
+    """Port of TransportStopService._parseCsvLine (character by character)"""
+    result, buffer, inside_quotes = [], [], False
+    for char in line:
+        if char == '"':
+            inside_quotes = not inside_quotes
+        elif char == "," and not inside_quotes:
+            result.append("".join(buffer))
+            buffer = []
+        else:
+            buffer.append(char)
+    result.append("".join(buffer))
+    return result
+
+
+def load_csv_like_app(path):
+    """TransportStopService.loadStops: every line parsed into (id, name, city, type, e, n, h)"""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        lines = f.read().splitlines()
+    stops = []
+    for line in lines[1:]:
+        row = parse_csv_line(line)
+        if len(row) < 19:
+            continue
+        stops.append((row[0], row[2], row[11], row[9], float(row[16] or 0), float(row[17] or 0), float(row[18] or 0)))
+    return stops
+
+
+def find_nearest_like_app(stops, e, n):
+    """TransportStopService.findNearestStop: linear scan"""
+    nearest, best = None, float("inf")
+    for stop in stops:
+        d = ((stop[4] - e) ** 2 + (stop[5] - n) ** 2) ** 0.5
+        if d < best:
+            nearest, best = stop, d
+    return nearest, best
+
+
+def measure_load(load):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    seconds = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {"load_ms": round(seconds * 1000, 2), "heap_mb": round(current / 2**20, 2),
+                    "peak_heap_mb": round(peak / 2**20, 2)}
+
+
+def bench(args):
+    with open(args.rooms, "r", encoding="utf-8", newline="") as f:
+        rooms = [(float(r["latitude"]), float(r["longitude"])) for r in csv.DictReader(f)]
+    rng = random.Random(args.seed)
+    queries = [rooms[rng.randrange(len(rooms))] for _ in range(args.queries)]
+    qe, qn = wgs84_to_lv95([q[0] for q in queries], [q[1] for q in queries])
+    report = {}
+
+    stops, report["csv_linear_scan"] = measure_load(lambda: load_csv_like_app(args.stops))
+    report["csv_linear_scan"]["file_kb"] = round(os.path.getsize(args.stops) / 1024, 1)
+    report["csv_linear_scan"]["stops"] = len(stops)
+    start = time.perf_counter()
+    app_results = [find_nearest_like_app(stops, e, n) for e, n in zip(qe.tolist(), qn.tolist())]
+    report["csv_linear_scan"]["query_us"] = round((time.perf_counter() - start) / len(queries) * 1e6, 1)
+
+    asset, report["asset"] = measure_load(lambda: StopAsset(args.asset))
+    report["asset"]["file_kb"] = round(os.path.getsize(args.asset) / 1024, 1)
+    report["asset"]["stops"] = asset.count
+    start = time.perf_counter()
+    for e, n in zip(qe.tolist(), qn.tolist()):
+        asset.nearest_lv95([e], [n])
+    report["asset"]["query_us"] = round((time.perf_counter() - start) / len(queries) * 1e6, 1)
+    bulk_e, bulk_n = np.resize(qe, args.bulk), np.resize(qn, args.bulk)
+    start = time.perf_counter()
+    idx, distance = asset.nearest_lv95(bulk_e, bulk_n)
+    report["asset"]["bulk_queries_per_s"] = round(args.bulk / (time.perf_counter() - start))
+
+    # exactness over the asset's own (filtered) stops, and how often the filtered answer is the app's answer
+    ref_idx, ref_distance = brute_force_nearest(
+        asset.e.astype(np.float64) + asset.origin[0], asset.n.astype(np.float64) + asset.origin[1], bulk_e, bulk_n)
+    report["asset"]["exact_vs_linear_scan"] = float(np.mean(np.isclose(distance, ref_distance, atol=0.05)))
+    same = [asset.string(asset.id_ref[i]) == stop[0] for i, (stop, _) in zip(idx[:len(queries)].tolist(), app_results)]
+    report["asset"]["same_stop_as_app"] = round(sum(same) / len(same), 3)
+    asset.close()
+
+    print(f"{'approach':<16} {'file KB':>8} {'stops':>6} {'load ms':>8} {'heap MB':>8} {'query µs':>9}")
+    for name, r in report.items():
+        print(f"{name:<16} {r['file_kb']:>8} {r['stops']:>6} {r['load_ms']:>8} {r['heap_mb']:>8} {r['query_us']:>9}")
+    print(f"asset bulk: {report['asset']['bulk_queries_per_s']:,} queries/s, "
+          f"exact vs linear scan over the same stops: {report['asset']['exact_vs_linear_scan']:.0%}, "
+          f"same stop as the app (all stop types/regions): {report['asset']['same_stop_as_app']:.0%}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="write the binary asset")
+    build.add_argument("--stops", default=STOPS_CSV)
+    build.add_argument("--out", default="transport_stops_valais.bin")
+    build.add_argument("--region", choices=sorted(REGIONS), default="valais")
+    build.add_argument("--modes", default=",".join(DEFAULT_MODES), help="comma-separated; empty keeps every mode")
+    build.add_argument("--cell-size", type=float, default=DEFAULT_CELL_M)
+    run = sub.add_parser("bench", help="compare the asset with the CSV + linear scan")
+    run.add_argument("--stops", default=STOPS_CSV)
+    run.add_argument("--asset", default="transport_stops_valais.bin")
+    run.add_argument("--rooms", default="synthetic_valais_price.csv", help="CSV with latitude/longitude columns")
+    run.add_argument("--queries", type=int, default=200)
+    run.add_argument("--bulk", type=int, default=100_000)
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--out", help="optional JSON output file")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        stops = read_stop_rows(args.stops, args.region, tuple(m for m in args.modes.split(",") if m))
+        size = build_asset(stops, args.out, args.cell_size)
+        print(f"✅ {args.out}: {len(stops)} stops, {size / 1024:.1f} KB "
+              f"(CSV: {os.path.getsize(args.stops) / 1024:.1f} KB)")
+    else:
+        bench(args)
+
+
+if __name__ == "__main__":
+    main()
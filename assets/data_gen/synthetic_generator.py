@@ -0,0 +1,310 @@
+"""Large synthetic listing sets fitted on synthetic_valais_price.csv.
+
+ListingModel.fit() learns, from the 500 source rows:
+    - per city: share of listings, postal code, nearest HES-SO campus,
+      joint normal of latitude/longitude/campus distance, share of entire
+      homes and of furnished / wifi / charges-included listings
+    - per type (room / entire_home): joint normal of log price, log surface
+      and number of rooms, plus the car park share
+    - per city: price level relative to its type (shrunk towards 0 for
+      small cities)
+    - floor distribution and log-normal distance to public transport
+
+sample() then draws whole chunks with NumPy, no per-row Python. Values are
+clipped to the range seen in the source and formatted like the source CSV,
+so the output can replace it for populate_firebase.py or load tests.
+
+Usage:
+    python synthetic_generator.py --rows 1000000 --out synthetic_valais_1m.csv
+    python synthetic_generator.py --rows 1000000 --out synthetic_valais_1m.parquet  (needs pyarrow)
+    python populate_firebase.py --synthetic 100000 --fake
+"""
+import argparse
+import csv
+import time
+
+import numpy as np
+
+SOURCE_CSV = "synthetic_valais_price.csv"
+COLUMNS = [
+    "price_chf", "city", "postal_code", "latitude", "longitude", "surface_m2", "num_rooms", "type",
+    "is_furnished", "floor", "wifi_incl", "charges_incl", "car_park", "dist_public_transport_km",
+    "proxim_hesso_km", "nearest_hesso_name",
+]
+TYPES = ("room", "entire_home")
+CITY_FLAGS = ("is_furnished", "wifi_incl", "charges_incl")
+PRICE_SHRINKAGE = 20  # rows of evidence a city needs before its own price level counts half
+
+
+def _sqrt_cov(samples):
+    """Matrix square root of the sample covariance (works for constant columns too)"""
+    cov = np.atleast_2d(np.cov(samples, rowvar=False))
+    values, vectors = np.linalg.eigh(cov)
+    return vectors * np.sqrt(np.clip(values, 0, None))
+
+
+class ListingModel:
+    """Distributions of the source CSV columns, see the module docstring"""
+
+    def __init__(self, cities, types, floors, floor_p, transport):
+        self.cities = cities        # list of dicts, one per city
+        self.types = types          # type name -> dict
+        self.floors = floors
+        self.floor_p = floor_p
+        self.transport = transport  # log-normal of dist_public_transport_km
+        self.city_p = np.array([c["share"] for c in cities])
+
+    @classmethod
+    def fit(cls, csv_file=SOURCE_CSV):
+        with open(csv_file, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        col = {name: np.array([row[name] for row in rows]) for name in COLUMNS}
+        num = lambda name: col[name].astype(np.float64)
+        flag = lambda name: col[name] == "True"
+
+        whole = col["type"] == "entire_home"
+        log_price, log_surface, rooms = np.log(num("price_chf")), np.log(num("surface_m2")), num("num_rooms")
+
+        types = {}
+        for name, mask in zip(TYPES, (~whole, whole)):
+            values = np.column_stack([log_price[mask], log_surface[mask], rooms[mask]])
+            types[name] = {
+                "mean": values.mean(axis=0),
+                "sqrt_cov": _sqrt_cov(values),
+                "low": values.min(axis=0),
+                "high": values.max(axis=0),
+                "car_park": flag("car_park")[mask].mean(),
+            }
+        type_mean = np.where(whole, types["entire_home"]["mean"][0], types["room"]["mean"][0])
+
+        cities = []
+        for city in sorted(set(col["city"])):
+            mask = col["city"] == city
+            n = int(mask.sum())
+            location = np.column_stack([num("latitude")[mask], num("longitude")[mask], num("proxim_hesso_km")[mask]])
+            campus, counts = np.unique(col["nearest_hesso_name"][mask], return_counts=True)
+            postal, postal_counts = np.unique(col["postal_code"][mask], return_counts=True)
+            cities.append({
+                "name": city,
+                "share": n / len(rows),
+                "postal_code": postal[postal_counts.argmax()],
+                "campus": campus[counts.argmax()],
+                "location_mean": location.mean(axis=0),
+                "location_sqrt_cov": _sqrt_cov(location),
+                "whole": whole[mask].mean(),
+                "flags": np.array([flag(name)[mask].mean() for name in CITY_FLAGS]),
+                "price_offset": (log_price[mask] - type_mean[mask]).mean() * n / (n + PRICE_SHRINKAGE),
+            })
+
+        floors, floor_counts = np.unique(num("floor").astype(np.int64), return_counts=True)
+        log_transport = np.log(num("dist_public_transport_km"))
+        transport = {
+            "mean": log_transport.mean(),
+            "std": log_transport.std(),
+            "low": num("dist_public_transport_km").min(),
+            "high": num("dist_public_transport_km").max(),
+        }
+        return cls(cities, types, floors, floor_counts / floor_counts.sum(), transport)
+
+    def sample(self, n, rng):
+        """n listings as a dict of NumPy columns (numbers unformatted, text as UTF-8 bytes)"""
+        city_idx = rng.choice(len(self.cities), size=n, p=self.city_p)
+        whole = np.empty(n, dtype=bool)
+        location = np.empty((n, 3))
+        flags = np.empty((n, len(CITY_FLAGS)), dtype=bool)
+        price_offset = np.empty(n)
+        for i, city in enumerate(self.cities):
+            mask = city_idx == i
+            m = int(mask.sum())
+            whole[mask] = rng.random(m) < city["whole"]
+            location[mask] = city["location_mean"] + rng.standard_normal((m, 3)) @ city["location_sqrt_cov"].T
+            flags[mask] = rng.random((m, len(CITY_FLAGS))) < city["flags"]
+            price_offset[mask] = city["price_offset"]
+
+        body = np.empty((n, 3))  # log price, log surface, rooms
+        car_park = np.empty(n, dtype=bool)
+        for name, mask in zip(TYPES, (~whole, whole)):
+            t = self.types[name]
+            m = int(mask.sum())
+            values = t["mean"] + rng.standard_normal((m, 3)) @ t["sqrt_cov"].T
+            values[:, 0] += price_offset[mask]
+            body[mask] = np.clip(values, t["low"], t["high"])
+            car_park[mask] = rng.random(m) < t["car_park"]
+
+        transport = np.exp(rng.normal(self.transport["mean"], self.transport["std"], n))
+        postal, campus, names = (
+            np.array([c[key].encode("utf-8") for c in self.cities]) for key in ("postal_code", "campus", "name")
+        )
+        return {
+            "price_chf": np.rint(np.exp(body[:, 0])).astype(np.int64),
+            "city": names[city_idx],
+            "postal_code": postal[city_idx],
+            "latitude": location[:, 0],
+            "longitude": location[:, 1],
+            "surface_m2": np.exp(body[:, 1]),
+            "num_rooms": np.where(whole, np.round(body[:, 2] * 2) / 2, 1.0),
+            "type": np.where(whole, b"entire_home", b"room"),
+            "is_furnished": flags[:, 0],
+            "floor": rng.choice(self.floors, size=n, p=self.floor_p),
+            "wifi_incl": flags[:, 1],
+            "charges_incl": flags[:, 2],
+            "car_park": car_park,
+            "dist_public_transport_km": np.clip(transport, self.transport["low"], self.transport["high"]),
+            "proxim_hesso_km": np.clip(location[:, 2], 0, None),
+            "nearest_hesso_name": campus[city_idx],
+        }
+
+
+# -------------------------------
+# Chunked sampling and output
+# -------------------------------
+def iter_chunks(model, n, seed=0, chunk_size=100_000):
+    """Sample n listings in chunks; chunk k always comes from the same stream for a given seed"""
+    for k, start in enumerate(range(0, n, chunk_size)):
+        rng = np.random.default_rng([seed, k])
+        yield model.sample(min(chunk_size, n - start), rng)
+
+
+# How each column is written: "int", "text", "bool" or the number of decimals
+COLUMN_FORMATS = {
+    "price_chf": "int", "city": "text", "postal_code": "text", "latitude": 6, "longitude": 6,
+    "surface_m2": 1, "num_rooms": 1, "type": "text", "is_furnished": "bool", "floor": "int",
+    "wifi_incl": "bool", "charges_incl": "bool", "car_park": "bool", "dist_public_transport_km": 3,
+    "proxim_hesso_km": 2, "nearest_hesso_name": "text",
+}
+BOOL_BYTES = np.array([b"False", b"True"])
+
+
+def _matrix(values):
+    """Fixed-width bytes array -> (n, width) uint8 matrix, padding bytes are 0"""
+    return np.frombuffer(values.tobytes(), np.uint8).reshape(len(values), values.dtype.itemsize)
+
+
+def _digits(values, width=None, pad=False):
+    """Decimal digits of non-negative integers as a uint8 matrix; leading zeros become padding unless pad"""
+    values = values.astype(np.int64)
+    if width is None:
+        width = len(str(int(values.max()))) if len(values) else 1
+    digits = values[:, None] // 10 ** np.arange(width - 1, -1, -1, dtype=np.int64) % 10
+    out = (digits + ord("0")).astype(np.uint8)
+    if not pad:
+        leading = np.cumsum(digits, axis=1) == 0
+        leading[:, -1] = False
+        out[leading] = 0
+    return out
+
+
+def _column_bytes(values, fmt):
+    if fmt == "int":
+        return _digits(values)
+    if fmt == "bool":
+        return _matrix(BOOL_BYTES[values.view(np.int8)])
+    if fmt == "text":
+        return _matrix(values)
+    scaled = np.rint(values * 10 ** fmt).astype(np.int64)  # every float column is >= 0
+    whole, fraction = np.divmod(scaled, 10 ** fmt)
+    point = np.full((len(values), 1), ord("."), np.uint8)
+    return np.hstack([_digits(whole), point, _digits(fraction, fmt, pad=True)])
+
+
+def format_csv(chunk):
+    """Column dict -> CSV body bytes formatted like the source CSV, without per-row Python"""
+    n = len(chunk["city"])
+    comma = np.full((n, 1), ord(","), np.uint8)
+    parts = []
+    for name in COLUMNS:
+        parts += [_column_bytes(chunk[name], COLUMN_FORMATS[name]), comma]
+    parts[-1] = np.full((n, 1), ord("\n"), np.uint8)
+    table = np.hstack(parts)
+    return table[table != 0].tobytes()
+
+
+def iter_rows(model, n, seed=0, chunk_size=100_000):
+    """Yield (offset, row) with string values, like populate_firebase.read_rows()"""
+    offset = 0
+    for chunk in iter_chunks(model, n, seed, chunk_size):
+        for line in format_csv(chunk).decode("utf-8").splitlines():
+            yield offset, dict(zip(COLUMNS, line.split(",")))
+            offset += 1
+
+
+def write_csv(model, path, n, seed=0, chunk_size=100_000):
+    with open(path, "wb") as f:
+        f.write((",".join(COLUMNS) + "\n").encode("utf-8"))
+        for chunk in iter_chunks(model, n, seed, chunk_size):
+            f.write(format_csv(chunk))
+
+
+def _parquet_column(values, fmt, pa):
+    if fmt == "text":
+        return pa.array(values).cast(pa.string())
+    if isinstance(fmt, int):
+        return np.round(values, fmt)  # same precision as the CSV
+    return values
+
+
+def write_parquet(model, path, n, seed=0, chunk_size=100_000):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output requires the pyarrow package") from None
+    writer = None
+    try:
+        for chunk in iter_chunks(model, n, seed, chunk_size):
+            table = pa.table({
+                name: _parquet_column(chunk[name], COLUMN_FORMATS[name], pa) for name in COLUMNS
+            })
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def summarize(columns):
+    """A few headline statistics, to compare a sample against the source"""
+    whole = columns["type"].astype(str) == "entire_home"
+    price = columns["price_chf"].astype(np.float64)
+    surface = columns["surface_m2"].astype(np.float64)
+    return {
+        "entire_home_share": whole.mean(),
+        "room_price_mean": price[~whole].mean(),
+        "home_price_mean": price[whole].mean(),
+        "room_surface_mean": surface[~whole].mean(),
+        "home_surface_mean": surface[whole].mean(),
+        "car_park_share": (columns["car_park"].astype(str) == "True").mean(),
+        "price_surface_corr": np.corrcoef(price, surface)[0, 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default=SOURCE_CSV, help="CSV the distributions are fitted on")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True, help=".csv or .parquet output file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    model = ListingModel.fit(args.source)
+    start = time.perf_counter()
+    if args.out.endswith(".parquet"):
+        write_parquet(model, args.out, args.rows, args.seed, args.chunk_size)
+    else:
+        write_csv(model, args.out, args.rows, args.seed, args.chunk_size)
+    seconds = time.perf_counter() - start
+    print(f"✅ {args.rows} rows written to {args.out} in {seconds:.1f}s ({args.rows / seconds:,.0f} rows/s)")
+
+    with open(args.source, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    source = summarize({name: np.array([row[name] for row in rows]) for name in COLUMNS})
+    sample = summarize(next(iter_chunks(model, min(args.rows, args.chunk_size), args.seed, args.chunk_size)))
+    print(f"{'statistic':<20} {'source':>10} {'generated':>10}")
+    for name in source:
+        print(f"{name:<20} {source[name]:>10.3f} {sample[name]:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from firestore_writer import BatchWriter, ImportCheckpoint, InMemoryFirestore
+
+
+def test_out_of_order_commits_merge_into_ranges(tmp_path):
+    path = tmp_path / "import.checkpoint.json"
+    checkpoint = ImportCheckpoint(str(path), "rooms.csv", 0)
+    docs = [(offset, f"doc{offset}", {}) for offset in range(10)]
+    assert [doc_id for doc_id, _ in checkpoint.track(docs)] == [f"doc{i}" for i in range(10)]
+
+    # three batches of the import, the last one commits first
+    checkpoint.on_commit(3, ["doc7", "doc8", "doc9"])
+    assert checkpoint.ranges == [[7, 10]]
+    checkpoint.on_commit(1, ["doc0", "doc1", "doc2"])
+    assert checkpoint.ranges == [[0, 3], [7, 10]]
+    checkpoint.on_commit(2, ["doc4", "doc3", "doc6", "doc5"])
+    assert checkpoint.ranges == [[0, 10]]
+    assert checkpoint.committed == 10
+
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert saved == {"source": "rooms.csv", "seed": 0, "committed": [[0, 10]]}
+
+
+def test_mark_fills_gaps_and_ignores_duplicates():
+    checkpoint = ImportCheckpoint(None, "rooms.csv", 0)
+    checkpoint.mark([5, 1, 3])
+    assert checkpoint.ranges == [[1, 2], [3, 4], [5, 6]]
+    checkpoint.mark([3, 5, 1])
+    assert checkpoint.committed == 3
+    checkpoint.mark([2])
+    assert checkpoint.ranges == [[1, 4], [5, 6]]
+    checkpoint.mark([4, 0])
+    assert checkpoint.ranges == [[0, 6]]
+
+
+def test_done_reports_committed_offsets():
+    checkpoint = ImportCheckpoint(None, "rooms.csv", 0, ranges=[[0, 3], [10, 12]])
+    assert [offset for offset in range(14) if checkpoint.done(offset)] == [0, 1, 2, 10, 11]
+
+
+def test_duplicate_doc_ids_commit_every_offset():
+    # two CSV rows with identical content get the same document ID
+    checkpoint = ImportCheckpoint(None, "rooms.csv", 0)
+    list(checkpoint.track([(0, "same", {}), (1, "same", {}), (2, "other", {})]))
+    checkpoint.on_commit(1, ["same", "other"])
+    assert checkpoint.ranges == [[0, 3]]
+
+
+def test_uncommitted_batches_are_not_recorded():
+    checkpoint = ImportCheckpoint(None, "rooms.csv", 0)
+    list(checkpoint.track([(offset, f"doc{offset}", {}) for offset in range(6)]))
+    checkpoint.on_commit(2, ["doc3", "doc4", "doc5"])  # the batch of doc0-2 failed
+    assert checkpoint.ranges == [[3, 6]]
+    assert not checkpoint.done(0)
+
+
+def test_load_resumes_only_the_same_import(tmp_path):
+    path = str(tmp_path / "import.checkpoint.json")
+    assert ImportCheckpoint.load(path, "rooms.csv", 0).ranges == []
+    ImportCheckpoint(path, "rooms.csv", 0).mark([0, 1, 2, 8])
+
+    resumed = ImportCheckpoint.load(path, "rooms.csv", 0)
+    assert resumed.ranges == [[0, 3], [8, 9]]
+    with pytest.raises(ValueError):
+        ImportCheckpoint.load(path, "rooms.csv", 1)
+    with pytest.raises(ValueError):
+        ImportCheckpoint.load(path, "other.csv", 0)
+
+
+def test_keep_fields_survive_an_overwrite():
+    db = InMemoryFirestore()
+    db.collection("rooms").document("old").set({"title": "before", "createdAt": "2024-01-01", "stale": True})
+    writer = BatchWriter(db, "rooms", batch_size=10, keep_fields=("createdAt",))
+    writer.write([("old", {"title": "after", "createdAt": "now"}), ("new", {"title": "new", "createdAt": "now"})])
+
+    rooms = db.collections["rooms"]
+    assert rooms["old"] == {"title": "after", "createdAt": "2024-01-01"}  # replaced, but keeps createdAt
+    assert rooms["new"] == {"title": "new", "createdAt": "now"}
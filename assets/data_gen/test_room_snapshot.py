@@ -0,0 +1,102 @@
+import gzip, json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from firestore_writer import InMemoryFirestore
+from room_snapshot import (
+    SERVER_TIMESTAMP, export_rooms, import_rooms, read_snapshot, validate_room, write_snapshot,
+)
+
+START = datetime(2025, 9, 1, tzinfo=timezone.utc)
+
+
+def room(**fields):
+    data = {
+        "title": "Studio near HES-SO", "price": 850.0, "city": "Sion", "postcode": "1950", "lat": 46.23,
+        "lng": 7.36, "ownerUid": "owner1", "type": "room", "sizeSqm": 18, "rooms": 1, "furnished": True,
+        "amenities": ["Internet", "Laundry"], "photoUrls": [], "status": "active", "proximHessoKm": 1.2,
+        "availabilityRanges": [{"start": START, "end": START + timedelta(days=180)}],
+        "createdAt": START,
+    }
+    data.update(fields)
+    return {key: value for key, value in data.items() if value is not None}
+
+
+def test_validate_room_follows_the_room_model():
+    assert validate_room(room()) == []
+    assert validate_room(room(price=900)) == []  # an int price is a number too
+    assert validate_room(room(title=None, lat=None)) == ["title is missing", "lat is missing"]
+    assert validate_room(room(sizeSqm=True, furnished="yes")) == [
+        "furnished should be of type bool, got str",
+        "sizeSqm should be of type int, got bool",  # bool is not an int in Dart
+    ]
+    assert validate_room(room(type="studio")) == ["type should be one of ('room', 'whole'), got 'studio'"]
+    assert validate_room(room(amenities=["Internet", 3])) == ["amenities should be of type list of strings, got list"]
+    backwards = [{"start": START, "end": START - timedelta(days=1)}]
+    assert validate_room(room(availabilityRanges=backwards)) == ["availabilityRanges has a range ending before it starts"]
+
+
+def test_ndjson_round_trip_is_exact_and_deterministic(tmp_path):
+    docs = [("a", room()), ("b", room(price=900, updatedAt=SERVER_TIMESTAMP, custom={"k": [1, None]}))]
+    first, second = tmp_path / "first.ndjson.gz", tmp_path / "second.ndjson.gz"
+    assert write_snapshot(str(first), docs) == 2
+    write_snapshot(str(second), docs)
+    assert first.read_bytes() == second.read_bytes()
+    assert list(read_snapshot(str(first))) == docs
+
+    plain = tmp_path / "rooms.ndjson"
+    write_snapshot(str(plain), docs)
+    assert list(read_snapshot(str(plain))) == docs
+    assert json.loads(plain.read_text(encoding="utf-8").splitlines()[0])["format"] == "unistay-rooms-snapshot"
+
+
+def test_read_rejects_other_files(tmp_path):
+    other = tmp_path / "other.ndjson.gz"
+    other.write_bytes(gzip.compress(b'{"rooms": []}\n'))
+    with pytest.raises(ValueError, match="not a rooms snapshot"):
+        list(read_snapshot(str(other)))
+    newer = tmp_path / "newer.ndjson"
+    newer.write_text('{"format": "unistay-rooms-snapshot", "version": 99}\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="version 99"):
+        list(read_snapshot(str(newer)))
+
+
+def test_export_then_import(tmp_path):
+    path = str(tmp_path / "rooms.ndjson.gz")
+    source = InMemoryFirestore()
+    for doc_id in ("a", "b", "c"):
+        source.collection("rooms").document(doc_id).set(room(title=f"Room {doc_id}"))
+    assert export_rooms(source, path)["rooms"] == 3
+
+    target = InMemoryFirestore()
+    result = import_rooms(target, path, batch_size=2)
+    assert (result["rooms"], result["invalid"], result["written"]) == (3, 0, 3)
+    assert target.collections["rooms"] == source.collections["rooms"]
+
+
+def test_one_invalid_room_stops_the_import_before_any_write(tmp_path):
+    path = str(tmp_path / "rooms.ndjson.gz")
+    write_snapshot(path, [("a", room()), ("bad", room(ownerUid=None)), ("c", room())])
+
+    db = InMemoryFirestore()
+    with pytest.raises(ValueError, match="1 of 3 rooms"):
+        import_rooms(db, path)
+    assert not db.collections.get("rooms")
+
+    result = import_rooms(db, path, skip_invalid=True)
+    assert sorted(db.collections["rooms"]) == ["a", "c"]
+    assert result["errors"] == ["bad: ownerUid is missing"]
+
+    out = str(tmp_path / "valid.ndjson")
+    assert import_rooms(None, path, skip_invalid=True, out=out)["written"] == 2
+    assert [doc_id for doc_id, _ in read_snapshot(out)] == ["a", "c"]
+
+
+def test_parquet_round_trip(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "rooms.parquet")
+    # an int price and an unknown field do not fit a typed column and go through `extra`
+    docs = [("a", room()), ("b", room(price=900, walkMins=None, custom={"k": [1, None]}))]
+    assert write_snapshot(path, docs) == 2
+    assert list(read_snapshot(path)) == docs
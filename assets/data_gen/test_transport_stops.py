@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from transport_stops import StopGrid
+
+
+def linear_scan(stop_e, stop_n, e, n):
+    d2 = (stop_e[None, :] - e[:, None]) ** 2 + (stop_n[None, :] - n[:, None]) ** 2
+    return np.sqrt(d2.min(axis=1))
+
+
+def test_nearest_matches_a_linear_scan():
+    rng = np.random.default_rng(0)
+    stop_e = 2_590_000 + rng.uniform(0, 20_000, 500)
+    stop_n = 1_110_000 + rng.uniform(0, 15_000, 500)
+    # queries inside the grid, around it and far outside it
+    e = np.concatenate([2_590_000 + rng.uniform(-3_000, 23_000, 1000), [2_500_000.0, 2_700_000.0]])
+    n = np.concatenate([1_110_000 + rng.uniform(-3_000, 18_000, 1000), [1_000_000.0, 1_200_000.0]])
+
+    grid = StopGrid(stop_e, stop_n, cell_size=700)
+    index, distance = grid.nearest(e, n)
+
+    expected = linear_scan(stop_e, stop_n, e, n)
+    assert distance == pytest.approx(expected)
+    # the returned index refers to the stops in their original order
+    assert np.hypot(stop_e[index] - e, stop_n[index] - n) == pytest.approx(expected)
+
+
+def test_sparse_grid_searches_beyond_empty_cells():
+    # two stops 50 km apart: most cells are empty
+    grid = StopGrid([0.0, 50_000.0], [0.0, 0.0], cell_size=500)
+    index, distance = grid.nearest([26_000.0, 1_000.0], [0.0, 200.0])
+    assert index.tolist() == [1, 0]
+    assert distance == pytest.approx([24_000.0, np.hypot(1_000, 200)])
+
+
+def test_ties_and_duplicate_stops():
+    grid = StopGrid([0.0, 100.0, 100.0], [0.0, 0.0, 0.0], cell_size=50)
+    index, distance = grid.nearest([50.0, 100.0], [0.0, 0.0])
+    assert distance.tolist() == [50.0, 0.0]
+    assert index[1] in (1, 2)
+
+
+def test_scalar_and_empty_queries():
+    grid = StopGrid([0.0, 10.0], [0.0, 0.0])
+    index, distance = grid.nearest(9.0, 0.0)
+    assert index.tolist() == [1] and distance.tolist() == [1.0]
+    index, distance = grid.nearest([], [])
+    assert len(index) == 0 and len(distance) == 0
+
+
+def test_from_layout_answers_like_the_built_grid():
+    rng = np.random.default_rng(1)
+    stop_e, stop_n = rng.uniform(0, 5_000, 200), rng.uniform(0, 5_000, 200)
+    built = StopGrid(stop_e, stop_n, cell_size=400)
+    loaded = StopGrid.from_layout(built.e, built.n, built.offsets, built.shape, built.cell_size, built.origin)
+
+    e, n = rng.uniform(-500, 5_500, 300), rng.uniform(-500, 5_500, 300)
+    built_index, built_distance = built.nearest(e, n)
+    loaded_index, loaded_distance = loaded.nearest(e, n)
+    assert loaded_distance == pytest.approx(built_distance)
+    # the loaded grid indexes the stops in cell order
+    assert built.order[loaded_index].tolist() == built_index.tolist()
@@ -0,0 +1,197 @@
+"""Nearest public transport stop for many rooms at once.
+
+The app looks up the nearest stop of an address by scanning every row of
+assets/PointExploitation.csv (TransportStopService.findNearestStop). For the
+import we build a uniform grid over the stops' LV95 E/N coordinates once and
+answer the nearest-stop query for a whole chunk of rooms with NumPy.
+
+Usage (checks the grid against a brute-force scan and times both):
+    python transport_stops.py --rooms synthetic_valais_price.csv
+"""
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+
+STOPS_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "PointExploitation.csv")
+# Passenger stops; bifurcations, depots, service stations etc. are skipped
+STOP_TYPES = ("Arrêt", "Arrêt et Point de chargement")
+WALK_SPEED_M_PER_MIN = 80
+DEFAULT_CELL_M = 500
+
+
+def wgs84_to_lv95(lat, lng):
+    """Approximate WGS84 -> LV95 (swisstopo formulas, same as SwissProjection.wgs84ToLv95 in the app)"""
+    lat_aux = (np.asarray(lat, dtype=np.float64) * 3600 - 169028.66) / 10000
+    lng_aux = (np.asarray(lng, dtype=np.float64) * 3600 - 26782.5) / 10000
+    e = (2600000 + 211455.93 * lng_aux - 10938.51 * lng_aux * lat_aux
+         - 0.36 * lng_aux * lat_aux ** 2 - 44.54 * lng_aux ** 3)
+    n = (1200000 + 308807.95 * lat_aux + 3745.25 * lng_aux ** 2 + 76.63 * lat_aux ** 2
+         - 194.56 * lng_aux ** 2 * lat_aux + 119.79 * lat_aux ** 3)
+    return e, n
+
+
+def walk_minutes(distance_m):
+    return int(distance_m / WALK_SPEED_M_PER_MIN)
+
+
+def load_stops(path=STOPS_CSV, stop_types=STOP_TYPES):
+    """(ids, names, e, n) of the stops in PointExploitation.csv; ids are the xtf_id the app uses"""
+    ids, names, e, n = [], [], [], []
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            if stop_types and row["TypePointExploitation_Designation"] not in stop_types:
+                continue
+            if not row["E"] or not row["N"]:
+                continue
+            ids.append(row["xtf_id"])
+            names.append(row["Nom"])
+            e.append(float(row["E"]))
+            n.append(float(row["N"]))
+    return np.array(ids), np.array(names), np.array(e), np.array(n)
+
+
+class StopGrid:
+    """Uniform grid over LV95 points: stops sorted by cell plus CSR offsets per cell.
+
+    nearest() processes every query at once: it looks at the (2r+1)x(2r+1)
+    block of cells around each query for r = 0, 1, 2, ... and keeps the
+    queries whose best candidate is closer than r cells, which no stop outside
+    the block can beat. Results are exact.
+    """
+
+    def __init__(self, e, n, cell_size=DEFAULT_CELL_M):
+        e, n = np.asarray(e, dtype=np.float64), np.asarray(n, dtype=np.float64)
+        self.cell_size = float(cell_size)
+        self.origin = (e.min(), n.min())
+        self.shape = (int((e.max() - self.origin[0]) // cell_size) + 1,
+                      int((n.max() - self.origin[1]) // cell_size) + 1)
+        cells = self._cell_ids(*self._cells(e, n))
+        self.order = np.argsort(cells, kind="stable")  # grid position -> original stop index
+        self.e, self.n = e[self.order], n[self.order]
+        self.offsets = np.searchsorted(cells[self.order], np.arange(self.shape[0] * self.shape[1] + 1))
+
+    @classmethod
+    def from_layout(cls, e, n, offsets, shape, cell_size, origin=(0.0, 0.0)):
+        """Grid over points already sorted by cell (e.g. read from a stop asset), without copying them"""
+        grid = cls.__new__(cls)
+        grid.cell_size = float(cell_size)
+        grid.origin = origin
+        grid.shape = tuple(shape)
+        grid.e, grid.n, grid.offsets = e, n, offsets
+        grid.order = np.arange(len(e))
+        return grid
+
+    def _cells(self, e, n):
+        cx = np.floor((e - self.origin[0]) / self.cell_size).astype(np.int64)
+        cy = np.floor((n - self.origin[1]) / self.cell_size).astype(np.int64)
+        return cx, cy
+
+    def _cell_ids(self, cx, cy):
+        return cx * self.shape[1] + cy
+
+    def nearest(self, e, n):
+        """(stop index, distance in meters) of the nearest stop for every query point"""
+        e, n = np.atleast_1d(np.asarray(e, dtype=np.float64)), np.atleast_1d(np.asarray(n, dtype=np.float64))
+        best_idx = np.full(len(e), -1, dtype=np.int64)
+        best_d2 = np.full(len(e), np.inf)
+        cx, cy = self._cells(e, n)
+        pending = np.arange(len(e))
+        outside = max(0, -cx.min(), -cy.min(), cx.max() - self.shape[0], cy.max() - self.shape[1]) if len(e) else 0
+        max_radius = max(self.shape) + int(outside)
+        for r in range(max_radius + 1):
+            if not len(pending):
+                break
+            self._scan(pending, cx, cy, e, n, r, best_idx, best_d2)
+            done = best_d2[pending] <= (r * self.cell_size) ** 2
+            pending = pending[~done]
+        return self.order[best_idx], np.sqrt(best_d2)
+
+    def _scan(self, queries, cx, cy, e, n, r, best_idx, best_d2):
+        """Update best_* for `queries` with the stops in the cells at Chebyshev distance r"""
+        dx, dy = np.meshgrid(np.arange(-r, r + 1), np.arange(-r, r + 1), indexing="ij")
+        ring = np.maximum(abs(dx), abs(dy)) == r  # the inner cells were scanned for r - 1
+        dx, dy = dx[ring], dy[ring]
+        qx, qy = cx[queries, None] + dx, cy[queries, None] + dy
+        valid = (qx >= 0) & (qx < self.shape[0]) & (qy >= 0) & (qy < self.shape[1])
+        owner = np.broadcast_to(queries[:, None], qx.shape)[valid]
+        cell = self._cell_ids(qx[valid], qy[valid])
+        starts = self.offsets[cell].astype(np.int64)
+        counts = self.offsets[cell + 1].astype(np.int64) - starts
+        if not counts.sum():
+            return
+        # flatten the stop ranges of all (query, cell) pairs
+        owner = np.repeat(owner, counts)
+        first = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        stop = first + np.arange(counts.sum())
+        d2 = (self.e[stop] - e[owner]) ** 2 + (self.n[stop] - n[owner]) ** 2
+        # candidates are grouped by query already: minimum per group, then its first position
+        group = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        minimum = np.minimum.reduceat(d2, group)
+        hits = np.flatnonzero(d2 == np.repeat(minimum, np.diff(np.r_[group, len(d2)])))
+        hits = hits[np.r_[True, owner[hits[1:]] != owner[hits[:-1]]]]
+        owner, stop, d2 = owner[hits], stop[hits], d2[hits]
+        better = d2 < best_d2[owner]
+        best_idx[owner[better]] = stop[better]
+        best_d2[owner[better]] = d2[better]
+
+
+class StopIndex:
+    """Stops of PointExploitation.csv with a StopGrid, queried in WGS84"""
+
+    def __init__(self, path=STOPS_CSV, cell_size=DEFAULT_CELL_M):
+        self.ids, self.names, e, n = load_stops(path)
+        self.grid = StopGrid(e, n, cell_size)
+
+    def nearest(self, lat, lng):
+        """(stop ids, distances in meters) for arrays of room coordinates"""
+        idx, distance = self.grid.nearest(*wgs84_to_lv95(lat, lng))
+        return self.ids[idx], distance
+
+
+def brute_force_nearest(stop_e, stop_n, e, n, block=2048):
+    """Linear scan over every stop, what the app does per lookup (reference for checks)"""
+    idx = np.empty(len(e), dtype=np.int64)
+    for start in range(0, len(e), block):
+        d2 = (e[start:start + block, None] - stop_e) ** 2 + (n[start:start + block, None] - stop_n) ** 2
+        idx[start:start + block] = d2.argmin(axis=1)
+    return idx, np.hypot(stop_e[idx] - e, stop_n[idx] - n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stops", default=STOPS_CSV)
+    parser.add_argument("--rooms", default="synthetic_valais_price.csv", help="CSV with latitude/longitude columns")
+    parser.add_argument("--cell-size", type=float, default=DEFAULT_CELL_M)
+    parser.add_argument("--repeat", type=int, default=200, help="tile the rooms this many times for timing")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    ids, names, stop_e, stop_n = load_stops(args.stops)
+    t1 = time.perf_counter()
+    grid = StopGrid(stop_e, stop_n, args.cell_size)
+    t2 = time.perf_counter()
+    print(f"📍 {len(ids)} stops loaded in {t1 - t0:.2f}s, grid {grid.shape[0]}x{grid.shape[1]} built in {(t2 - t1) * 1000:.1f} ms")
+
+    with open(args.rooms, "r", encoding="utf-8", newline="") as f:
+        rooms = list(csv.DictReader(f))
+    lat = np.tile([float(r["latitude"]) for r in rooms], args.repeat)
+    lng = np.tile([float(r["longitude"]) for r in rooms], args.repeat)
+    e, n = wgs84_to_lv95(lat, lng)
+
+    t0 = time.perf_counter()
+    idx, distance = grid.nearest(e, n)
+    t1 = time.perf_counter()
+    ref_idx, ref_distance = brute_force_nearest(stop_e, stop_n, e, n)
+    t2 = time.perf_counter()
+    grid_s, scan_s = t1 - t0, t2 - t1
+    print(f"grid:        {len(e)} rooms in {grid_s:.3f}s ({len(e) / grid_s:,.0f} rooms/s)")
+    print(f"linear scan: {len(e)} rooms in {scan_s:.3f}s ({len(e) / scan_s:,.0f} rooms/s, NumPy-vectorized)")
+    print(f"same distance as the linear scan: {np.mean(np.isclose(distance, ref_distance)):.2%}, "
+          f"median {np.median(distance):.0f} m, max {distance.max():.0f} m")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import asyncio, time, logging
+from collections import deque
+
+logger = logging.getLogger("face-api")
+
+
+class Overloaded(Exception):
+    """The request cannot be admitted now; the client should retry after `retry_after` seconds"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PayloadTooLarge(ValueError):
+    """The request alone needs more memory than the whole budget"""
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before a stage started, the stage was skipped"""
+
+
+def check_deadline(deadline: float, stage: str):
+    if deadline is not None and time.monotonic() > deadline:
+        raise DeadlineExceeded(f"Deadline passed before {stage}")
+
+
+def run_before(deadline: float, stage: str, fn, *args):
+    """Worker-side wrapper: run fn(*args) only if the deadline has not passed yet.
+
+    Jobs can wait in a worker's queue; checking when the job starts skips the
+    detection of requests whose client has already given up. time.monotonic()
+    is system-wide on Linux, so deadlines also hold in process workers.
+    """
+    check_deadline(deadline, stage)
+    return fn(*args)
+
+
+class AdmissionController:
+    """Memory-budget admission control with a bounded FIFO wait queue.
+
+    Every request declares what it will hold in memory (payload plus the
+    decoded images). It is admitted while the sum over admitted requests stays
+    within `budget_bytes`, otherwise it waits in line. A full line or a
+    deadline reached while waiting raises Overloaded, which the server turns
+    into 503 + Retry-After. The line is strictly FIFO so large requests are
+    not starved by small ones.
+
+    Not thread-safe, it is only used from the event loop.
+    """
+
+    def __init__(self, budget_bytes: int, max_queue: int = 32, retry_after: float = 2.0):
+        if budget_bytes <= 0:
+            raise ValueError(f"Memory budget must be > 0, got {budget_bytes}")
+        self.budget = budget_bytes
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.in_use = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self._waiters = deque()  # [(cost, future)] in arrival order
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, cost: int, deadline: float = None):
+        """Wait until `cost` bytes fit in the budget, or raise Overloaded/PayloadTooLarge"""
+        if cost > self.budget:
+            raise PayloadTooLarge(
+                f"Request needs {cost / 2**20:.0f} MB, more than the {self.budget / 2**20:.0f} MB memory budget"
+            )
+        if not self._waiters and self.in_use + cost <= self.budget:
+            self.in_use += cost
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"Server busy: {len(self._waiters)} requests already waiting", self.retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (cost, future)
+        self._waiters.append(waiter)
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return  # admitted right as the deadline passed, the caller's next check handles it
+            self._remove(waiter)
+            self.expired += 1
+            raise Overloaded("Server busy: deadline reached while waiting for admission", self.retry_after)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(cost)  # the client went away right after admission
+            else:
+                self._remove(waiter)
+            raise
+
+    def release(self, cost: int):
+        self.in_use -= cost
+        self._wake()
+
+    def _remove(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        self._wake()  # the head of the line may fit now
+
+    def _wake(self):
+        while self._waiters:
+            cost, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if self.in_use + cost > self.budget:
+                break
+            self._waiters.popleft()
+            self.in_use += cost
+            self.admitted += 1
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "budget_mb": round(self.budget / 2**20, 1),
+            "in_use_mb": round(self.in_use / 2**20, 1),
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+        }
@@ -0,0 +1,109 @@
+"""Before/after latency of one verification: two detection passes vs one.
+
+"before" is the original /verify path: validate_faces() with MTCNN on both
+images, then DeepFace.verify() which detects both faces again.
+"after" is the single-pass pipeline of face_pipeline (detect_image + embed_faces).
+
+Usage (from assets/face-api_server):
+    python bench/detection_passes.py --images path/to/faces --repeat 5 --out detection_passes.json
+
+Every image of the directory must contain exactly one face; each image is
+verified against itself and against the next image of the directory.
+"""
+import argparse, glob, json, os, sys, time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import face_pipeline
+from deepface import DeepFace
+from deepface.detectors import FaceDetector
+
+
+def two_pass_verify(profile_raw: bytes, login_raw: bytes) -> float:
+    """Original server behaviour, kept here only as the baseline"""
+    img1, _ = face_pipeline.bytes_to_rgb_array(profile_raw)
+    img2, _ = face_pipeline.bytes_to_rgb_array(login_raw)
+    detector = face_pipeline.load_models()
+    for image in (img1, img2):
+        faces = FaceDetector.detect_faces(detector, face_pipeline.DETECTOR_BACKEND, image, align=False)
+        if len(faces) != 1:
+            raise ValueError(f"Expected one face, found {len(faces)}")
+    result = DeepFace.verify(
+        img1_path=img1,
+        img2_path=img2,
+        model_name=face_pipeline.MODEL_NAME,
+        detector_backend=face_pipeline.DETECTOR_BACKEND,
+        enforce_detection=False
+    )
+    return float(result["distance"])
+
+
+def single_pass_verify(profile_raw: bytes, login_raw: bytes) -> float:
+    profile_embedding = face_pipeline.embed_image(profile_raw)
+    login_embedding = face_pipeline.embed_image(login_raw)
+    return face_pipeline.compare_embeddings(profile_embedding, login_embedding)["distance"]
+
+
+def summarize(samples: list) -> dict:
+    ms = np.asarray(samples) * 1000
+    return {
+        "runs": len(ms),
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="directory of single-face .jpg/.png images")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="optional JSON output file")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")) + glob.glob(os.path.join(args.images, "*.png")))
+    if not paths:
+        sys.exit(f"No images found in {args.images}")
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    pairs = [(images[i], images[i]) for i in range(len(images))]
+    pairs += [(images[i], images[(i + 1) % len(images)]) for i in range(len(images)) if len(images) > 1]
+
+    face_pipeline.load_models()
+    single_pass_verify(*pairs[0])  # warm up TensorFlow before timing anything
+
+    timings = {"two_pass": [], "single_pass": []}
+    max_distance_delta = 0.0
+    for _ in range(args.repeat):
+        for profile_raw, login_raw in pairs:
+            t0 = time.perf_counter()
+            before = two_pass_verify(profile_raw, login_raw)
+            t1 = time.perf_counter()
+            after = single_pass_verify(profile_raw, login_raw)
+            t2 = time.perf_counter()
+            timings["two_pass"].append(t1 - t0)
+            timings["single_pass"].append(t2 - t1)
+            max_distance_delta = max(max_distance_delta, abs(before - after))
+
+    report = {name: summarize(samples) for name, samples in timings.items()}
+    report["speedup"] = round(report["two_pass"]["mean_ms"] / report["single_pass"]["mean_ms"], 2)
+    report["max_distance_delta"] = max_distance_delta
+    report["pairs"] = len(pairs)
+
+    print(f"{'path':<12} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for name in timings:
+        r = report[name]
+        print(f"{name:<12} {r['mean_ms']:>10} {r['p50_ms']:>10} {r['p95_ms']:>10}")
+    print(f"speedup x{report['speedup']}, max |distance delta| {max_distance_delta:.6f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
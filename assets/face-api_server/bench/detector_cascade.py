@@ -0,0 +1,154 @@
+"""Latency and agreement of the detection cascade against the full detector alone.
+
+Every image of --images is decoded like a request (FACE_API_MAX_DETECTION_EDGE)
+and detected twice: by the full detector alone (FACE_API_DETECTOR, MTCNN by
+default), the reference, and by the cascade (FACE_API_CASCADE, the fast
+detector first). Reported:
+- detection latency of both paths (mean/p50/p95) and the share of images the
+  fast detector decided alone
+- outcome agreement (one face / no face / several faces) with the reference
+- for images where both found one face: box IoU and the Facenet512 distance
+  between the embeddings of the two crops
+- verification agreement: each image verified against the next one with the
+  reference crops and with the cascade crops, same decision or not
+
+Use mostly single-face selfies, plus a few photos with no face or several
+faces to check the rejections. The fast detector needs its model in
+FACE_API_ONNX_DIR (face_detection_yunet_2023mar.onnx, see TECH_GUIDE.md).
+
+Usage (from assets/face-api_server):
+    FACE_API_CASCADE=yunet python bench/detector_cascade.py --images path/to/faces --repeat 3 --out cascade.json
+"""
+import argparse, glob, json, os, sys, time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import face_pipeline
+from face_pipeline import NoFaceError, MultipleFacesError
+
+
+def detect(image: np.ndarray, cascade: bool) -> dict:
+    t0 = time.perf_counter()
+    try:
+        face, region, detector = face_pipeline.detect_single_face(image, cascade=cascade)
+        found = {"outcome": "face", "face": face, "region": region, "detector": detector}
+    except NoFaceError:
+        found = {"outcome": "no_face", "detector": None}
+    except MultipleFacesError:
+        found = {"outcome": "multiple_faces", "detector": None}
+    found["seconds"] = time.perf_counter() - t0
+    return found
+
+
+def iou(a, b) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    union = aw * ah + bw * bh - w * h
+    return w * h / union if union else 0.0
+
+
+def embed(found: dict):
+    if found["outcome"] != "face":
+        return None
+    return face_pipeline.embed_faces(face_pipeline.preprocess_face(found["face"]))[0]
+
+
+def summarize(samples: list) -> dict:
+    ms = np.asarray(samples) * 1000
+    return {
+        "runs": len(ms),
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="directory of .jpg/.png photos")
+    parser.add_argument("--repeat", type=int, default=3, help="timed detections per image and path")
+    parser.add_argument("--out", help="optional JSON output file")
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.images, "*.jpg")) + glob.glob(os.path.join(args.images, "*.png")))
+    if not paths:
+        sys.exit(f"No images found in {args.images}")
+    face_pipeline.load_models()
+    if face_pipeline.fast_detector is None:
+        sys.exit("The cascade is off: set FACE_API_CASCADE=yunet and put its model in FACE_API_ONNX_DIR")
+
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(face_pipeline.bytes_to_rgb_array(f.read(), face_pipeline.MAX_DETECTION_EDGE)[0])
+    detect(images[0], cascade=True), detect(images[0], cascade=False)  # warm up both paths
+
+    timings = {"reference": [], "cascade": []}
+    results = []
+    for image in images:
+        for _ in range(args.repeat):
+            reference = detect(image, cascade=False)
+            cascade = detect(image, cascade=True)
+            timings["reference"].append(reference["seconds"])
+            timings["cascade"].append(cascade["seconds"])
+        results.append((reference, cascade))
+
+    decided_fast = sum(c["detector"] == face_pipeline.fast_detector.name for _, c in results)
+    agree = sum(r["outcome"] == c["outcome"] for r, c in results)
+    both = [(r, c) for r, c in results if r["outcome"] == c["outcome"] == "face"]
+    ious = [iou(r["region"], c["region"]) for r, c in both]
+    embeddings = [(embed(r), embed(c)) for r, c in results]
+    crop_distances = [face_pipeline.cosine_distance(r, c) for r, c in embeddings if r is not None and c is not None]
+
+    pairs = decisions_agree = 0
+    for i in range(len(images) - 1):
+        (r1, c1), (r2, c2) = embeddings[i], embeddings[i + 1]
+        if r1 is None or r2 is None or c1 is None or c2 is None:
+            continue
+        pairs += 1
+        decisions_agree += (face_pipeline.compare_embeddings(r1, r2)["verified"]
+                            == face_pipeline.compare_embeddings(c1, c2)["verified"])
+
+    report = {name: summarize(samples) for name, samples in timings.items()}
+    report.update({
+        "reference_detector": face_pipeline.DETECTOR_BACKEND,
+        "cascade_detector": face_pipeline.fast_detector.name,
+        "images": len(images),
+        "speedup": round(report["reference"]["mean_ms"] / report["cascade"]["mean_ms"], 2),
+        "decided_by_fast_detector": round(decided_fast / len(images), 3),
+        "outcome_agreement": round(agree / len(images), 3),
+        "disagreements": [
+            {"image": os.path.basename(path), "reference": r["outcome"], "cascade": c["outcome"]}
+            for path, (r, c) in zip(paths, results) if r["outcome"] != c["outcome"]
+        ],
+        "box_iou_mean": round(float(np.mean(ious)), 3) if ious else None,
+        "box_iou_min": round(float(np.min(ious)), 3) if ious else None,
+        "crop_distance_mean": round(float(np.mean(crop_distances)), 4) if crop_distances else None,
+        "crop_distance_max": round(float(np.max(crop_distances)), 4) if crop_distances else None,
+        "verification_pairs": pairs,
+        "verification_agreement": round(decisions_agree / pairs, 3) if pairs else None,
+    })
+
+    print(f"{'path':<10} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for name in timings:
+        r = report[name]
+        print(f"{name:<10} {r['mean_ms']:>10} {r['p50_ms']:>10} {r['p95_ms']:>10}")
+    print(f"speedup x{report['speedup']}, {report['decided_by_fast_detector']:.0%} decided by "
+          f"{report['cascade_detector']}, outcome agreement {report['outcome_agreement']:.1%}")
+    print(f"box IoU mean {report['box_iou_mean']} min {report['box_iou_min']}, crop embedding distance "
+          f"mean {report['crop_distance_mean']} max {report['crop_distance_max']} "
+          f"(threshold {face_pipeline.THRESHOLD})")
+    if pairs:
+        print(f"verification agreement {report['verification_agreement']:.1%} over {pairs} pairs")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Query latency of the /identify embedding index at growing user counts.
+
+For every size, synthetic unit-norm 512-d profile embeddings are indexed
+with each index variant, then queried with noisy copies of random stored
+profiles (a login selfie is never identical to the profile picture).
+Reports build time, memory, p50/p95 query latency and, for the approximate
+variants, recall@1 against the exact search.
+
+Usage (from assets/face-api_server):
+    python bench/index_search.py --sizes 10000,100000,1000000 --queries 200 --out index_search.json
+
+1M float32 profiles take 2 GB per index; variants are built one at a time.
+"""
+import argparse, gc, json, os, sys, time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_index import EmbeddingIndex, PartitionedEmbeddingIndex
+
+DIM = 512
+CHUNK = 100_000
+
+
+def profiles(size: int, seed: int):
+    """Deterministic (uids, embeddings) chunks, so every variant indexes the same data"""
+    rng = np.random.default_rng(seed)
+    for start in range(0, size, CHUNK):
+        n = min(CHUNK, size - start)
+        yield [f"user{i}" for i in range(start, start + n)], rng.standard_normal((n, DIM), dtype=np.float32)
+
+
+def make_queries(size: int, count: int, noise: float, seed: int) -> tuple:
+    """Noisy copies of `count` random stored profiles and their UIDs"""
+    targets = np.sort(np.random.default_rng(seed + 1).choice(size, count, replace=False))
+    vectors = np.empty((count, DIM), dtype=np.float32)
+    found = 0
+    for start, (_, chunk) in zip(range(0, size, CHUNK), profiles(size, seed)):
+        inside = targets[(targets >= start) & (targets < start + len(chunk))]
+        vectors[found:found + len(inside)] = chunk[inside - start]
+        found += len(inside)
+    rng = np.random.default_rng(seed + 2)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors += rng.standard_normal(vectors.shape, dtype=np.float32) * noise / np.sqrt(DIM)
+    return [f"user{i}" for i in targets], vectors
+
+
+def build(variant: dict, size: int, seed: int):
+    t0 = time.perf_counter()
+    if variant["kind"] == "ivf":
+        index = PartitionedEmbeddingIndex(DIM, variant["dtype"], variant["lists"], variant["probe"])
+    else:
+        index = EmbeddingIndex(DIM, variant["dtype"], capacity=size)
+    for uids, chunk in profiles(size, seed):
+        index.add_many(uids, chunk)
+    if variant["kind"] == "ivf":
+        index.train()
+    return index, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma separated user counts")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5, help="query noise (L2 norm relative to the profile)")
+    parser.add_argument("--probe", type=int, default=8, help="partitions scanned per query by the ivf index")
+    parser.add_argument("--lists", type=int, default=0, help="ivf partitions, 0 = sqrt(size)")
+    parser.add_argument("--variants", default="exact-float32,exact-float16,ivf-float32")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="optional JSON output file")
+    args = parser.parse_args()
+
+    variants = []
+    for name in args.variants.split(","):
+        kind, dtype = name.split("-")
+        variants.append({"name": name, "kind": kind, "dtype": dtype, "lists": args.lists, "probe": args.probe})
+
+    report = {"dim": DIM, "queries": args.queries, "noise": args.noise, "results": []}
+    print(f"{'size':>9} {'variant':<15} {'build s':>8} {'MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'recall@1':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        expected, queries = make_queries(size, min(args.queries, size), args.noise, args.seed)
+        for variant in variants:
+            index, build_seconds = build(variant, size, args.seed)
+            index.search(queries[0])  # first call allocates
+            latencies, hits = [], 0
+            for uid, query in zip(expected, queries):
+                t0 = time.perf_counter()
+                best = index.search(query, 1)[0][0]
+                latencies.append(time.perf_counter() - t0)
+                hits += best == uid
+            ms = np.asarray(latencies) * 1000
+            row = {
+                "size": size,
+                "variant": variant["name"],
+                "build_s": round(build_seconds, 2),
+                "memory_mb": round(index.memory_bytes() / 2**20, 1),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "recall_at_1": round(hits / len(expected), 4),
+                **({"lists": len(index._lists), "probe": index.n_probe} if variant["kind"] == "ivf" else {}),
+            }
+            report["results"].append(row)
+            print(f"{size:>9} {row['variant']:<15} {row['build_s']:>8} {row['memory_mb']:>8} "
+                  f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['recall_at_1']:>9}")
+            del index
+            gc.collect()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Accuracy parity, latency and memory of the inference backends.
+
+Every backend runs in its own Python process (so RSS and cold start are not
+shared): TensorFlow, ONNX Runtime float32 and, if exported, ONNX Runtime int8.
+Each one loads and warms the models, then detects and embeds the same
+deterministic profile/selfie pairs built by loadtest.py from --images.
+Distances, face boxes and the verification decision of every ONNX backend
+are compared against TensorFlow.
+
+Usage (from assets/face-api_server, after `python export_onnx.py [--int8 ...]`):
+    python bench/inference_backends.py --images path/to/faces --repeat 5 --out inference_backends.json
+"""
+import argparse, json, os, resource, subprocess, sys, time
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCH_DIR)
+BACKENDS = {
+    "tensorflow": {"FACE_API_INFERENCE": "tensorflow"},
+    "onnx-fp32": {"FACE_API_INFERENCE": "onnx", "FACE_API_ONNX_PRECISION": "fp32"},
+    "onnx-int8": {"FACE_API_INFERENCE": "onnx", "FACE_API_ONNX_PRECISION": "int8"},
+}
+
+
+def percentiles(samples: list) -> dict:
+    ms = np.asarray(samples) * 1000
+    return {"p50_ms": round(float(np.percentile(ms, 50)), 2), "p95_ms": round(float(np.percentile(ms, 95)), 2)}
+
+
+def measure(images: str, repeat: int, seed: int, batch_size: int) -> dict:
+    """Child process: load the backend selected by the environment and time it"""
+    sys.path.insert(0, SERVER_DIR)
+    from loadtest import load_pairs
+
+    t0 = time.perf_counter()
+    import face_pipeline
+    import_seconds = time.perf_counter() - t0
+    face_pipeline.load_models()
+    cold_start = time.perf_counter() - t0
+
+    pairs = load_pairs(images, seed)
+    detect_times, embed_times, pair_results = [], [], []
+    for run in range(repeat):
+        for profile_raw, login_raw in pairs:
+            t0 = time.perf_counter()
+            profile = face_pipeline.detect_image(profile_raw)
+            login = face_pipeline.detect_image(login_raw)
+            t1 = time.perf_counter()
+            embeddings = face_pipeline.embed_faces(np.concatenate([profile["pixels"], login["pixels"]]))
+            t2 = time.perf_counter()
+            detect_times.append((t1 - t0) / 2)
+            embed_times.append(t2 - t1)
+            if run == 0:
+                result = face_pipeline.compare_embeddings(embeddings[0], embeddings[1])
+                pair_results.append({
+                    "distance": result["distance"],
+                    "verified": bool(result["verified"]),
+                    "boxes": [profile["facial_area"], login["facial_area"]],
+                })
+
+    crops = np.concatenate([face_pipeline.detect_image(raw)["pixels"] for pair in pairs for raw in pair])
+    batch = np.resize(crops, (batch_size, *crops.shape[1:]))
+    batch_times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        face_pipeline.embed_faces(batch)
+        batch_times.append(time.perf_counter() - t0)
+
+    return {
+        "import_s": round(import_seconds, 2),
+        "cold_start_s": round(cold_start, 2),
+        "warm_up": {stage: round(seconds, 3) for stage, seconds in face_pipeline.warm_up_timings.items()},
+        "detection": percentiles(detect_times),
+        "embedding_pair": percentiles(embed_times),
+        f"embedding_batch_{batch_size}": percentiles(batch_times),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "pairs": pair_results,
+    }
+
+
+def compare(reference: list, candidate: list) -> dict:
+    deltas = [abs(r["distance"] - c["distance"]) for r, c in zip(reference, candidate)]
+    box_shift = max(
+        abs(rb[k] - cb[k])
+        for r, c in zip(reference, candidate)
+        for rb, cb in zip(r["boxes"], c["boxes"])
+        for k in ("x", "y", "w", "h")
+    )
+    return {
+        "max_distance_delta": round(max(deltas), 6),
+        "mean_distance_delta": round(float(np.mean(deltas)), 6),
+        "decision_agreement": sum(r["verified"] == c["verified"] for r, c in zip(reference, candidate)) / len(reference),
+        "max_box_shift_px": box_shift,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="directory of single-face .jpg/.png images")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--out", help="optional JSON output file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.images, args.repeat, args.seed, args.batch_size)))
+        return
+
+    report = {}
+    for name in args.backends.split(","):
+        env = {**os.environ, **BACKENDS[name]}
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", name, "--images", args.images,
+             "--repeat", str(args.repeat), "--seed", str(args.seed), "--batch-size", str(args.batch_size)],
+            cwd=SERVER_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"❌ {name} failed:\n{proc.stderr[-2000:]}")
+            continue
+        report[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    if "tensorflow" in report:
+        for name, result in report.items():
+            if name != "tensorflow":
+                result["parity"] = compare(report["tensorflow"]["pairs"], result["pairs"])
+
+    batch_key = f"embedding_batch_{args.batch_size}"
+    print(f"{'backend':<12} {'cold s':>7} {'RSS MB':>8} {'detect p50':>11} {'pair emb p50':>13} "
+          f"{'batch p50':>10} {'max |Δd|':>9} {'agree':>6}")
+    for name, r in report.items():
+        parity = r.get("parity", {})
+        print(f"{name:<12} {r['cold_start_s']:>7} {r['peak_rss_mb']:>8} {r['detection']['p50_ms']:>11} "
+              f"{r['embedding_pair']['p50_ms']:>13} {r[batch_key]['p50_ms']:>10} "
+              f"{parity.get('max_distance_delta', '-'):>9} {parity.get('decision_agreement', '-'):>6}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
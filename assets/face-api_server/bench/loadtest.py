@@ -0,0 +1,409 @@
+"""Closed-loop load test of POST /verify (or /verify/upload).
+
+Starts the API in a subprocess with the fake auth backend (no Firebase
+needed), waits for GET /ready, then keeps `--concurrency` clients busy until
+`--requests` verifications have completed. Reports throughput, latency
+percentiles, peak RSS of the server (all its processes) and a per-stage
+breakdown taken from the difference of two GET /metrics scrapes.
+
+Image pairs are built from a directory of single-face photos: each photo is
+the profile picture and a deterministic perturbation of it (mirror, exposure,
+JPEG re-encode, seeded by --seed) is the login selfie, so runs are repeatable.
+
+Usage (from assets/face-api_server):
+    python bench/loadtest.py --images path/to/faces --concurrency 8 --requests 200 \\
+        --workers 2 --batch-size 16 --out loadtest.json
+
+Pass --url to load an already running server instead (RSS is then not measured).
+Server settings (--executor, --workers, --batch-size, ...) are forwarded as
+FACE_API_* environment variables and recorded in the output file.
+"""
+import argparse, base64, glob, json, os, platform, re, subprocess, sys, threading, time
+import urllib.error, urllib.request, uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGE_METRIC = "face_api_stage_seconds"
+OUTCOME_METRIC = "face_api_requests_total"
+
+
+# -------------------------------
+# Image pairs
+# -------------------------------
+def perturb(raw: bytes, rng: np.random.Generator) -> bytes:
+    """A different but recognisable shot of the same face"""
+    img = cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Could not decode image")
+    if rng.random() < 0.5:
+        img = cv2.flip(img, 1)
+    img = cv2.convertScaleAbs(img, alpha=rng.uniform(0.85, 1.15), beta=rng.uniform(-15, 15))
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, int(rng.integers(75, 95))])
+    return buf.tobytes()
+
+
+def load_pairs(directory: str, seed: int) -> list:
+    """[(profile_bytes, login_bytes), ...] in a stable order"""
+    paths = sorted(glob.glob(os.path.join(directory, "*.jpg")) + glob.glob(os.path.join(directory, "*.png")))
+    if not paths:
+        sys.exit(f"No images found in {directory}")
+    rng = np.random.default_rng(seed)
+    pairs = []
+    for path in paths:
+        with open(path, "rb") as f:
+            raw = f.read()
+        pairs.append((raw, perturb(raw, rng)))
+    return pairs
+
+
+# -------------------------------
+# HTTP client
+# -------------------------------
+def data_url(raw: bytes) -> str:
+    return "data:image/jpeg;base64," + base64.b64encode(raw).decode()
+
+
+def json_request(base_url: str, uid: str, profile: bytes, login: bytes) -> urllib.request.Request:
+    body = json.dumps({"img1": data_url(profile), "img2": data_url(login), "filename": f"profile_{uid}.jpg"})
+    return urllib.request.Request(
+        f"{base_url}/verify", data=body.encode(), headers={"Content-Type": "application/json"}
+    )
+
+
+def multipart_request(base_url: str, uid: str, profile: bytes, login: bytes) -> urllib.request.Request:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, raw in (("img1", profile), ("img2", login)):
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}.jpg"\r\n'
+            f"Content-Type: image/jpeg\r\n\r\n".encode() + raw + b"\r\n"
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="filename"\r\n\r\nprofile_{uid}.jpg\r\n'
+        f"--{boundary}--\r\n".encode()
+    )
+    return urllib.request.Request(
+        f"{base_url}/verify/upload", data=b"".join(parts),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+
+
+def send(request: urllib.request.Request, timeout: float) -> tuple:
+    """(status, seconds); network errors are reported as status 0"""
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - t0
+
+
+def get(url: str, timeout: float = 5.0) -> tuple:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status, response.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode()
+    except (urllib.error.URLError, OSError):
+        return 0, ""
+
+
+# -------------------------------
+# Server process and RSS sampling
+# -------------------------------
+def start_server(args) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "FACE_API_AUTH_BACKEND": "fake",
+        "FACE_API_EXECUTOR": args.executor,
+        "FACE_API_WORKERS": str(args.workers),
+        "FACE_API_BATCH_SIZE": str(args.batch_size),
+        "FACE_API_BATCH_WAIT_MS": str(args.batch_wait_ms),
+        "FACE_API_MAX_DETECTION_EDGE": str(args.max_detection_edge),
+        "FACE_API_CACHE_DIR": "",  # memory only, every run starts cold
+    })
+    log = open(args.server_log, "w") if args.server_log else subprocess.DEVNULL
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def wait_ready(base_url: str, server: subprocess.Popen, timeout: float) -> float:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        if server is not None and server.poll() is not None:
+            sys.exit(f"Server exited with code {server.returncode} before becoming ready")
+        if get(f"{base_url}/ready")[0] == 200:
+            return time.perf_counter() - t0
+        time.sleep(0.5)
+    sys.exit(f"Server not ready after {timeout:.0f}s")
+
+
+def process_tree(pid: int) -> list:
+    """pid and all its descendants (Linux /proc)"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        p = stack.pop()
+        tree.append(p)
+        stack.extend(children.get(p, []))
+    return tree
+
+
+def rss_bytes(pid: int, field: str = "VmRSS") -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class RSSSampler(threading.Thread):
+    """Peak summed RSS of a process tree, sampled every `interval` seconds"""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, sum(rss_bytes(p) for p in process_tree(self.pid)))
+            self._stop_event.wait(self.interval)
+
+    def stop(self) -> dict:
+        self._stop_event.set()
+        self.join()
+        pids = process_tree(self.pid)
+        return {
+            "peak_rss_mb": round(self.peak / 2**20, 1),
+            "peak_rss_per_process_mb": {str(p): round(rss_bytes(p, "VmHWM") / 2**20, 1) for p in pids},
+        }
+
+
+# -------------------------------
+# /metrics parsing
+# -------------------------------
+SAMPLE_RE = re.compile(r'^(\w+?)(?:\{(.*)\})?\s+(\S+)$')
+LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_metrics(text: str) -> dict:
+    """{(name, frozenset(labels)): value} of a Prometheus text exposition"""
+    samples = {}
+    for line in text.splitlines():
+        match = SAMPLE_RE.match(line)
+        if not match or line.startswith("#"):
+            continue
+        name, labels, value = match.groups()
+        samples[(name, frozenset(LABEL_RE.findall(labels or "")))] = float(value)
+    return samples
+
+
+def histogram_quantile(q: float, buckets: list) -> float:
+    """Linear interpolation inside the bucket holding the q-quantile, like PromQL"""
+    total = buckets[-1][1]
+    if total <= 0:
+        return float("nan")
+    rank, prev_bound, prev_count = q * total, 0.0, 0.0
+    for bound, count in buckets:
+        if count >= rank:
+            if bound == float("inf"):
+                return prev_bound
+            return prev_bound + (bound - prev_bound) * (rank - prev_count) / max(count - prev_count, 1e-12)
+        prev_bound, prev_count = bound, count
+    return prev_bound
+
+
+def stage_breakdown(before: dict, after: dict) -> dict:
+    """Per-stage count, mean and estimated p50/p95 (ms) of the samples taken between two scrapes"""
+    def delta(key):
+        return after.get(key, 0.0) - before.get(key, 0.0)
+
+    stages = {}
+    for name, labels in after:
+        if name != f"{STAGE_METRIC}_count":
+            continue
+        stage = dict(labels)["stage"]
+        count = delta((name, labels))
+        if count <= 0:
+            continue
+        total = delta((f"{STAGE_METRIC}_sum", labels))
+        buckets = sorted(
+            (float(dict(l)["le"]), delta((n, l)))
+            for n, l in after
+            if n == f"{STAGE_METRIC}_bucket" and dict(l)["stage"] == stage
+        )
+        stages[stage] = {
+            "count": int(count),
+            "mean_ms": round(total / count * 1000, 2),
+            "p50_ms": round(histogram_quantile(0.50, buckets) * 1000, 2),
+            "p95_ms": round(histogram_quantile(0.95, buckets) * 1000, 2),
+        }
+    return stages
+
+
+def outcome_breakdown(before: dict, after: dict) -> dict:
+    return {
+        dict(labels)["outcome"]: int(value - before.get((name, labels), 0.0))
+        for (name, labels), value in after.items()
+        if name == OUTCOME_METRIC and value - before.get((name, labels), 0.0) > 0
+    }
+
+
+# -------------------------------
+# Load generation
+# -------------------------------
+def run_load(args, base_url: str, pairs: list, total: int, tag: str) -> dict:
+    build = multipart_request if args.endpoint == "upload" else json_request
+    # the same profile UID + picture on every round trip exercises the profile cache like real logins
+    requests = [
+        build(base_url, f"{tag}{i % len(pairs)}" if args.reuse_profiles else f"{tag}{i}", *pairs[i % len(pairs)])
+        for i in range(total)
+    ]
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def worker(request):
+        status, seconds = send(request, args.timeout)
+        with lock:
+            latencies.append(seconds)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, requests))
+    elapsed = time.perf_counter() - t0
+
+    ms = np.asarray(latencies) * 1000
+    return {
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "status": {str(k): v for k, v in sorted(statuses.items())},
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 2),
+            "p50": round(float(np.percentile(ms, 50)), 2),
+            "p95": round(float(np.percentile(ms, 95)), 2),
+            "p99": round(float(np.percentile(ms, 99)), 2),
+            "max": round(float(ms.max()), 2),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", required=True, help="directory of single-face .jpg/.png images")
+    parser.add_argument("--concurrency", type=int, default=4, help="simultaneous clients")
+    parser.add_argument("--requests", type=int, default=100, help="measured requests")
+    parser.add_argument("--warmup", type=int, default=4, help="requests sent (and discarded) before measuring")
+    parser.add_argument("--endpoint", choices=("json", "upload"), default="json",
+                        help="POST /verify (base64 JSON) or /verify/upload (multipart)")
+    parser.add_argument("--reuse-profiles", action="store_true",
+                        help="repeat UIDs so profile embeddings come from the cache after the first login")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout (s)")
+    parser.add_argument("--url", help="load this running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ready-timeout", type=float, default=600.0)
+    parser.add_argument("--server-log", help="file receiving the server's output")
+    parser.add_argument("--executor", choices=("thread", "process"), default="thread")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--batch-wait-ms", type=float, default=10)
+    parser.add_argument("--max-detection-edge", type=int, default=640)
+    parser.add_argument("--out", help="optional JSON output file")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.images, args.seed)
+    server = sampler = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args)
+
+    try:
+        startup_seconds = wait_ready(base_url, server, args.ready_timeout)
+        if server is not None:
+            sampler = RSSSampler(server.pid)
+            sampler.start()
+
+        if args.warmup:
+            run_load(args, base_url, pairs, args.warmup, tag="warmup")
+        before = parse_metrics(get(f"{base_url}/metrics")[1])
+        result = run_load(args, base_url, pairs, args.requests, tag="load")
+        after = parse_metrics(get(f"{base_url}/metrics")[1])
+        memory = sampler.stop() if sampler else {"peak_rss_mb": None}
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    report = {
+        "config": {
+            "endpoint": args.endpoint,
+            "concurrency": args.concurrency,
+            "pairs": len(pairs),
+            "reuse_profiles": args.reuse_profiles,
+            "seed": args.seed,
+            "server": "external" if args.url else {
+                "executor": args.executor,
+                "workers": args.workers,
+                "batch_size": args.batch_size,
+                "batch_wait_ms": args.batch_wait_ms,
+                "max_detection_edge": args.max_detection_edge,
+            },
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "startup_s": round(startup_seconds, 2),
+        **result,
+        **memory,
+        "outcomes": outcome_breakdown(before, after),
+        "stages": stage_breakdown(before, after),
+    }
+
+    lat = report["latency_ms"]
+    print(f"{report['requests']} requests in {report['elapsed_s']}s -> {report['throughput_rps']} req/s, "
+          f"status {report['status']}")
+    print(f"latency ms: p50 {lat['p50']}  p95 {lat['p95']}  p99 {lat['p99']}  max {lat['max']}")
+    print(f"peak RSS: {report['peak_rss_mb']} MB, outcomes {report['outcomes']}")
+    print(f"{'stage':<16} {'count':>7} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for stage, s in report["stages"].items():
+        print(f"{stage:<16} {s['count']:>7} {s['mean_ms']:>10} {s['p50_ms']:>10} {s['p95_ms']:>10}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
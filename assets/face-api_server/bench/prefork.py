@@ -0,0 +1,136 @@
+"""Memory per worker and throughput scaling of the pre-fork server.
+
+For every worker count of --workers, starts `prefork.py` (models loaded once
+in the parent, workers forked copy-on-write) and, for comparison, uvicorn
+with FACE_API_EXECUTOR=process (every worker process loads its own models),
+both with the ONNX backend and the fake auth backend. Reports per-process
+USS (memory only that process uses), PSS and RSS, and the throughput of a
+closed-loop load with 2 clients per worker.
+
+With --images the load is real verifications (see loadtest.py). Without, it
+is synthetic face-less photos, which still pay decoding and the full MTCNN
+detection but end in a 400 "no face" before the embedding.
+
+Usage (from assets/face-api_server):
+    python bench/prefork.py --workers 1 2 4 8 --images path/to/faces --out prefork.json
+"""
+import argparse, json, os, subprocess, sys, time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import SERVER_DIR, get, load_pairs, process_tree, run_load, wait_ready
+
+
+def smaps(pid: int) -> dict:
+    """USS/PSS/RSS in MB from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return {}
+    return {
+        "uss_mb": round(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), 1),
+        "pss_mb": round(fields.get("Pss", 0), 1),
+        "rss_mb": round(fields.get("Rss", 0), 1),
+    }
+
+
+def synthetic_pairs(count: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    pairs = []
+    for _ in range(count):
+        img = cv2.GaussianBlur(rng.integers(0, 256, (960, 1280, 3), dtype=np.uint8), (0, 0), 3)
+        raw = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()
+        pairs.append((raw, raw))
+    return pairs
+
+
+def start(mode: str, workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, FACE_API_AUTH_BACKEND="fake", FACE_API_INFERENCE="onnx", FACE_API_CACHE_DIR="")
+    if mode == "prefork":
+        cmd = [sys.executable, "prefork.py", "--workers", str(workers), "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning"]
+    else:
+        env.update(FACE_API_EXECUTOR="process", FACE_API_WORKERS=str(workers), FACE_API_ONNX_THREADS="1")
+        cmd = [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def measure(args, mode: str, workers: int, pairs: list) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = start(mode, workers, args.port)
+    try:
+        startup = wait_ready(base_url, server, args.ready_timeout)
+        if mode == "prefork":
+            # /ready answers from one worker, wait until all of them have started
+            while len(process_tree(server.pid)) < workers + 1:
+                time.sleep(0.2)
+        load = None
+        if args.requests:
+            run_load(args, base_url, pairs, max(workers * 2, 4), tag="warmup")
+            load = run_load(args, base_url, pairs, args.requests, tag=f"{mode}{workers}-")
+        processes = {str(pid): smaps(pid) for pid in process_tree(server.pid)}
+        get(f"{base_url}/health")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    # worker processes only, not helpers such as the multiprocessing resource tracker
+    children = [m for pid, m in processes.items() if int(pid) != server.pid and m.get("rss_mb", 0) > 100]
+    return {
+        "mode": mode,
+        "workers": workers,
+        "startup_s": round(startup, 2),
+        "total_pss_mb": round(sum(m.get("pss_mb", 0) for m in processes.values()), 1),
+        "worker_uss_mb": round(float(np.mean([m["uss_mb"] for m in children])), 1) if children else None,
+        "processes": processes,
+        "throughput_rps": load["throughput_rps"] if load else None,
+        "latency_ms": load["latency_ms"] if load else None,
+        "status": load["status"] if load else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", choices=("prefork", "process"), default=["prefork", "process"])
+    parser.add_argument("--images", help="directory of single-face .jpg/.png images (default: synthetic)")
+    parser.add_argument("--requests", type=int, default=100, help="measured requests per run, 0 = memory only")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--ready-timeout", type=float, default=600.0)
+    parser.add_argument("--out", help="optional JSON output file")
+    args = parser.parse_args()
+    args.endpoint, args.reuse_profiles = "json", False  # settings run_load reads
+
+    pairs = load_pairs(args.images, args.seed) if args.images else synthetic_pairs(8, args.seed)
+    report = {"cpus": os.cpu_count(), "load": "verify" if args.images else "synthetic_no_face", "runs": []}
+    for workers in args.workers:
+        args.concurrency = workers * 2
+        for mode in args.modes:
+            report["runs"].append(measure(args, mode, workers, pairs))
+
+    print(f"{'mode':<8} {'workers':>7} {'startup s':>10} {'total PSS MB':>13} {'USS/worker MB':>14} {'req/s':>8}")
+    for r in report["runs"]:
+        print(f"{r['mode']:<8} {r['workers']:>7} {r['startup_s']:>10} {r['total_pss_mb']:>13} "
+              f"{r['worker_uss_mb'] if r['worker_uss_mb'] is not None else '-':>14} "
+              f"{r['throughput_rps'] if r['throughput_rps'] is not None else '-':>8}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
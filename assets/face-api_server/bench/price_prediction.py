@@ -0,0 +1,69 @@
+"""Throughput of the price model per batch size.
+
+Batch size 1 is what the app does today (one interpreter run per room);
+larger sizes are what /predict-price and data_gen/predict_prices.py do by
+resizing the input tensor to the whole batch. The feature rows come from
+data_gen/synthetic_valais_price.csv, tiled to --rows.
+
+Usage (from assets/face-api_server):
+    python bench/price_prediction.py --rows 65536 --out price_prediction.json
+"""
+import argparse, csv, json, os, sys, time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from price_model import PricePredictor, features_from_csv
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data_gen", "synthetic_valais_price.csv")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", default=DEFAULT_CSV)
+    parser.add_argument("--model", help="path to ss2_unistay_price.tflite")
+    parser.add_argument("--rows", type=int, default=65536, help="rows scored per batch size")
+    parser.add_argument("--max-batch", type=int, default=4096, help="largest batch size (powers of two up to it)")
+    parser.add_argument("--out", help="optional JSON output file")
+    args = parser.parse_args()
+
+    with open(args.csv, "r", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    features = features_from_csv({name: [row[name] for row in rows] for name in rows[0]})
+    features = np.resize(features, (args.rows, features.shape[1]))
+
+    report = {"rows": args.rows, "batches": []}
+    reference = None
+    batch = 1
+    while batch <= args.max_batch:
+        predictor = PricePredictor(args.model, max_batch=batch)
+        predictor.predict(features[:batch])  # allocate tensors before timing
+        # batch 1 is slow: time a slice of the rows and extrapolate
+        n = min(args.rows, max(batch * 64, 4096))
+        start = time.perf_counter()
+        prices = predictor.predict(features[:n])
+        seconds = time.perf_counter() - start
+        if reference is None:
+            reference = prices
+        report["batches"].append({
+            "batch_size": batch,
+            "rows_per_second": round(n / seconds),
+            "us_per_row": round(seconds / n * 1e6, 3),
+            "max_abs_delta": float(np.max(np.abs(prices[:len(reference)] - reference[:len(prices)]))),
+        })
+        batch *= 2
+
+    base = report["batches"][0]["rows_per_second"]
+    print(f"{'batch':>6} {'rows/s':>12} {'us/row':>10} {'speedup':>8} {'max |delta|':>12}")
+    for r in report["batches"]:
+        print(f"{r['batch_size']:>6} {r['rows_per_second']:>12,} {r['us_per_row']:>10} "
+              f"{r['rows_per_second'] / base:>8.1f} {r['max_abs_delta']:>12.2e}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
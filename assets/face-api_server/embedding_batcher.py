@@ -0,0 +1,100 @@
+import asyncio, time, logging
+
+import numpy as np
+
+from admission import DeadlineExceeded
+from metrics import Histogram
+
+logger = logging.getLogger("face-api")
+
+
+class EmbeddingBatcher:
+    """Collects face crops from concurrent requests into one model.predict call.
+
+    A batch is flushed as soon as it holds `max_batch_size` faces or when the
+    oldest queued face has waited `max_wait_ms`, whichever comes first. Each
+    caller gets back the embedding row of its own crop. Batch sizes and queue
+    waits are recorded in histograms so both limits can be tuned.
+
+    `run_batch` is an async callable taking an (N, H, W, 3) array and returning
+    an (N, dim) array, typically a WorkerPool job. Faces whose deadline has
+    passed when their batch starts are dropped with DeadlineExceeded.
+    """
+
+    def __init__(self, run_batch, max_batch_size: int = 16, max_wait_ms: float = 10.0):
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be >= 1, got {max_batch_size}")
+        self._run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._pending = []  # [(pixels, future, enqueued_at, deadline)]
+        self._timer = None
+        self._tasks = set()  # running batches, the loop only keeps weak references to tasks
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64])
+        self.wait_seconds = Histogram([0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1])
+
+    async def embed(self, pixels: np.ndarray, deadline: float = None) -> np.ndarray:
+        """Embedding of one preprocessed face of shape (1, H, W, 3); deadline is a time.monotonic() value"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((pixels, future, time.perf_counter(), deadline))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        if self._pending:
+            # leftovers start their own wait window
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list):
+        now = time.perf_counter()
+        expired = time.monotonic()
+        live = []
+        for item in batch:
+            _, future, enqueued_at, deadline = item
+            self.wait_seconds.observe(now - enqueued_at)
+            if deadline is not None and expired > deadline:
+                if not future.done():
+                    future.set_exception(DeadlineExceeded("Deadline passed before embedding"))
+            elif not future.done():
+                live.append(item)
+        batch = live
+        if not batch:
+            return
+        self.batch_sizes.observe(len(batch))
+
+        try:
+            embeddings = await self._run_batch(np.concatenate([pixels for pixels, _, _, _ in batch]))
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for row, (_, future, _, _) in enumerate(batch):
+            if not future.done():
+                future.set_result(embeddings[row])
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": len(self._pending),
+            "batch_size": self.batch_sizes.snapshot(),
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
@@ -0,0 +1,210 @@
+import os, json, hashlib, logging, threading, zlib
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger("face-api")
+
+
+def content_hash(raw: bytes) -> str:
+    """Fast content hash of an encoded image"""
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _row_crc(vector) -> int:
+    return zlib.crc32(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+
+
+class EmbeddingCache:
+    """Profile embeddings keyed by UID + image content hash.
+
+    Hot entries live in an in-memory LRU. Every entry is also written to a
+    memory-mapped float32 matrix on disk (one row per UID) with a small JSON
+    index next to it, so the cache survives a restart. A UID only ever owns
+    one row: a new profile photo (different hash) overwrites the old vector.
+
+    Writes never touch the disk on the caller's thread. A background thread
+    flushes the matrix and rewrites the index at most once per
+    `flush_interval` seconds, so a burst of new profiles costs one write, and
+    close() writes what is left. The index stores a checksum of every row, so
+    a row overwritten after the last index write (crash between the two) is
+    dropped at load instead of being served for the wrong photo.
+
+    Not thread-safe, it is only used from the event loop.
+    """
+
+    def __init__(self, directory: str, dim: int = 512, capacity: int = 10000, memory_size: int = 1024,
+                 flush_interval: float = 1.0):
+        self.dim = dim
+        self.capacity = capacity
+        self.memory_size = memory_size
+        self._lru = OrderedDict()  # (uid, hash) -> vector
+        self._index = OrderedDict()  # uid -> {"hash": str, "slot": int}, oldest write first
+        self.hits = 0
+        self.misses = 0
+        self.on_evict = None  # called with the UID whose row is reused when the store is full
+        self.flush_interval = flush_interval
+        self.writes = 0
+        self._lock = threading.Lock()  # the flusher copies _index while the event loop changes it
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._flusher = None
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._vectors_path = os.path.join(directory, "profile_embeddings.npy")
+            self._index_path = os.path.join(directory, "profile_embeddings.json")
+            self._vectors = self._open_vectors()
+            self._load_index()
+            self._flusher = threading.Thread(target=self._flush_loop, name="embedding-cache-flush", daemon=True)
+            self._flusher.start()
+        else:
+            # memory only, nothing survives a restart
+            self._vectors_path = self._index_path = None
+            self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+
+        self._free = sorted(set(range(capacity)) - {e["slot"] for e in self._index.values()}, reverse=True)
+        logger.info(f"✅ Embedding cache ready: {len(self._index)}/{capacity} profiles on disk")
+
+    def _open_vectors(self):
+        if os.path.exists(self._vectors_path):
+            vectors = np.load(self._vectors_path, mmap_mode="r+")
+            if vectors.shape == (self.capacity, self.dim) and vectors.dtype == np.float32:
+                return vectors
+            logger.warning(f"⚠️ Embedding cache shape {vectors.shape} does not match config, rebuilding")
+            del vectors
+            if os.path.exists(self._index_path):
+                os.remove(self._index_path)
+        return np.lib.format.open_memmap(
+            self._vectors_path, mode="w+", dtype=np.float32, shape=(self.capacity, self.dim)
+        )
+
+    def _load_index(self):
+        if not os.path.exists(self._index_path):
+            return
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                self._index = OrderedDict(json.load(f))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read embedding cache index, starting empty: {e}")
+            self._index = OrderedDict()
+            return
+        stale = [
+            uid for uid, entry in self._index.items()
+            if "crc" in entry and _row_crc(self._vectors[entry["slot"]]) != entry["crc"]
+        ]
+        for uid in stale:
+            del self._index[uid]
+        if stale:
+            logger.warning(f"⚠️ Dropped {len(stale)} profile embeddings overwritten after the last index write")
+
+    def _changed(self):
+        if self._flusher is not None:
+            self._dirty.set()
+
+    def _flush_loop(self):
+        while not self._stop.is_set():
+            self._dirty.wait()
+            self._stop.wait(self.flush_interval)  # let a burst of writes land in one flush
+            self._dirty.clear()
+            try:
+                self._save()
+            except Exception as e:
+                logger.warning(f"⚠️ Could not write embedding cache to disk: {e}")
+                self._dirty.set()
+
+    def _save(self):
+        with self._lock:
+            index = self._index.copy()  # entries are replaced, never changed in place
+        self._vectors.flush()
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path)
+        self.writes += 1
+
+    def close(self):
+        """Write pending changes and stop the flusher thread"""
+        if self._flusher is None:
+            return
+        self._stop.set()
+        self._dirty.set()
+        self._flusher.join()
+        self._flusher = None
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, uid: str, image_hash: str):
+        """Cached embedding for this exact profile image, or None"""
+        key = (uid, image_hash)
+        vector = self._lru.get(key)
+        if vector is None:
+            entry = self._index.get(uid)
+            if entry is None or entry["hash"] != image_hash:
+                self.misses += 1
+                return None
+            vector = np.array(self._vectors[entry["slot"]])
+            self._remember(key, vector)
+        else:
+            self._lru.move_to_end(key)
+        self.hits += 1
+        return vector
+
+    def put(self, uid: str, image_hash: str, embedding) -> np.ndarray:
+        """Store the embedding of a profile image, replacing any older one for uid"""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(self.dim)
+
+        evicted = None
+        with self._lock:
+            entry = self._index.pop(uid, None)
+            if entry is not None:
+                self._lru.pop((uid, entry["hash"]), None)
+                slot = entry["slot"]
+            elif self._free:
+                slot = self._free.pop()
+            else:
+                # disk store full: reuse the row of the least recently written UID
+                evicted, old_entry = self._index.popitem(last=False)
+                self._lru.pop((evicted, old_entry["hash"]), None)
+                slot = old_entry["slot"]
+            self._vectors[slot] = vector
+            self._index[uid] = {"hash": image_hash, "slot": slot, "crc": _row_crc(vector)}
+        self._changed()
+        if evicted is not None and self.on_evict is not None:
+            self.on_evict(evicted)
+
+        self._remember((uid, image_hash), vector)
+        return vector
+
+    def remove(self, uid: str) -> bool:
+        """Forget the profile embedding of uid, returns False if none was cached"""
+        with self._lock:
+            entry = self._index.pop(uid, None)
+        if entry is None:
+            return False
+        self._lru.pop((uid, entry["hash"]), None)
+        self._free.append(entry["slot"])
+        self._changed()
+        return True
+
+    def items(self):
+        """(uid, embedding) of every stored profile, oldest write first"""
+        for uid, entry in list(self._index.items()):
+            yield uid, np.array(self._vectors[entry["slot"]])
+
+    def _remember(self, key, vector):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_size:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "profiles": len(self._index),
+            "capacity": self.capacity,
+            "in_memory": len(self._lru),
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_writes": self.writes,
+        }
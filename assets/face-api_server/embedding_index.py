@@ -0,0 +1,288 @@
+import threading, logging
+
+import numpy as np
+
+logger = logging.getLogger("face-api")
+
+INDEX_DTYPES = ("float32", "float16")
+INDEX_KINDS = ("exact", "ivf")
+
+
+def normalize(vectors) -> np.ndarray:
+    """L2-normalized float32 rows, so a dot product is the cosine similarity"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    """Exact 1:N cosine search over profile embeddings.
+
+    All embeddings are L2-normalized rows of one contiguous matrix, so a query
+    is a single matrix-vector product followed by a partial sort. Rows are
+    added in place (the matrix grows by doubling) and a removed row is filled
+    with the last one, so the matrix never has holes.
+
+    float16 storage halves the memory; NumPy has no half-precision BLAS, so
+    those rows are upcast in cache-sized blocks at query time (slower).
+    Methods take a lock so searches can run on a thread off the event loop.
+    """
+
+    BLOCK_ROWS = 1024  # float16 rows upcast per block during a search
+
+    def __init__(self, dim: int = 512, dtype: str = "float32", capacity: int = 1024):
+        if dtype not in INDEX_DTYPES:
+            raise ValueError(f"Invalid index dtype '{dtype}', expected one of {INDEX_DTYPES}")
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self._vectors = np.zeros((max(capacity, 1), dim), dtype=self.dtype)
+        self._uids = []  # row -> uid
+        self._rows = {}  # uid -> row
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._uids)
+
+    def __contains__(self, uid):
+        return uid in self._rows
+
+    def _grow(self, size: int):
+        if size <= len(self._vectors):
+            return
+        capacity = len(self._vectors)
+        while capacity < size:
+            capacity *= 2
+        vectors = np.zeros((capacity, self.dim), dtype=self.dtype)
+        vectors[:len(self._uids)] = self._vectors[:len(self._uids)]
+        self._vectors = vectors
+
+    def add(self, uid: str, embedding):
+        """Insert or replace the embedding of uid"""
+        self.add_many([uid], embedding)
+
+    def add_many(self, uids: list, embeddings):
+        """Insert or replace several embeddings, shape (N, dim)"""
+        vectors = normalize(embeddings)
+        if len(vectors) != len(uids):
+            raise ValueError(f"Got {len(uids)} UIDs for {len(vectors)} embeddings")
+        with self._lock:
+            self._grow(len(self._uids) + len(uids))
+            for uid, vector in zip(uids, vectors):
+                row = self._rows.get(uid)
+                if row is None:
+                    row = len(self._uids)
+                    self._rows[uid] = row
+                    self._uids.append(uid)
+                self._vectors[row] = vector
+
+    def remove(self, uid: str) -> bool:
+        """Drop uid from the index, returns False if it was not indexed"""
+        with self._lock:
+            row = self._rows.pop(uid, None)
+            if row is None:
+                return False
+            last = len(self._uids) - 1
+            if row != last:
+                # move the last row into the hole to keep the matrix contiguous
+                moved = self._uids[last]
+                self._vectors[row] = self._vectors[last]
+                self._uids[row] = moved
+                self._rows[moved] = row
+            self._uids.pop()
+            return True
+
+    def _similarities(self, query: np.ndarray) -> np.ndarray:
+        n = len(self._uids)
+        if self.dtype == np.float32:
+            return self._vectors[:n] @ query
+        out = np.empty(n, dtype=np.float32)
+        block = np.empty((self.BLOCK_ROWS, self.dim), dtype=np.float32)
+        for start in range(0, n, self.BLOCK_ROWS):
+            stop = min(start + self.BLOCK_ROWS, n)
+            rows = block[:stop - start]
+            rows[...] = self._vectors[start:stop]
+            np.dot(rows, query, out=out[start:stop])
+        return out
+
+    def search(self, embedding, k: int = 1) -> list:
+        """[(uid, cosine distance), ...] of the k nearest profiles, closest first"""
+        query = normalize(embedding)[0]
+        with self._lock:
+            n = len(self._uids)
+            if n == 0:
+                return []
+            k = min(k, n)
+            similarities = self._similarities(query)
+            top = np.argpartition(-similarities, k - 1)[:k] if k < n else np.arange(n)
+            top = top[np.argsort(-similarities[top])]
+            return [(self._uids[i], float(1.0 - similarities[i])) for i in top]
+
+    def memory_bytes(self) -> int:
+        return self._vectors.nbytes
+
+    def stats(self) -> dict:
+        return {
+            "kind": "exact",
+            "profiles": len(self),
+            "dtype": str(self.dtype),
+            "memory_mb": round(self.memory_bytes() / 2**20, 1),
+        }
+
+
+class PartitionedEmbeddingIndex:
+    """Approximate 1:N search for large user counts (inverted file, "IVF").
+
+    Embeddings are split into `n_lists` partitions around spherical k-means
+    centroids, each partition being an EmbeddingIndex. A query only scans the
+    `n_probe` partitions whose centroids are closest, trading a little recall
+    for roughly n_lists / n_probe less work. Until `train()` has run every
+    embedding sits in a single partition, i.e. the search is exact.
+    """
+
+    def __init__(self, dim: int = 512, dtype: str = "float32", n_lists: int = 0, n_probe: int = 8):
+        self.dim = dim
+        self.dtype = dtype
+        self.n_lists = n_lists  # 0 = sqrt(number of profiles) when trained
+        self.n_probe = n_probe
+        self.centroids = None
+        self.added_since_training = 0  # profiles added since the partitions were last trained
+        self._lists = [EmbeddingIndex(dim, dtype)]
+        self._list_of = {}  # uid -> partition
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._list_of)
+
+    def __contains__(self, uid):
+        return uid in self._list_of
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self.centroids is None:
+            return np.zeros(len(vectors), dtype=np.int64)
+        return np.argmax(vectors @ self.centroids.T, axis=1)
+
+    def add(self, uid: str, embedding):
+        self.add_many([uid], embedding)
+
+    def add_many(self, uids: list, embeddings):
+        vectors = normalize(embeddings)
+        with self._lock:
+            lists = self._assign(vectors)
+            for uid, list_id in zip(uids, lists):
+                old = self._list_of.get(uid)
+                if old is not None and old != list_id:
+                    self._lists[old].remove(uid)
+            self._distribute(uids, vectors, lists)
+            self.added_since_training += len(uids)
+
+    def _distribute(self, uids: list, vectors: np.ndarray, lists: np.ndarray):
+        """Add every vector to its partition, one add_many per partition"""
+        order = np.argsort(lists, kind="stable")
+        bounds = np.searchsorted(lists[order], np.arange(len(self._lists) + 1))
+        for list_id in np.flatnonzero(np.diff(bounds)):
+            members = order[bounds[list_id]:bounds[list_id + 1]]
+            self._lists[list_id].add_many([uids[i] for i in members], vectors[members])
+        self._list_of.update(zip(uids, lists.tolist()))
+
+    def remove(self, uid: str) -> bool:
+        with self._lock:
+            list_id = self._list_of.pop(uid, None)
+            if list_id is None:
+                return False
+            return self._lists[list_id].remove(uid)
+
+    def _snapshot(self) -> tuple:
+        """(uids, float32 vectors) of every profile; call with the lock held"""
+        uids = [uid for partition in self._lists for uid in partition._uids]
+        # views of the partition matrices, only copied when there is more than one or they are float16
+        parts = [partition._vectors[:len(partition)] for partition in self._lists]
+        vectors = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        return uids, vectors.astype(np.float32, copy=False)
+
+    def train(self, iterations: int = 10, sample_size: int = 65536, seed: int = 0):
+        """Cluster the current embeddings and redistribute them over the new partitions.
+
+        The clustering runs on a copied sample outside the lock, so searches and
+        adds only wait for the redistribution, which also places the profiles
+        added in the meantime.
+        """
+        rng = np.random.default_rng(seed)
+        with self._lock:
+            _, vectors = self._snapshot()
+            n_lists = self.n_lists or max(1, int(np.sqrt(len(vectors))))
+            if len(vectors) < n_lists:
+                logger.warning(f"⚠️ Not enough profiles ({len(vectors)}) to train {n_lists} partitions, index stays exact")
+                return
+            sample = vectors[rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False)]
+            self.added_since_training = 0
+            del vectors
+
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(assignment, minlength=n_lists)
+            empty = counts == 0
+            starts = (np.cumsum(counts) - counts)[~empty]
+            sums = np.zeros_like(centroids)
+            sums[~empty] = np.add.reduceat(sample[np.argsort(assignment, kind="stable")], starts, axis=0)
+            # reseed empty partitions with random sample points
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize(sums)
+        del sample
+
+        with self._lock:
+            uids, vectors = self._snapshot()
+            self.centroids = centroids
+            self._lists = []  # release the old partitions before filling the new ones
+            lists = np.concatenate([
+                self._assign(vectors[start:start + 65536]) for start in range(0, len(vectors), 65536)
+            ])
+            self._lists = [
+                EmbeddingIndex(self.dim, self.dtype, capacity=int(size))
+                for size in np.bincount(lists, minlength=n_lists)
+            ]
+            self._list_of = {}
+            self._distribute(uids, vectors, lists)
+        logger.info(f"✅ Embedding index trained: {len(uids)} profiles in {n_lists} partitions")
+
+    def search(self, embedding, k: int = 1) -> list:
+        query = normalize(embedding)[0]
+        with self._lock:
+            if self.centroids is None:
+                probes = [0]
+            else:
+                scores = self.centroids @ query
+                n_probe = min(self.n_probe, len(scores))
+                probes = np.argpartition(-scores, n_probe - 1)[:n_probe]
+            candidates = []
+            for list_id in probes:
+                candidates.extend(self._lists[list_id].search(query, k))
+        return sorted(candidates, key=lambda c: c[1])[:k]
+
+    def memory_bytes(self) -> int:
+        centroids = self.centroids.nbytes if self.centroids is not None else 0
+        return centroids + sum(p.memory_bytes() for p in self._lists)
+
+    def stats(self) -> dict:
+        return {
+            "kind": "ivf",
+            "profiles": len(self),
+            "dtype": self.dtype,
+            "trained": self.trained,
+            "added_since_training": self.added_since_training,
+            "lists": len(self._lists),
+            "probe": self.n_probe,
+            "memory_mb": round(self.memory_bytes() / 2**20, 1),
+        }
+
+
+def build_index(kind: str = "exact", dim: int = 512, dtype: str = "float32", n_lists: int = 0, n_probe: int = 8):
+    if kind not in INDEX_KINDS:
+        raise ValueError(f"Invalid index kind '{kind}', expected one of {INDEX_KINDS}")
+    if kind == "ivf":
+        return PartitionedEmbeddingIndex(dim, dtype, n_lists, n_probe)
+    return EmbeddingIndex(dim, dtype)
@@ -0,0 +1,123 @@
+"""Export Facenet512 and the MTCNN networks to ONNX for FACE_API_INFERENCE=onnx.
+
+Writes into --out-dir (default: models/):
+    facenet512.onnx        Facenet512, float32
+    facenet512_int8.onnx   Facenet512, int8 (only with --int8)
+    mtcnn_pnet.onnx, mtcnn_rnet.onnx, mtcnn_onet.onnx
+
+int8 uses static quantization (QDQ, per-channel weights), calibrated on the
+face crops of the photos in --calibration, so use real single-face photos
+representative of the app's selfies.
+
+Needs tf2onnx on top of the server requirements (export only):
+    pip install -r requirements-export.txt
+    python export_onnx.py --int8 --calibration path/to/faces
+"""
+import argparse, glob, os, sys, tempfile
+
+os.environ["FACE_API_INFERENCE"] = "tensorflow"  # export always starts from the Keras models
+
+import numpy as np
+import tensorflow as tf
+import tf2onnx
+
+import face_pipeline
+import onnx_backend
+from deepface import DeepFace
+
+# PNet is fully convolutional (any image size), RNet/ONet take fixed-size patches
+MTCNN_INPUT_SHAPES = {1: (None, None, None, 3), 2: (None, 24, 24, 3), 3: (None, 48, 48, 3)}
+
+
+def export_keras(model, input_shape: tuple, path: str, opset: int):
+    spec = (tf.TensorSpec(input_shape, tf.float32, name="input"),)
+    # tf2onnx's own graph optimizer needs >5 GB on Facenet512; ONNX Runtime
+    # applies the same fusions when it loads the model, so skip it
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=path, optimizers={})
+    print(f"✅ {path} ({os.path.getsize(path) / 2**20:.1f} MB)")
+
+
+def calibration_faces(directory: str) -> np.ndarray:
+    paths = sorted(glob.glob(os.path.join(directory, "*.jpg")) + glob.glob(os.path.join(directory, "*.png")))
+    faces = []
+    for path in paths:
+        with open(path, "rb") as f:
+            try:
+                faces.append(face_pipeline.detect_image(f.read())["pixels"])
+            except ValueError as e:
+                print(f"⚠️ Skipping {path}: {e}")
+    if not faces:
+        sys.exit(f"No usable face in {directory}")
+    return np.concatenate(faces)
+
+
+def quantize_int8(fp32_path: str, int8_path: str, faces: np.ndarray):
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    class FaceReader(CalibrationDataReader):
+        def __init__(self):
+            self._faces = iter(faces[i:i + 1] for i in range(len(faces)))
+
+        def get_next(self):
+            face = next(self._faces, None)
+            return None if face is None else {"input": face}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepared = os.path.join(tmp, "prepared.onnx")
+        quant_pre_process(fp32_path, prepared, skip_symbolic_shape=True)
+        quantize_static(
+            prepared, int8_path, FaceReader(),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+    print(f"✅ {int8_path} ({os.path.getsize(int8_path) / 2**20:.1f} MB, calibrated on {len(faces)} faces)")
+
+
+def parity(keras_model, out_dir: str, faces: np.ndarray, precisions: list):
+    """Cosine distance between the Keras and ONNX embeddings of the same crops"""
+    reference = keras_model.predict(faces, verbose=0)
+    for precision in precisions:
+        embeddings = onnx_backend.load_embedding_model(out_dir, precision).predict(faces)
+        distances = [face_pipeline.cosine_distance(a, b) for a, b in zip(reference, embeddings)]
+        print(f"📊 {precision}: max cosine distance to Keras {max(distances):.6f} over {len(faces)} faces")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out-dir", default="models")
+    parser.add_argument("--int8", action="store_true", help="also write the int8 Facenet512 model")
+    parser.add_argument("--calibration", help="directory of single-face photos (required with --int8)")
+    parser.add_argument("--opset", type=int, default=13)
+    args = parser.parse_args()
+    if args.int8 and not args.calibration:
+        parser.error("--int8 needs --calibration")
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    detector = face_pipeline.load_models()
+    model = DeepFace.build_model(face_pipeline.MODEL_NAME)
+
+    fp32_path = os.path.join(args.out_dir, onnx_backend.EMBEDDING_FILES["fp32"])
+    export_keras(model, (None, *face_pipeline.TARGET_SIZE, 3), fp32_path, args.opset)
+
+    stages = getattr(detector, "stages", None)
+    if stages:
+        for stage in stages:
+            path = os.path.join(args.out_dir, onnx_backend.MTCNN_STAGE_FILES[stage.id])
+            export_keras(stage.model, MTCNN_INPUT_SHAPES[stage.id], path, args.opset)
+    else:
+        print("⚠️ Installed mtcnn (<1.0) has no stage networks to export, the detector will stay on TensorFlow")
+
+    if args.calibration:
+        faces = calibration_faces(args.calibration)
+        precisions = ["fp32"]
+        if args.int8:
+            quantize_int8(fp32_path, os.path.join(args.out_dir, onnx_backend.EMBEDDING_FILES["int8"]), faces)
+            precisions.append("int8")
+        parity(model, args.out_dir, faces, precisions)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import base64, cv2, numpy as np, logging, os, threading, time
+
+from deepface import DeepFace
+from deepface.commons import distance as dst, functions
+from deepface.detectors import FaceDetector
+
+import onnx_backend
+from fast_detector import build_fast_detector
+
+# -------------------------------
+# CPU-heavy verification stages
+# -------------------------------
+# Everything in this module runs inside a worker (thread or process) of the
+# server's WorkerPool, never on the event loop. Functions take and return
+# plain picklable values so the process backend can ship them across.
+
+logger = logging.getLogger("face-api")
+
+DETECTOR_BACKEND = os.getenv("FACE_API_DETECTOR", "mtcnn")  # DeepFace backend, e.g. "retinaface" for stronger accuracy
+MODEL_NAME = "Facenet512"
+DISTANCE_METRIC = "cosine"
+THRESHOLD = dst.findThreshold(MODEL_NAME, DISTANCE_METRIC)
+TARGET_SIZE = functions.find_target_size(model_name=MODEL_NAME)
+
+# Longest edge (px) of the image handed to the detector, 0 = full resolution.
+# Phone photos are decoded at a reduced JPEG scale and resized down to this.
+MAX_DETECTION_EDGE = int(os.getenv("FACE_API_MAX_DETECTION_EDGE", "640"))
+
+# Runtime of the detector networks and Facenet512: "tensorflow" or "onnx"
+# (models exported to FACE_API_ONNX_DIR by export_onnx.py, see onnx_backend)
+INFERENCE_BACKEND = os.getenv("FACE_API_INFERENCE", "tensorflow")
+ONNX_DIR = os.getenv("FACE_API_ONNX_DIR", "models")
+ONNX_PRECISION = os.getenv("FACE_API_ONNX_PRECISION", "fp32")  # "fp32" or "int8" (Facenet512 only)
+ONNX_THREADS = int(os.getenv("FACE_API_ONNX_THREADS", "0"))  # 0 = ONNX Runtime default
+if INFERENCE_BACKEND not in onnx_backend.INFERENCE_BACKENDS:
+    raise ValueError(f"Invalid inference backend '{INFERENCE_BACKEND}', expected one of {onnx_backend.INFERENCE_BACKENDS}")
+
+# Detection cascade: a fast detector ("yunet", model in ONNX_DIR) decides the
+# clear cases, DETECTOR_BACKEND only runs when it is unsure. "" = always DETECTOR_BACKEND.
+CASCADE_DETECTOR = os.getenv("FACE_API_CASCADE", "")
+CASCADE_MIN_SCORE = float(os.getenv("FACE_API_CASCADE_MIN_SCORE", "0.9"))  # a face the fast detector may decide on
+CASCADE_AMBIGUOUS_SCORE = float(os.getenv("FACE_API_CASCADE_AMBIGUOUS_SCORE", "0.5"))  # a possible second face
+CASCADE_MIN_FACE = int(os.getenv("FACE_API_CASCADE_MIN_FACE", "48"))  # px at detection scale, smaller goes to the full detector
+
+REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+UNKNOWN_IMAGE_SIZE = (4000, 3000)  # assumed by decode_memory() when the header cannot be read
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+face_detector = None
+fast_detector = None
+embedding_model = None
+warm_up_timings = None
+_load_lock = threading.Lock()
+
+
+class DeepFaceError(Exception):
+    """Raised when DeepFace itself fails (as opposed to invalid input)"""
+
+
+class NoFaceError(ValueError):
+    pass
+
+
+class MultipleFacesError(ValueError):
+    pass
+
+
+def load_models():
+    """Build and warm the detector and the recognition model once per worker"""
+    global warm_up_timings
+    with _load_lock:  # thread workers share the models, only the first one loads them
+        if face_detector is None:
+            warm_up_timings = warm_up()
+    return face_detector
+
+def warm_up() -> dict:
+    """Load every model and run one dummy inference through each, returns per-stage seconds"""
+    global face_detector, fast_detector, embedding_model
+    timings = {}
+
+    t0 = time.perf_counter()
+    detector = None
+    if INFERENCE_BACKEND == "onnx":
+        detector = onnx_backend.build_detector(DETECTOR_BACKEND, ONNX_DIR, ONNX_THREADS)
+    if detector is None:
+        detector = FaceDetector.build_model(DETECTOR_BACKEND)
+    timings["detector_load"] = time.perf_counter() - t0
+
+    if CASCADE_DETECTOR:
+        t0 = time.perf_counter()
+        fast = build_fast_detector(CASCADE_DETECTOR, ONNX_DIR, CASCADE_AMBIGUOUS_SCORE)
+        if fast is not None:
+            fast.detect_faces(np.full((480, 640, 3), 127, dtype=np.uint8))
+        fast_detector = fast
+        timings["cascade_detector_load"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if INFERENCE_BACKEND == "onnx":
+        model = onnx_backend.load_embedding_model(ONNX_DIR, ONNX_PRECISION, ONNX_THREADS)
+    else:
+        model = DeepFace.build_model(MODEL_NAME)
+    timings["model_load"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    FaceDetector.detect_faces(detector, DETECTOR_BACKEND, np.full((480, 640, 3), 127, dtype=np.uint8), align=True)
+    timings["detector_warmup"] = time.perf_counter() - t0
+
+    # Keras builds its predict function lazily on the first call, and two
+    # worker threads doing that first call at once crash. Build it here.
+    t0 = time.perf_counter()
+    model.predict(np.zeros((1, *TARGET_SIZE, 3), dtype=np.float32), verbose=0)
+    timings["model_warmup"] = time.perf_counter() - t0
+
+    face_detector = detector
+    embedding_model = model
+    logger.info(
+        f"✅ Models loaded and warm: {(fast_detector.name + ' > ') if fast_detector else ''}{DETECTOR_BACKEND} "
+        f"+ {MODEL_NAME} on {INFERENCE_BACKEND} "
+        + " ".join(f"{stage}={seconds:.2f}s" for stage, seconds in timings.items())
+    )
+    return timings
+
+def worker_warm_up() -> dict:
+    """Worker entry point: make sure this worker's models are warm and report how long it took"""
+    load_models()
+    return {"pid": os.getpid(), "thread": threading.current_thread().name, "timings": warm_up_timings}
+
+# -------------------------------
+# Helpers
+# -------------------------------
+def decode_data_url(data_url: str) -> bytes:
+    """Strip the optional data URL prefix and base64-decode the image bytes"""
+    if data_url.startswith('data:image/'):
+        _, b64data = data_url.split(",", 1)
+    else:
+        b64data = data_url
+
+    return base64.b64decode(b64data)
+
+def jpeg_size(raw: bytes):
+    """(width, height) read from the JPEG frame header, None if raw is not a JPEG"""
+    if raw[:2] != b"\xff\xd8":
+        return None
+    i, n = 2, len(raw)
+    while i + 9 < n:
+        if raw[i] != 0xFF:
+            i += 1
+            continue
+        marker = raw[i + 1]
+        if marker in JPEG_SOF_MARKERS:
+            height = int.from_bytes(raw[i + 5:i + 7], "big")
+            width = int.from_bytes(raw[i + 7:i + 9], "big")
+            return width, height
+        if marker == 0xFF or marker == 0x01 or 0xD0 <= marker <= 0xD9:
+            i += 1 if marker == 0xFF else 2  # fill byte or standalone marker
+            continue
+        i += 2 + int.from_bytes(raw[i + 2:i + 4], "big")
+    return None
+
+def png_size(raw: bytes):
+    """(width, height) read from the PNG IHDR chunk, None if raw is not a PNG"""
+    if raw[:8] != b"\x89PNG\r\n\x1a\n" or len(raw) < 24:
+        return None
+    return int.from_bytes(raw[16:20], "big"), int.from_bytes(raw[20:24], "big")
+
+def reduced_decode(size, max_edge: int) -> tuple:
+    """(imdecode flag, reduction factor) of the largest JPEG scale that still covers max_edge"""
+    if size and max_edge:
+        long_edge = max(size)
+        for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+            if long_edge // factor >= max_edge:
+                return reduced_flag, factor
+    return cv2.IMREAD_COLOR, 1
+
+def decode_memory(raw: bytes, max_edge: int = MAX_DETECTION_EDGE) -> int:
+    """Upper estimate of the bytes bytes_to_rgb_array(raw, max_edge) allocates, read from the header only"""
+    jpeg = jpeg_size(raw)
+    size = jpeg or png_size(raw) or UNKNOWN_IMAGE_SIZE
+    factor = reduced_decode(size, max_edge)[1] if jpeg else 1
+    decoded = (size[0] // factor) * (size[1] // factor)
+    resized = decoded
+    if max_edge and max(size) // factor > max_edge:
+        resized = int(decoded * (max_edge / (max(size) // factor)) ** 2)
+    return len(raw) + 3 * (decoded + 2 * resized)  # BGR decode, resized copy, RGB conversion
+
+def bytes_to_rgb_array(raw: bytes, max_edge: int = 0) -> tuple:
+    """Convert encoded image bytes to an RGB numpy array whose longest edge is at most max_edge.
+
+    JPEGs are decoded at the largest 1/2, 1/4 or 1/8 scale that still covers
+    max_edge, then a single resize brings them down to it. Returns
+    (image, scale) where scale maps image pixels back to original pixels.
+    """
+    if not raw:
+        raise ValueError("Could not decode image - empty image data")
+    arr = np.frombuffer(raw, np.uint8)
+
+    flag, reduction = reduced_decode(jpeg_size(raw) if max_edge else None, max_edge)
+
+    bgr = cv2.imdecode(arr, flag)
+    if bgr is None:
+        raise ValueError("Could not decode image - invalid image data")
+
+    scale = float(reduction)
+    long_edge = max(bgr.shape[:2])
+    if max_edge and long_edge > max_edge:
+        resize = max_edge / long_edge
+        bgr = cv2.resize(bgr, (max(1, round(bgr.shape[1] * resize)), max(1, round(bgr.shape[0] * resize))), interpolation=cv2.INTER_AREA)
+        scale /= resize
+
+    return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB), scale
+
+def to_original_region(region, scale: float) -> dict:
+    """Map a detector [x, y, w, h] box back to original image coordinates"""
+    x, y, w, h = region
+    return {"x": int(x * scale), "y": int(y * scale), "w": int(w * scale), "h": int(h * scale)}
+
+def cascade_single_face(image: np.ndarray):
+    """Fast-detector verdict: (crop, region) of a clear single face, None when the full detector must decide.
+
+    Clear means one face scoring CASCADE_MIN_SCORE or more, at least
+    CASCADE_MIN_FACE px, and no other candidate above CASCADE_AMBIGUOUS_SCORE.
+    Two or more clear faces raise MultipleFacesError right away. No face is
+    never decided here: the fast detector misses faces MTCNN finds.
+    """
+    faces = fast_detector.detect_faces(image, align=True)
+    confident = [face for face in faces if face[2] >= CASCADE_MIN_SCORE]
+    if len(confident) > 1:
+        raise MultipleFacesError(f"Multiple faces detected ({len(confident)})")
+    if len(faces) != 1 or not confident:
+        return None
+    face, region, _ = confident[0]
+    if min(region[2], region[3]) < CASCADE_MIN_FACE or face.size == 0:
+        return None
+    return face, region
+
+def detect_single_face(image: np.ndarray, detector_backend: str = DETECTOR_BACKEND, cascade: bool = True) -> tuple:
+    """Detect faces once, ensure exactly one is present; returns (aligned crop, region, detector that decided)"""
+    detector = load_models()
+    if cascade and fast_detector is not None:
+        found = cascade_single_face(image)
+        if found is not None:
+            return (*found, fast_detector.name)
+
+    faces = FaceDetector.detect_faces(detector, detector_backend, image, align=True)
+    if len(faces) == 0:
+        raise NoFaceError("No face detected in the image")
+    elif len(faces) > 1:
+        raise MultipleFacesError(f"Multiple faces detected ({len(faces)})")
+
+    face, region, _ = faces[0]
+    if face is None or face.size == 0:
+        raise ValueError("Detected face region is empty")
+    return face, region, detector_backend
+
+def preprocess_face(face: np.ndarray) -> np.ndarray:
+    """Resize, pad and normalize a face crop exactly like DeepFace.verify does"""
+    pixels, _, _ = functions.extract_faces(
+        img=face,
+        target_size=TARGET_SIZE,
+        detector_backend="skip",  # the crop is already the face
+        grayscale=False,
+        enforce_detection=False
+    )[0]
+    return pixels
+
+def embed_faces(batch: np.ndarray) -> np.ndarray:
+    """Facenet512 embeddings of a batch of preprocessed faces, shape (N, H, W, 3) -> (N, 512).
+
+    Same forward pass as DeepFace.represent(detector_backend="skip") with the
+    default "base" normalization (a no-op), just over many faces at once.
+    """
+    load_models()
+    try:
+        return np.asarray(embedding_model.predict(batch, verbose=0), dtype=np.float32)
+    except Exception as e:
+        raise DeepFaceError(str(e)) from None
+
+def cosine_distance(a: np.ndarray, b: np.ndarray) -> float:
+    return float(1.0 - np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+def compare_embeddings(profile_embedding: np.ndarray, login_embedding: np.ndarray) -> dict:
+    distance = cosine_distance(profile_embedding, login_embedding)
+    return {
+        "verified": distance <= THRESHOLD,
+        "distance": distance,
+        "model": MODEL_NAME,
+    }
+
+# -------------------------------
+# Worker entry points
+# -------------------------------
+def detect_image(raw: bytes) -> dict:
+    """Decode and detect one image with a single detection pass.
+
+    Returns {"pixels": preprocessed face, "facial_area": box in original
+    image coordinates, "detector": detector that decided, "timings": seconds per stage}.
+    Raises ValueError for unusable input.
+    """
+    t0 = time.perf_counter()
+    image, scale = bytes_to_rgb_array(raw, MAX_DETECTION_EDGE)
+    t1 = time.perf_counter()
+
+    # ✅ Ensure only one face, and keep its crop for the embedding
+    face, region, detector = detect_single_face(image)
+    pixels = preprocess_face(face)
+    t2 = time.perf_counter()
+
+    return {
+        "pixels": pixels,
+        "facial_area": to_original_region(region, scale),
+        "detector": detector,
+        "timings": {"image_decode": t1 - t0, "face_detection": t2 - t1},
+    }
+
+def detect_images(*raws: bytes) -> list:
+    """detect_image() for several images in one worker job"""
+    return [detect_image(raw) for raw in raws]
+
+def embed_batch(batch: np.ndarray) -> tuple:
+    """embed_faces() plus how long the forward pass took, returns (embeddings, seconds)"""
+    t0 = time.perf_counter()
+    embeddings = embed_faces(batch)
+    return embeddings, time.perf_counter() - t0
+
+def embed_image(raw: bytes) -> np.ndarray:
+    """Detect and embed one image without batching"""
+    return embed_faces(detect_image(raw)["pixels"])[0]
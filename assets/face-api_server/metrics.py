@@ -0,0 +1,144 @@
+import bisect, math
+
+# Latency buckets (seconds) shared by the per-stage histograms
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+
+class Histogram:
+    """Cumulative bucket histogram (Prometheus-style `le` buckets)"""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """[(upper_bound, cumulative_count), ...] ending with +Inf"""
+        total, out = 0, []
+        for bound, n in zip(self.buckets + [float("inf")], self._counts):
+            total += n
+            out.append((bound, total))
+        return out
+
+    def snapshot(self) -> dict:
+        return {
+            "buckets": {_format_value(b): n for b, n in self.cumulative()},
+            "sum": round(self.sum, 6),
+            "count": self.count,
+        }
+
+
+class Value:
+    """Counter or gauge sample"""
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = float(value)
+
+
+class Metric:
+    """A metric family: one sample (or histogram) per combination of label values"""
+
+    def __init__(self, name: str, help: str, kind: str, labelnames=(), buckets=None):
+        self.name = name
+        self.help = help
+        self.kind = kind  # "counter", "gauge" or "histogram"
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children = {}
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = Histogram(self.buckets) if self.kind == "histogram" else Value()
+            self._children[key] = child
+        return child
+
+    def attach(self, child, **labels):
+        """Expose an existing Histogram/Value under this family"""
+        self._children[tuple(str(labels[name]) for name in self.labelnames)] = child
+        return child
+
+    # unlabeled shortcuts
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            labels = list(zip(self.labelnames, key))
+            if self.kind == "histogram":
+                for bound, count in child.cumulative():
+                    lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(child.sum)}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {child.count}")
+            else:
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(child.value)}")
+        return lines
+
+
+class Registry:
+    """Collection of metric families rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames=()) -> Metric:
+        return self._add(Metric(name, help, "counter", labelnames))
+
+    def gauge(self, name: str, help: str, labelnames=()) -> Metric:
+        return self._add(Metric(name, help, "gauge", labelnames))
+
+    def histogram(self, name: str, help: str, buckets=LATENCY_BUCKETS, labelnames=()) -> Metric:
+        return self._add(Metric(name, help, "histogram", labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and not math.isnan(value) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels: list) -> str:
+    if not labels:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
@@ -0,0 +1,208 @@
+import os, logging
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("face-api")
+
+INFERENCE_BACKENDS = ("tensorflow", "onnx")
+ONNX_PRECISIONS = ("fp32", "int8")
+
+# File names written by export_onnx.py and read here
+EMBEDDING_FILES = {"fp32": "facenet512.onnx", "int8": "facenet512_int8.onnx"}
+MTCNN_STAGE_FILES = {1: "mtcnn_pnet.onnx", 2: "mtcnn_rnet.onnx", 3: "mtcnn_onet.onnx"}
+
+
+def _session(path: str, threads: int):
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        raise RuntimeError("FACE_API_INFERENCE=onnx requires the onnxruntime package") from None
+    if not os.path.exists(path):
+        raise RuntimeError(f"ONNX model {path} not found, run export_onnx.py first")
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.enable_cpu_mem_arena = False  # the arena keeps peak activation memory reserved for good
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+
+class OnnxModel:
+    """ONNX Runtime session with the `predict` of a Keras model.
+
+    `predict(batch)` returns the first output as a NumPy array, like
+    `keras.Model.predict`; `run(batch)` returns every output.
+    """
+
+    def __init__(self, path: str, threads: int = 0):
+        self.path = path
+        self.session = _session(path, threads)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run(self, batch) -> list:
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})
+
+    def predict(self, batch, verbose: int = 0) -> np.ndarray:
+        return self.run(batch)[0]
+
+
+def load_embedding_model(model_dir: str, precision: str = "fp32", threads: int = 0) -> OnnxModel:
+    if precision not in ONNX_PRECISIONS:
+        raise ValueError(f"Invalid ONNX precision '{precision}', expected one of {ONNX_PRECISIONS}")
+    return OnnxModel(os.path.join(model_dir, EMBEDDING_FILES[precision]), threads)
+
+
+# -------------------------------
+# MTCNN on ONNX Runtime and NumPy
+# -------------------------------
+# The mtcnn package resizes the image pyramid and crops the RNet/ONet patches
+# with TensorFlow ops, so swapping only its networks would still run
+# TensorFlow on every request. OnnxMtcnn reruns the same three stages with
+# OpenCV and NumPy in their place and mtcnn's own NumPy box helpers, and
+# never calls into TensorFlow: that is what lets prefork.py fork after the
+# models are loaded.
+
+def build_detector(detector_backend: str, model_dir: str, threads: int = 0):
+    """OnnxMtcnn for the "mtcnn" backend when export_onnx.py wrote its networks, else None (stay on TensorFlow)"""
+    if detector_backend != "mtcnn":
+        logger.warning(f"⚠️ Only mtcnn runs on ONNX Runtime, the {detector_backend} detector stays on TensorFlow")
+        return None
+    try:
+        import mtcnn.utils.bboxes  # the NumPy box helpers OnnxMtcnn reuses, mtcnn>=1.0 only
+    except ImportError:
+        logger.warning("⚠️ The ONNX detector needs mtcnn>=1.0, the detector stays on TensorFlow")
+        return None
+    paths = [os.path.join(model_dir, MTCNN_STAGE_FILES[stage_id]) for stage_id in sorted(MTCNN_STAGE_FILES)]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        logger.warning(f"⚠️ {', '.join(missing)} not found, the detector stays on TensorFlow")
+        return None
+    return OnnxMtcnn(*(OnnxModel(path, threads) for path in paths))
+
+
+def runs_on_onnx(detector) -> bool:
+    """True when the detector is the TensorFlow-free OnnxMtcnn of build_detector()"""
+    return isinstance(detector, OnnxMtcnn)
+
+
+def scale_pyramid(width: int, height: int, min_face_size: int, scale_factor: float, min_size: int = 12) -> np.ndarray:
+    """Scales of the PNet image pyramid, as mtcnn.utils.images.build_scale_pyramid"""
+    count = round(-((np.log(min(width, height) / min_size) / np.log(scale_factor)) + 1))
+    return min_size / min_face_size * scale_factor ** np.arange(count)
+
+
+def crop_and_resize(image: np.ndarray, boxes: np.ndarray, size: int) -> np.ndarray:
+    """Bilinear (size, size) patches of image for [x1, y1, x2, y2] pixel boxes.
+
+    Samples the same points as the tf.image.crop_and_resize call of mtcnn
+    (boxes divided by the image size, corners mapped to pixel centers) and
+    fills samples outside the image with 0.
+    """
+    height, width = image.shape[:2]
+    steps = np.arange(size) / (size - 1)
+    ys = (boxes[:, 1:2] / height + steps * (boxes[:, 3:4] - boxes[:, 1:2]) / height) * (height - 1)
+    xs = (boxes[:, 0:1] / width + steps * (boxes[:, 2:3] - boxes[:, 0:1]) / width) * (width - 1)
+    inside = (((ys >= 0) & (ys <= height - 1))[:, :, None] & ((xs >= 0) & (xs <= width - 1))[:, None, :])
+
+    top, left = np.clip(np.floor(ys), 0, height - 1).astype(int), np.clip(np.floor(xs), 0, width - 1).astype(int)
+    bottom, right = np.clip(np.ceil(ys), 0, height - 1).astype(int), np.clip(np.ceil(xs), 0, width - 1).astype(int)
+    y_lerp, x_lerp = (ys - np.floor(ys))[:, :, None, None], (xs - np.floor(xs))[:, None, :, None]
+
+    def rows(r):
+        upper_left, upper_right = image[r[:, :, None], left[:, None, :]], image[r[:, :, None], right[:, None, :]]
+        return upper_left + (upper_right - upper_left) * x_lerp
+
+    upper, lower = rows(top), rows(bottom)
+    return np.where(inside[..., None], upper + (lower - upper) * y_lerp, 0.0).astype(np.float32)
+
+
+def pnet_proposals(bbox_reg: np.ndarray, bbox_class: np.ndarray, threshold: float, stride: int = 2,
+                   cell_size: int = 12) -> np.ndarray:
+    """[image, x1, y1, x2, y2, score] boxes of the PNet cells scoring above threshold, best first.
+
+    mtcnn.utils.bboxes.generate_bounding_box on NumPy outputs, in the
+    coordinates of the scaled image.
+    """
+    scores = bbox_class[:, :, :, 1]
+    image, row, col = np.where(scores > threshold)
+    reg_x1, reg_y1, reg_x2, reg_y2 = bbox_reg[image, row, col].T
+    x1, y1 = col * stride + 1, row * stride + 1
+    x2, y2 = col * stride + cell_size, row * stride + cell_size
+    w, h = x2 - x1, y2 - y1
+    bboxes = np.stack([image, x1 + reg_x1 * w, y1 + reg_y1 * h, x2 + reg_x2 * w, y2 + reg_y2 * h,
+                       scores[image, row, col]], axis=0).T
+    return bboxes[np.argsort(bboxes[:, -1])[::-1]]
+
+
+class OnnxMtcnn:
+    """MTCNN detector (mtcnn>=1.0 stages and defaults) on ONNX Runtime and NumPy only.
+
+    `detect_faces(rgb_image)` returns the same list of {"box", "confidence",
+    "keypoints"} dicts as `mtcnn.MTCNN.detect_faces`, which is all DeepFace's
+    mtcnn wrapper uses.
+    """
+
+    name = "mtcnn"
+
+    def __init__(self, pnet: OnnxModel, rnet: OnnxModel, onet: OnnxModel, min_face_size: int = 20,
+                 scale_factor: float = 0.709, thresholds: tuple = (0.6, 0.7, 0.8)):
+        self.pnet, self.rnet, self.onet = pnet, rnet, onet
+        self.min_face_size = min_face_size
+        self.scale_factor = scale_factor
+        self.thresholds = thresholds
+
+    def detect_faces(self, image: np.ndarray) -> list:
+        from mtcnn.utils.bboxes import limit_bboxes, to_json
+
+        normalized = (np.asarray(image, dtype=np.float32) - 127.5) / 128
+        bboxes = self._stage_pnet(normalized)
+        if len(bboxes):
+            bboxes = self._stage_rnet(normalized, bboxes)
+        if len(bboxes):
+            bboxes = self._stage_onet(normalized, bboxes)
+        if not len(bboxes):
+            return []
+        bboxes = limit_bboxes(bboxes, images_shapes=np.asarray([image.shape]), limit_landmarks=False)
+        return to_json(bboxes, images_count=1, output_as_width_height=True, input_as_width_height=False)[0]
+
+    def _stage_pnet(self, normalized: np.ndarray) -> np.ndarray:
+        from mtcnn.utils.bboxes import resize_to_square, smart_nms_from_bboxes
+
+        height, width = normalized.shape[:2]
+        proposals = []
+        for scale in scale_pyramid(width, height, self.min_face_size, self.scale_factor):
+            # TensorFlow truncates the scaled size, and its AREA resize is OpenCV's INTER_AREA
+            scaled = cv2.resize(normalized, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+            bbox_reg, bbox_class = self.pnet.run(scaled[None])
+            bboxes = pnet_proposals(bbox_reg, bbox_class, self.thresholds[0])
+            bboxes[:, 1:5] /= scale
+            proposals.append(smart_nms_from_bboxes(bboxes, threshold=0.5, method="union", initial_sort=False))
+        bboxes = np.concatenate(proposals, axis=0) if proposals else np.empty((0, 6))
+        bboxes = smart_nms_from_bboxes(bboxes, threshold=0.7, method="union", initial_sort=True)
+        return resize_to_square(bboxes)
+
+    def _stage_rnet(self, normalized: np.ndarray, bboxes: np.ndarray) -> np.ndarray:
+        from mtcnn.utils.bboxes import adjust_bboxes, pick_matches, replace_confidence, resize_to_square, smart_nms_from_bboxes
+
+        offsets, scores = self.rnet.run(crop_and_resize(normalized, bboxes[:, 1:5], 24))
+        bboxes = adjust_bboxes(replace_confidence(bboxes, scores), offsets)
+        bboxes = pick_matches(bboxes, score_threshold=self.thresholds[1])
+        bboxes = smart_nms_from_bboxes(bboxes, threshold=0.7, method="union", initial_sort=True)
+        return resize_to_square(bboxes)
+
+    def _stage_onet(self, normalized: np.ndarray, bboxes: np.ndarray) -> np.ndarray:
+        from mtcnn.utils.bboxes import adjust_bboxes, pick_matches, replace_confidence, smart_nms_from_bboxes
+
+        offsets, landmarks, scores = self.onet.run(crop_and_resize(normalized, bboxes[:, 1:5], 48))
+        # landmarks are relative to the box before its adjustment, like mtcnn.utils.landmarks.adjust_landmarks
+        w = bboxes[:, 3:4] - bboxes[:, 1:2] + 1
+        h = bboxes[:, 4:5] - bboxes[:, 2:3] + 1
+        landmarks = np.concatenate([w * landmarks[:, 0:5] + bboxes[:, 1:2] - 1,
+                                    h * landmarks[:, 5:10] + bboxes[:, 2:3] - 1], axis=1)
+        bboxes = adjust_bboxes(replace_confidence(bboxes, scores), offsets)
+        bboxes = np.concatenate([bboxes, landmarks], axis=-1)
+        bboxes = pick_matches(bboxes, scores_column=5, score_threshold=self.thresholds[2])
+        return smart_nms_from_bboxes(bboxes, threshold=0.7, method="min", initial_sort=True)
@@ -0,0 +1,246 @@
+"""Pre-fork multi-process server: load the models once, fork warm workers.
+
+The parent process loads and warms the detector and Facenet512, then forks
+FACE_API_PREFORK_WORKERS children that serve `server:app` on one shared
+listening socket. The children inherit the model weights copy-on-write, so
+each added worker costs its own Python heap and activations, not another
+copy of the models, and starts serving without loading anything.
+
+The parent only supervises: a worker that dies is forked again from the
+still-warm parent, SIGHUP replaces the workers one at a time (the new one
+is serving before the old one is stopped, which finishes its in-flight
+requests), SIGTERM/SIGINT stop everything.
+
+TensorFlow deadlocks in a child forked after it has run, so this mode needs
+FACE_API_INFERENCE=onnx with the exported detector and Facenet512 models
+(export_onnx.py). MTCNN then runs on ONNX Runtime and NumPy
+(onnx_backend.OnnxMtcnn) and DeepFace's alignment and preprocessing are
+OpenCV/PIL, so TensorFlow is imported but never runs an op, in the parent
+or in a worker. ONNX Runtime runs single-threaded: one worker per core is
+the unit of scaling.
+
+Each worker is a separate process with its own in-memory state. With an
+on-disk profile cache every worker also gets its own
+FACE_API_CACHE_DIR/worker-<n> directory, so the embedding cache, the
+/verify deduplication and the /identify index are all per worker: a
+profile is embedded once per worker that sees it, a retry landing on
+another worker is verified again, and /identify only finds the profiles
+that worker has embedded.
+
+Usage (from assets/face-api_server):
+    python prefork.py --workers 4 --port 8080
+"""
+import argparse, gc, logging, os, select, signal, socket, sys, time
+
+# Must be in place before TensorFlow, ONNX Runtime and the server are imported
+os.environ.setdefault("FACE_API_INFERENCE", "onnx")
+os.environ.setdefault("FACE_API_WORKERS", "1")
+os.environ["FACE_API_EXECUTOR"] = "thread"  # the workers are the processes
+os.environ["TF_NUM_INTRAOP_THREADS"] = os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+if os.environ.get("FACE_API_ONNX_THREADS", "1") != "1":
+    print("⚠️ FACE_API_ONNX_THREADS is forced to 1 in pre-fork mode, use more workers instead", file=sys.stderr)
+os.environ["FACE_API_ONNX_THREADS"] = "1"  # thread pools created before fork() do not exist in the children
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("face-api")
+
+import face_pipeline, onnx_backend
+
+READY_TIMEOUT = 120.0  # seconds a new worker gets to start serving during a restart
+RESPAWN_DELAY = 1.0  # seconds between respawns of a worker that keeps crashing
+CRASH_WINDOW = 10.0  # a worker dying sooner than this after its start counts as a crash
+
+
+class PreforkServer:
+    """Parent process: owns the socket and the warm models, keeps `workers` children serving"""
+
+    def __init__(self, host: str, port: int, workers: int, log_level: str = "info",
+                 graceful_timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.size = workers
+        self.log_level = log_level
+        self.graceful_timeout = graceful_timeout
+        self.cache_dir = os.getenv("FACE_API_CACHE_DIR", ".cache")
+        self.children = {}  # pid -> (slot, start time)
+        self.sock = None
+        self._stopping = False
+        self._restart = False
+
+    # -------------------------------
+    # Parent setup
+    # -------------------------------
+    def load(self):
+        if face_pipeline.INFERENCE_BACKEND != "onnx":
+            raise RuntimeError("Pre-fork mode needs FACE_API_INFERENCE=onnx: TensorFlow deadlocks in forked workers")
+        t0 = time.perf_counter()
+        detector = face_pipeline.load_models()
+        if not onnx_backend.runs_on_onnx(detector):
+            raise RuntimeError("The MTCNN detector is not on ONNX Runtime, run export_onnx.py first")
+        # objects that exist now are never collected or moved again, so the
+        # collector does not dirty (and copy) the pages shared with the workers
+        gc.collect()
+        gc.freeze()
+        logger.info(f"✅ Models loaded in the parent in {time.perf_counter() - t0:.2f}s, shared by every worker")
+
+    def bind(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(2048)
+        self.sock.set_inheritable(True)
+        logger.info(f"✅ Listening on {self.host}:{self.port} with {self.size} worker(s)")
+
+    # -------------------------------
+    # Workers
+    # -------------------------------
+    def spawn(self, slot: int) -> tuple:
+        """Fork the worker of `slot`; returns (pid, fd readable once it serves)"""
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            try:
+                self._serve(slot, ready_w)
+                code = 0
+            except BaseException as e:
+                logger.error(f"❌ Worker {slot} failed: {e}")
+                code = 1
+            os._exit(code)
+        os.close(ready_w)
+        self.children[pid] = (slot, time.monotonic())
+        logger.info(f"🔁 Worker {slot} started (pid {pid})")
+        return pid, ready_r
+
+    def _serve(self, slot: int, ready_w: int):
+        """Child: import the app on top of the inherited models and serve the shared socket"""
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        if self.cache_dir:
+            # the on-disk profile cache has a single writer per directory, so
+            # the cache (and the /identify index built from it) is per worker
+            os.environ["FACE_API_CACHE_DIR"] = os.path.join(self.cache_dir, f"worker-{slot}")
+
+        import uvicorn
+        import server
+
+        @server.app.on_event("startup")
+        async def notify_parent():
+            try:
+                os.write(ready_w, b"1")
+            except OSError:
+                pass  # the parent only waits for it during a rolling restart
+            finally:
+                os.close(ready_w)
+
+        config = uvicorn.Config(server.app, log_level=self.log_level,
+                                timeout_graceful_shutdown=self.graceful_timeout)
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _wait_ready(self, pid: int, ready_r: int) -> bool:
+        try:
+            readable, _, _ = select.select([ready_r], [], [], READY_TIMEOUT)
+            return bool(readable) and os.read(ready_r, 1) == b"1"
+        finally:
+            os.close(ready_r)
+
+    def _stop_child(self, pid: int, sig=signal.SIGTERM):
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self) -> list:
+        """Collect exited children; returns the slots left without a worker"""
+        freed = []
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            slot, started = self.children.pop(pid, (None, None))
+            if slot is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if not self._stopping:
+                logger.warning(f"⚠️ Worker {slot} (pid {pid}) exited with code {code}")
+                if time.monotonic() - started < CRASH_WINDOW:
+                    time.sleep(RESPAWN_DELAY)
+            freed.append(slot)
+        return freed
+
+    def rolling_restart(self):
+        """Replace every worker, one at a time, without dropping the socket or the warm models"""
+        logger.info("🔁 Restarting workers")
+        for old_pid, (slot, _) in list(self.children.items()):
+            if self._stopping:
+                return
+            new_pid, ready_r = self.spawn(slot)
+            if not self._wait_ready(new_pid, ready_r):
+                logger.error(f"❌ Worker {slot} (pid {new_pid}) did not start, keeping pid {old_pid}")
+                self._stop_child(new_pid, signal.SIGKILL)
+                continue
+            self.children[old_pid] = (None, 0)  # no longer owns the slot, do not respawn it
+            self._stop_child(old_pid)
+        logger.info("✅ Workers restarted")
+
+    # -------------------------------
+    # Supervision loop
+    # -------------------------------
+    def run(self):
+        self.load()
+        self.bind()
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_restart)
+
+        for slot in range(self.size):
+            os.close(self.spawn(slot)[1])
+        while not self._stopping:
+            for slot in self._reap():
+                if slot is not None and not self._stopping:
+                    os.close(self.spawn(slot)[1])
+            if self._restart:
+                self._restart = False
+                self.rolling_restart()
+            time.sleep(0.2)
+        self.shutdown()
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def _on_restart(self, signum, frame):
+        self._restart = True
+
+    def shutdown(self):
+        logger.info("🛑 Stopping workers")
+        for pid in list(self.children):
+            self._stop_child(pid)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self.children):
+            self._stop_child(pid, signal.SIGKILL)
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("FACE_API_PREFORK_WORKERS", "0")) or os.cpu_count(),
+                        help="worker processes (default FACE_API_PREFORK_WORKERS, else one per core)")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="seconds a stopping worker gets to finish its requests")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    PreforkServer(args.host, args.port, args.workers, args.log_level, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    main()
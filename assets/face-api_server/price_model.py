@@ -0,0 +1,157 @@
+import os, re, threading, logging
+
+import numpy as np
+
+logger = logging.getLogger("face-api")
+
+# Same order as PricePredictionService._extractFeatures in the app
+FEATURE_NAMES = (
+    "postal", "surface", "num_rooms", "proxim",
+    "is_entire", "is_room",
+    "not_furnished", "furnished",
+    "no_wifi", "wifi",
+    "no_parking", "parking",
+)
+PROXIM_FIELD = "proximHessoKm"  # campus distance on a room document (data_gen/campus_proximity.py)
+# Room fields without which the model would predict from made-up values
+REQUIRED_FIELDS = ("postcode", "sizeSqm", "rooms", "type")
+ROOM_TYPES = ("room", "whole")
+MODEL_FILE = "ss2_unistay_price.tflite"
+_NON_DIGITS = re.compile(r"[^0-9]")
+
+
+def default_model_path() -> str:
+    """ss2_unistay_price.tflite next to the server, else the app's copy in assets/"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    for path in (os.path.join(here, MODEL_FILE), os.path.join(here, "..", MODEL_FILE)):
+        if os.path.exists(path):
+            return path
+    return os.path.join(here, MODEL_FILE)
+
+
+class InvalidRoomsError(ValueError):
+    """Rooms without a usable value for some of REQUIRED_FIELDS; `problems` maps room index -> field names"""
+
+    def __init__(self, problems: dict, shown: int = 10):
+        self.problems = problems
+        listed = "; ".join(f"room {i}: {', '.join(fields)}" for i, fields in list(problems.items())[:shown])
+        more = f"; and {len(problems) - shown} more rooms" if len(problems) > shown else ""
+        super().__init__(f"Missing or invalid required fields: {listed}{more}")
+
+
+def _postal(value) -> float:
+    return float(_NON_DIGITS.sub("", str(value)))
+
+
+def invalid_fields(room: dict) -> list:
+    """REQUIRED_FIELDS of a room document that are missing, null or unusable, [] when it can be scored"""
+    invalid = {field for field in REQUIRED_FIELDS if room.get(field) is None or room.get(field) == ""}
+    if "postcode" not in invalid and not _NON_DIGITS.sub("", str(room["postcode"])):
+        invalid.add("postcode")
+    if "type" not in invalid and room["type"] not in ROOM_TYPES:
+        invalid.add("type")
+    return [field for field in REQUIRED_FIELDS if field in invalid]
+
+
+def _features(postal, surface, rooms, proxim, entire, room, furnished, wifi, parking) -> np.ndarray:
+    """12-column float32 matrix from per-room columns (booleans as bool arrays)"""
+    out = np.empty((len(postal), len(FEATURE_NAMES)), dtype=np.float32)
+    out[:, 0], out[:, 1], out[:, 2], out[:, 3] = postal, surface, rooms, proxim
+    out[:, 4], out[:, 5] = entire, room
+    out[:, 6], out[:, 7] = ~furnished, furnished
+    out[:, 8], out[:, 9] = ~wifi, wifi
+    out[:, 10], out[:, 11] = ~parking, parking
+    return out
+
+
+def features_from_rooms(rooms: list) -> np.ndarray:
+    """Feature matrix for Firestore room documents (the app's Room.toMap() fields).
+
+    Raises InvalidRoomsError naming the fields when a room lacks one of
+    REQUIRED_FIELDS. proximHessoKm is optional: rooms written before it
+    existed count as 0 km, like the app did.
+    """
+    problems = {i: fields for i, fields in enumerate(map(invalid_fields, rooms)) if fields}
+    if problems:
+        raise InvalidRoomsError(problems)
+    types = np.array([r["type"] for r in rooms], dtype=object)
+    amenities = [r.get("amenities") or () for r in rooms]
+    return _features(
+        postal=np.array([_postal(r["postcode"]) for r in rooms]),
+        surface=np.array([float(r["sizeSqm"]) for r in rooms]),
+        rooms=np.array([float(r["rooms"]) for r in rooms]),
+        proxim=np.array([float(r.get(PROXIM_FIELD) or 0.0) for r in rooms]),
+        entire=types == "whole",
+        room=types == "room",
+        furnished=np.array([bool(r.get("furnished")) for r in rooms]),
+        wifi=np.array(["Internet" in a for a in amenities]),
+        parking=np.array(["Parking" in a for a in amenities]),
+    )
+
+
+def features_from_csv(columns: dict) -> np.ndarray:
+    """Feature matrix for synthetic_valais_price.csv columns (lists or arrays of strings)"""
+    flag = lambda name: np.asarray(columns[name]) == "True"
+    types = np.asarray(columns["type"])
+    return _features(
+        postal=np.array([_postal(p) for p in columns["postal_code"]]),
+        surface=np.asarray(columns["surface_m2"], dtype=np.float64),
+        rooms=np.asarray(columns["num_rooms"], dtype=np.float64),
+        proxim=np.asarray(columns["proxim_hesso_km"], dtype=np.float64),
+        entire=types == "entire_home",
+        room=types == "room",
+        furnished=flag("is_furnished"),
+        wifi=flag("wifi_incl"),
+        parking=flag("car_park"),
+    )
+
+
+def _interpreter(path: str, threads: int):
+    try:
+        from tflite_runtime.interpreter import Interpreter  # small runtime-only package, if installed
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter(model_path=path, num_threads=threads or None)
+
+
+class PricePredictor:
+    """ss2_unistay_price.tflite run on whole batches of feature rows.
+
+    The model's batch dimension is dynamic, so the input tensor is resized to
+    the batch instead of invoking once per room. Batches larger than
+    `max_batch` are split. The interpreter is not thread-safe: calls are
+    serialized with a lock.
+    """
+
+    def __init__(self, model_path: str = None, max_batch: int = 4096, threads: int = 0):
+        self.model_path = model_path or default_model_path()
+        self.max_batch = max_batch
+        self._interpreter = _interpreter(self.model_path, threads)
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        self._output = self._interpreter.get_output_details()[0]["index"]
+        self._batch = 0
+        self._lock = threading.Lock()
+        logger.info(f"✅ Price model loaded from {self.model_path}")
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        if len(batch) != self._batch:
+            self._interpreter.resize_tensor_input(self._input, [len(batch), len(FEATURE_NAMES)])
+            self._interpreter.allocate_tensors()
+            self._batch = len(batch)
+        self._interpreter.set_tensor(self._input, batch)
+        self._interpreter.invoke()
+        return self._interpreter.get_tensor(self._output)[:, 0].copy()
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Predicted prices (CHF) for an (n, 12) feature matrix; NaN/inf predictions become NaN"""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if not len(features):
+            return np.empty(0, dtype=np.float32)
+        with self._lock:
+            prices = np.concatenate([
+                self._run(features[start:start + self.max_batch])
+                for start in range(0, len(features), self.max_batch)
+            ])
+        prices[~np.isfinite(prices)] = np.nan
+        return prices
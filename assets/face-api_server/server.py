@@ -1,14 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-import base64, cv2, numpy as np, re, os, logging
-
-from deepface import DeepFace
-from deepface.detectors import FaceDetector
+from typing import List
+import re, os, logging, asyncio, time, functools, threading, contextlib
 
 import firebase_admin
 from firebase_admin import credentials, auth
 
+import face_pipeline
+from face_pipeline import DeepFaceError, NoFaceError, MultipleFacesError
+from worker_pool import WorkerPool
+from embedding_cache import EmbeddingCache, content_hash
+from embedding_batcher import EmbeddingBatcher
+from embedding_index import build_index
+from token_service import TokenMinter, FakeAuth
+from price_model import PricePredictor, features_from_rooms
+from admission import AdmissionController, Overloaded, PayloadTooLarge, DeadlineExceeded, run_before
+from single_flight import SingleFlight, payload_key
+from metrics import Registry
+
 # -------------------------------
 # Logging Setup
 # -------------------------------
@@ -23,6 +34,12 @@ class Images(BaseModel):
     img2: str  # login image data:image/jpeg;base64,...
     filename: str  # profile_UID.jpg format
 
+class LoginImage(BaseModel):
+    img: str  # login image data:image/jpeg;base64,...
+
+class PriceRequest(BaseModel):
+    rooms: List[dict]  # room documents, Room.toMap() fields (postcode, sizeSqm, rooms, type, furnished, amenities)
+
 # -------------------------------
 # FastAPI app
 # -------------------------------
@@ -38,20 +55,234 @@ app.add_middleware(
 # -------------------------------
 # Firebase Initialization
 # -------------------------------
-try:
-    cred = credentials.Certificate("firebase-service-account.json")
-    firebase_admin.initialize_app(cred)
-    logger.info("✅ Firebase Admin initialized successfully")
-except Exception as e:
-    logger.error(f"❌ Firebase initialization failed: {e}")
-    raise
+AUTH_BACKEND = os.getenv("FACE_API_AUTH_BACKEND", "firebase")  # "fake" = local tokens, no Firebase
+
+if AUTH_BACKEND == "fake":
+    auth_api = FakeAuth()
+    logger.warning("⚠️ Using the fake auth backend, custom tokens are NOT valid Firebase tokens")
+else:
+    try:
+        cred = credentials.Certificate("firebase-service-account.json")
+        firebase_admin.initialize_app(cred)
+        auth_api = auth
+        logger.info("✅ Firebase Admin initialized successfully")
+    except Exception as e:
+        logger.error(f"❌ Firebase initialization failed: {e}")
+        raise
+
+token_minter = TokenMinter(
+    auth_api,
+    lookup_mode=os.getenv("FACE_API_USER_LOOKUP", "async"),
+    cache_size=int(os.getenv("FACE_API_USER_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("FACE_API_USER_CACHE_TTL", "600")),
+    negative_ttl=float(os.getenv("FACE_API_USER_CACHE_NEGATIVE_TTL", "60")),
+)
+
+# -------------------------------
+# Worker Pool (models load once per worker)
+# -------------------------------
+EXECUTOR_BACKEND = os.getenv("FACE_API_EXECUTOR", "thread")  # "thread" or "process"
+WORKER_COUNT = int(os.getenv("FACE_API_WORKERS", "2"))
+
+worker_pool = WorkerPool(EXECUTOR_BACKEND, WORKER_COUNT, initializer=face_pipeline.load_models)
+
+# -------------------------------
+# Profile Embedding Cache
+# -------------------------------
+CACHE_DIR = os.getenv("FACE_API_CACHE_DIR", ".cache")  # empty string = memory only
+CACHE_CAPACITY = int(os.getenv("FACE_API_CACHE_CAPACITY", "10000"))
+CACHE_MEMORY_SIZE = int(os.getenv("FACE_API_CACHE_MEMORY_SIZE", "1024"))
+CACHE_FLUSH_S = float(os.getenv("FACE_API_CACHE_FLUSH_S", "1.0"))
+
+embedding_cache = EmbeddingCache(
+    CACHE_DIR, capacity=CACHE_CAPACITY, memory_size=CACHE_MEMORY_SIZE, flush_interval=CACHE_FLUSH_S
+)
+
+# -------------------------------
+# Profile Embedding Index (1:N /identify)
+# -------------------------------
+INDEX_KIND = os.getenv("FACE_API_INDEX", "exact")  # "exact" or "ivf"
+INDEX_DTYPE = os.getenv("FACE_API_INDEX_DTYPE", "float32")  # "float32" or "float16"
+INDEX_LISTS = int(os.getenv("FACE_API_INDEX_LISTS", "0"))  # ivf partitions, 0 = sqrt(profiles)
+INDEX_PROBES = int(os.getenv("FACE_API_INDEX_PROBES", "8"))
+# ivf stays exact below INDEX_TRAIN_MIN profiles (0 = a tenth of the cache capacity)
+INDEX_TRAIN_MIN = int(os.getenv("FACE_API_INDEX_TRAIN_MIN", "0")) or max(1, CACHE_CAPACITY // 10)
+# ivf partitions are re-clustered in the background after this many new profiles (0 = INDEX_TRAIN_MIN)
+INDEX_RETRAIN_EVERY = int(os.getenv("FACE_API_INDEX_RETRAIN_EVERY", "0")) or INDEX_TRAIN_MIN
+IDENTIFY_CANDIDATES = int(os.getenv("FACE_API_IDENTIFY_CANDIDATES", "5"))
+# A 1:N match is N times more likely to be a false accept than /verify's 1:1 match,
+# so /identify mints no token unless enabled, and then only for a strict, unambiguous match
+IDENTIFY_TOKENS = os.getenv("FACE_API_IDENTIFY_TOKENS", "0") == "1"
+IDENTIFY_TOKEN_THRESHOLD = float(os.getenv("FACE_API_IDENTIFY_TOKEN_THRESHOLD", "0")) or face_pipeline.THRESHOLD / 2
+IDENTIFY_TOKEN_MARGIN = float(os.getenv("FACE_API_IDENTIFY_TOKEN_MARGIN", "0.1"))  # runner-up at least this much farther
+
+profile_index = build_index(INDEX_KIND, embedding_cache.dim, INDEX_DTYPE, INDEX_LISTS, INDEX_PROBES)
+cached_profiles = list(embedding_cache.items())
+if cached_profiles:
+    profile_index.add_many([uid for uid, _ in cached_profiles], [vector for _, vector in cached_profiles])
+if INDEX_KIND == "ivf" and len(profile_index) >= max(INDEX_TRAIN_MIN, INDEX_LISTS):
+    profile_index.train()
+del cached_profiles
+embedding_cache.on_evict = profile_index.remove
+logger.info(f"✅ Profile index ready: {len(profile_index)} profiles ({INDEX_KIND}, {INDEX_DTYPE})")
+if INDEX_KIND == "ivf" and not profile_index.trained:
+    logger.warning(
+        f"⚠️ FACE_API_INDEX=ivf but only {len(profile_index)} profiles (< {max(INDEX_TRAIN_MIN, INDEX_LISTS)}), "
+        "the index searches exactly until it is trained"
+    )
+index_training = None  # the running background train(), if any
+
+def maybe_train_index():
+    """Train the ivf partitions in the background once enough profiles were added since the last training"""
+    global index_training
+    if INDEX_KIND != "ivf" or index_training is not None:
+        return
+    if len(profile_index) < max(INDEX_TRAIN_MIN, INDEX_LISTS):
+        return
+    if profile_index.trained and profile_index.added_since_training < INDEX_RETRAIN_EVERY:
+        return
+    logger.info(f"🔁 Training the profile index in the background ({len(profile_index)} profiles)")
+    index_training = asyncio.get_running_loop().run_in_executor(None, profile_index.train)
+    index_training.add_done_callback(index_trained)
+
+def index_trained(future):
+    global index_training
+    index_training = None
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"❌ Profile index training failed: {future.exception()}")
+
+# -------------------------------
+# Metrics (Prometheus text format on /metrics)
+# -------------------------------
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram(
+    "face_api_stage_seconds", "Latency of each verification stage", labelnames=("stage",)
+)
+REQUESTS = metrics.counter(
+    "face_api_requests_total", "Verification requests by outcome", labelnames=("outcome",)
+)
+IN_FLIGHT = metrics.gauge("face_api_requests_in_flight", "Verification requests being processed")
+MODEL_LOAD_SECONDS = metrics.gauge(
+    "face_api_model_load_seconds", "Model load and warm-up time per worker", labelnames=("worker", "stage")
+)
+QUEUE_DEPTH = metrics.gauge("face_api_worker_queue_depth", "Jobs queued or running per worker", labelnames=("worker",))
+BATCH_SIZE = metrics.histogram("face_api_embedding_batch_size", "Faces per embedding batch", buckets=[])
+BATCH_WAIT = metrics.histogram("face_api_embedding_batch_wait_seconds", "Time a face waited for its batch", buckets=[])
+DETECTIONS = metrics.counter(
+    "face_api_detections_total", "Images by the detector that decided (cascade first stage or full detector)",
+    labelnames=("detector",)
+)
+PROFILE_CACHE = metrics.counter(
+    "face_api_profile_cache_total", "Profile embedding cache lookups", labelnames=("result",)
+)
+IDENTIFY_REQUESTS = metrics.counter(
+    "face_api_identify_requests_total", "Identification requests by outcome", labelnames=("outcome",)
+)
+STREAM_SESSIONS = metrics.counter(
+    "face_api_stream_sessions_total", "Streaming verification sessions by outcome", labelnames=("outcome",)
+)
+STREAM_FRAMES = metrics.counter(
+    "face_api_stream_frames_total", "Streamed login frames by outcome", labelnames=("outcome",)
+)
+ADMISSION_BYTES = metrics.gauge("face_api_admission_bytes_in_use", "Estimated memory held by admitted requests")
+ADMISSION_WAITING = metrics.gauge("face_api_admission_waiting", "Requests waiting for admission")
+VERIFY_DEDUP = metrics.counter(
+    "face_api_verify_dedup_total", "Verification results computed, shared with a concurrent duplicate or cached",
+    labelnames=("result",)
+)
+
+# -------------------------------
+# Embedding Micro-Batching
+# -------------------------------
+BATCH_MAX_SIZE = int(os.getenv("FACE_API_BATCH_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("FACE_API_BATCH_WAIT_MS", "10"))
+
+async def run_embedding_batch(batch):
+    embeddings, seconds = await worker_pool.run(face_pipeline.embed_batch, batch)
+    STAGE_SECONDS.labels(stage="embedding").observe(seconds)
+    return embeddings
+
+embedding_batcher = EmbeddingBatcher(run_embedding_batch, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS)
+BATCH_SIZE.attach(embedding_batcher.batch_sizes)
+BATCH_WAIT.attach(embedding_batcher.wait_seconds)
+STAGE_SECONDS.attach(token_minter.lookup_seconds, stage="user_lookup")
+STAGE_SECONDS.attach(token_minter.mint_seconds, stage="token_mint")
+
+# -------------------------------
+# Startup Warm-up / Readiness
+# -------------------------------
+readiness = {"ready": False, "error": None, "startup_seconds": None, "workers": []}
+
+async def warm_up_workers():
+    """Load and warm the models on every worker; /ready flips once all are done"""
+    t0 = time.perf_counter()
+    try:
+        readiness["workers"] = await worker_pool.run_on_each(face_pipeline.worker_warm_up)
+    except Exception as e:
+        readiness["error"] = str(e)
+        logger.error(f"❌ Model warm-up failed: {e}")
+        return
+    readiness["startup_seconds"] = round(time.perf_counter() - t0, 3)
+    readiness["ready"] = True
+    for i, worker in enumerate(readiness["workers"]):
+        for stage, seconds in worker["timings"].items():
+            MODEL_LOAD_SECONDS.labels(worker=i, stage=stage).set(seconds)
+        stages = " ".join(f"{stage}={seconds:.2f}s" for stage, seconds in worker["timings"].items())
+        logger.info(f"⏱️ Worker {worker['pid']}/{worker['thread']} warm: {stages}")
+    logger.info(f"✅ Ready to serve after {readiness['startup_seconds']}s")
+
+@app.on_event("startup")
+async def start_warm_up():
+    # runs in the background so /health answers while the models load
+    app.state.warm_up_task = asyncio.ensure_future(warm_up_workers())
+
+@app.on_event("shutdown")
+def shutdown_worker_pool():
+    worker_pool.shutdown()
+    token_minter.shutdown()
+    embedding_cache.close()
 
 # -------------------------------
-# DeepFace Detector (load once)
+# Admission Control (memory budget, bounded wait queue, deadlines)
 # -------------------------------
-DETECTOR_BACKEND = "mtcnn"  # change to "retinaface" for stronger accuracy
-face_detector = FaceDetector.build_model(DETECTOR_BACKEND)
-logger.info(f"✅ Face detector loaded: {DETECTOR_BACKEND}")
+MEMORY_BUDGET_MB = float(os.getenv("FACE_API_MEMORY_BUDGET_MB", "512"))
+ADMISSION_QUEUE = int(os.getenv("FACE_API_ADMISSION_QUEUE", "32"))
+REQUEST_DEADLINE_S = float(os.getenv("FACE_API_REQUEST_DEADLINE_S", "25"))  # the app gives up after 30 s
+RETRY_AFTER_S = int(os.getenv("FACE_API_RETRY_AFTER_S", "2"))
+
+admission = AdmissionController(int(MEMORY_BUDGET_MB * 2**20), ADMISSION_QUEUE, RETRY_AFTER_S)
+
+# -------------------------------
+# Duplicate Verifications (single-flight + short-lived results)
+# -------------------------------
+VERIFY_DEDUP_TTL_S = float(os.getenv("FACE_API_VERIFY_DEDUP_TTL_S", "30"))  # 0 = coalesce concurrent duplicates only
+VERIFY_DEDUP_SIZE = int(os.getenv("FACE_API_VERIFY_DEDUP_SIZE", "256"))
+
+verification_flight = SingleFlight(VERIFY_DEDUP_TTL_S, VERIFY_DEDUP_SIZE)
+
+# -------------------------------
+# Streaming Verification (WebSocket)
+# -------------------------------
+STREAM_MAX_FRAMES = int(os.getenv("FACE_API_STREAM_MAX_FRAMES", "10"))
+STREAM_FRAME_ERRORS = ("no_face", "multiple_faces", "invalid")  # the next frame may do better
+
+# -------------------------------
+# Price Prediction
+# -------------------------------
+PRICE_MODEL_PATH = os.getenv("FACE_API_PRICE_MODEL", "")  # empty = ss2_unistay_price.tflite here or in assets/
+PRICE_MAX_ROOMS = int(os.getenv("FACE_API_PRICE_MAX_ROOMS", "10000"))
+
+price_predictor = None
+price_predictor_lock = threading.Lock()
+
+def predict_room_prices(rooms: list):
+    """Feature extraction + batched TFLite inference, runs in the default executor"""
+    global price_predictor
+    features = features_from_rooms(rooms)  # InvalidRoomsError before the model is even loaded
+    with price_predictor_lock:
+        if price_predictor is None:
+            price_predictor = PricePredictor(PRICE_MODEL_PATH or None)
+    return price_predictor.predict(features)
 
 # -------------------------------
 # Helpers
@@ -64,105 +295,475 @@ def extract_uid_from_filename(filename: str) -> str:
         raise ValueError(f"Invalid filename format. Expected 'profile_UID.jpg', got '{base_filename}'")
     return match.group(1)
 
-def b64_to_rgb_array(data_url: str):
-    """Convert base64 image to RGB numpy array"""
-    if data_url.startswith('data:image/'):
-        _, b64data = data_url.split(",", 1)
-    else:
-        b64data = data_url
+def http_error(status_code: int, detail: str, outcome: str, headers: dict = None) -> HTTPException:
+    """HTTPException tagged with the outcome label it is counted under"""
+    error = HTTPException(status_code=status_code, detail=detail, headers=headers)
+    error.outcome = outcome
+    return error
 
-    raw = base64.b64decode(b64data)
-    arr = np.frombuffer(raw, np.uint8)
-    bgr = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+def unavailable(detail: str, outcome: str, retry_after: float = RETRY_AFTER_S) -> HTTPException:
+    """503 telling the client when to retry"""
+    logger.warning(f"⚠️ Shedding request ({outcome}): {detail}")
+    return http_error(503, detail, outcome, headers={"Retry-After": str(max(1, round(retry_after)))})
+
+@contextlib.asynccontextmanager
+async def admitted(request: Request, deadline: float, *raws: bytes):
+    """Hold the request's share of the memory budget: declared payload plus decoded image size"""
+    declared = int(request.headers.get("content-length") or sum(len(raw) for raw in raws))
+    cost = declared + sum(face_pipeline.decode_memory(raw) for raw in raws)
+    try:
+        await admission.acquire(cost, deadline)
+    except PayloadTooLarge as e:
+        logger.error(f"❌ Request validation failed: {e}")
+        raise http_error(413, str(e), "invalid")
+    except Overloaded as e:
+        raise unavailable(str(e), "overloaded", e.retry_after)
+    try:
+        yield
+    finally:
+        admission.release(cost)
 
-    if bgr is None:
-        raise ValueError("Could not decode image - invalid image data")
+def instrumented(counter=REQUESTS, matched: str = "verified"):
+    """Count a route's requests by outcome (`matched` or not_`matched` on success) and track how many are in flight"""
+    def decorator(route):
+        @functools.wraps(route)
+        async def wrapper(*args, **kwargs):
+            IN_FLIGHT.inc()
+            outcome = "error"
+            try:
+                response = await route(*args, **kwargs)
+                outcome = matched if response[matched] else f"not_{matched}"
+                return response
+            except HTTPException as e:
+                outcome = getattr(e, "outcome", "error")
+                raise
+            finally:
+                IN_FLIGHT.dec()
+                counter.labels(outcome=outcome).inc()
+        return wrapper
+    return decorator
 
-    return cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+def observe_worker_timings(detection: dict):
+    DETECTIONS.labels(detector=detection["detector"]).inc()
+    for stage, seconds in detection["timings"].items():
+        STAGE_SECONDS.labels(stage=stage).observe(seconds)
 
-def validate_faces(image: np.ndarray, detector_backend: str = DETECTOR_BACKEND) -> None:
-    """Ensure exactly one face is present in the image"""
-    faces = FaceDetector.detect_faces(face_detector, detector_backend, image, align=False)
-    if len(faces) == 0:
-        raise ValueError("No face detected in the image")
-    elif len(faces) > 1:
-        raise ValueError(f"Multiple faces detected ({len(faces)})")
+def pipeline_http_error(e: Exception) -> HTTPException:
+    """Log a detection/embedding failure and map it to the HTTP error it is reported as"""
+    if isinstance(e, DeadlineExceeded):
+        return unavailable(str(e), "deadline_exceeded")
+    if isinstance(e, DeepFaceError):
+        logger.error(f"❌ DeepFace error: {e}")
+        return http_error(500, f"DeepFace error: {e}", "error")
+    if isinstance(e, ValueError):
+        logger.error(f"❌ Request validation failed: {e}")
+        if isinstance(e, NoFaceError):
+            return http_error(400, str(e), "no_face")
+        if isinstance(e, MultipleFacesError):
+            return http_error(400, str(e), "multiple_faces")
+        return http_error(400, str(e), "invalid")
+    logger.error(f"❌ Worker error: {e}")
+    return http_error(500, f"Worker error: {e}", "error")
 
-def create_firebase_token(uid: str, verification_data: dict = None) -> str:
-    """Create Firebase custom token with optional verification claims"""
+def remember_profile(uid: str, profile_hash: str, embedding):
+    """Store a freshly computed profile embedding in the cache and the /identify index"""
     try:
-        auth.get_user(uid)  # verify user exists
-    except auth.UserNotFoundError:
-        logger.warning(f"⚠️ UID {uid} not found in Firebase Auth, continuing...")
+        vector = embedding_cache.put(uid, profile_hash, embedding)
+        profile_index.add(uid, vector)
+        maybe_train_index()
     except Exception as e:
-        raise Exception(f"Error verifying user: {e}")
+        logger.warning(f"⚠️ Could not cache profile embedding for {uid}: {e}")
 
-    claims = {"authMethod": "face_recognition"}
-    if verification_data:
-        claims.update({
-            "verification_distance": verification_data.get("distance", 0.0),
-            "verification_model": verification_data.get("model", "unknown")
-        })
+async def mint_token(uid: str, result: dict) -> str:
+    try:
+        verification_data = {
+            "distance": float(result["distance"]),
+            "model": result.get("model", "unknown")
+        }
+        return await token_minter.mint(uid, verification_data)
+    except Exception as e:
+        logger.error(f"❌ Firebase token generation failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# -------------------------------
+# Verification Flow
+# -------------------------------
+async def compare_faces(uid: str, profile_raw: bytes, login_raw: bytes, deadline: float = None) -> dict:
+    """Detection, embedding and distance of one verification, from raw image bytes to the decision.
+
+    Detection and embedding are skipped (503) once `deadline` (time.monotonic()) has passed.
+    """
+    profile_hash = content_hash(profile_raw)
+    profile_embedding = embedding_cache.get(uid, profile_hash)
+    cache_hit = profile_embedding is not None
+    PROFILE_CACHE.labels(result="hit" if cache_hit else "miss").inc()
 
     try:
-        token = auth.create_custom_token(uid, developer_claims=claims)
+        # decode and detection run off the event loop, embeddings are batched across requests
+        if cache_hit:
+            login = await worker_pool.run(run_before, deadline, "detection", face_pipeline.detect_image, login_raw)
+            observe_worker_timings(login)
+            login_embedding = await embedding_batcher.embed(login["pixels"], deadline)
+        else:
+            profile, login = await worker_pool.run(
+                run_before, deadline, "detection", face_pipeline.detect_images, profile_raw, login_raw
+            )
+            observe_worker_timings(profile)
+            observe_worker_timings(login)
+            profile_embedding, login_embedding = await asyncio.gather(
+                embedding_batcher.embed(profile["pixels"], deadline),
+                embedding_batcher.embed(login["pixels"], deadline),
+            )
+            remember_profile(uid, profile_hash, profile_embedding)
+        t0 = time.perf_counter()
+        result = face_pipeline.compare_embeddings(profile_embedding, login_embedding)
+        STAGE_SECONDS.labels(stage="distance").observe(time.perf_counter() - t0)
+        logger.info(
+            f"📊 DeepFace: verified={result['verified']} distance={result['distance']:.4f} "
+            f"profile_cache={'hit' if cache_hit else 'miss'} login_face={login['facial_area']}"
+        )
     except Exception as e:
-        logger.error(f"❌ Token creation with claims failed: {e}, falling back")
-        token = auth.create_custom_token(uid)
+        raise pipeline_http_error(e)
 
-    return token.decode("utf-8") if isinstance(token, bytes) else str(token)
+    return {
+        "verified": bool(result["verified"]),
+        "distance": float(result["distance"]),
+        "model": result.get("model", "unknown"),
+    }
+
+def owned_by_request(error: Exception) -> bool:
+    """Failures of the request that ran a verification, not of its duplicates: its deadline or its admission"""
+    return getattr(error, "outcome", None) in ("deadline_exceeded", "overloaded")
+
+async def run_verification(uid: str, profile_raw: bytes, login_raw: bytes, request: Request,
+                           deadline: float = None) -> dict:
+    """Shared verification flow of every /verify variant, from raw image bytes to the response body.
+
+    Requests with the same UID and images share one computation while it runs and
+    reuse its result for FACE_API_VERIFY_DEDUP_TTL_S; the token is minted per response.
+    Each request keeps its own deadline, and a shed (503) computation is not
+    reported to its duplicates: they compute again under their own deadline.
+    """
+    async def compute():
+        async with admitted(request, deadline, profile_raw, login_raw):
+            return await compare_faces(uid, profile_raw, login_raw, deadline)
+
+    try:
+        result, source = await verification_flight.run(
+            payload_key(uid.encode(), profile_raw, login_raw), compute, deadline, private=owned_by_request
+        )
+    except DeadlineExceeded as e:
+        raise unavailable(str(e), "deadline_exceeded")
+    VERIFY_DEDUP.labels(result=source).inc()
+    if source != "computed":
+        logger.info(f"♻️ Duplicate verification for {uid}: {source} result reused")
+
+    custom_token = None
+    if result["verified"]:
+        custom_token = await mint_token(uid, result)
+
+    return {**result, "uid": uid, "customToken": custom_token}
+
+def unambiguous_match(matches: list) -> bool:
+    """Whether the best of the sorted `matches` may log in without a claimed UID: strict distance and a clear margin"""
+    if not matches or matches[0][1] > IDENTIFY_TOKEN_THRESHOLD:
+        return False
+    return len(matches) < 2 or matches[1][1] - matches[0][1] >= IDENTIFY_TOKEN_MARGIN
+
+async def run_identification(login_raw: bytes, deadline: float = None) -> dict:
+    """1:N flow: embed the login face once and search every indexed profile.
+
+    Returns the candidate UIDs within the verification threshold, closest
+    first; the app logs in by verifying one of them through /verify. A token
+    is only minted here when FACE_API_IDENTIFY_TOKENS is on and the match is
+    unambiguous.
+    """
+    try:
+        login = await worker_pool.run(run_before, deadline, "detection", face_pipeline.detect_image, login_raw)
+        observe_worker_timings(login)
+        login_embedding = await embedding_batcher.embed(login["pixels"], deadline)
+        t0 = time.perf_counter()
+        # the search is a BLAS call that releases the GIL, keep it off the event loop
+        # (at least 2 results, the margin check needs the runner-up)
+        matches = await asyncio.get_running_loop().run_in_executor(
+            None, profile_index.search, login_embedding, max(IDENTIFY_CANDIDATES, 2)
+        )
+        STAGE_SECONDS.labels(stage="index_search").observe(time.perf_counter() - t0)
+    except Exception as e:
+        raise pipeline_http_error(e)
+
+    candidates = [
+        {"uid": uid, "distance": distance}
+        for uid, distance in matches[:IDENTIFY_CANDIDATES] if distance <= face_pipeline.THRESHOLD
+    ]
+    custom_token = None
+    if IDENTIFY_TOKENS and unambiguous_match(matches):
+        uid, distance = matches[0]
+        custom_token = await mint_token(uid, {"distance": distance, "model": face_pipeline.MODEL_NAME})
+    logger.info(
+        f"📊 Identify: candidates={len(candidates)} best={matches[0][1] if matches else None} "
+        f"token={custom_token is not None} profiles={len(profile_index)} login_face={login['facial_area']}"
+    )
+
+    return {
+        "identified": bool(candidates),
+        "candidates": candidates,
+        "model": face_pipeline.MODEL_NAME,
+        "customToken": custom_token,
+    }
+
+async def profile_embedding_for(uid: str, profile_raw: bytes, deadline: float = None) -> tuple:
+    """(embedding, cache hit) of a profile image: cached by UID + content hash, embedded once otherwise"""
+    profile_hash = content_hash(profile_raw)
+    embedding = embedding_cache.get(uid, profile_hash)
+    PROFILE_CACHE.labels(result="hit" if embedding is not None else "miss").inc()
+    if embedding is not None:
+        return embedding, True
+    try:
+        profile = await worker_pool.run(run_before, deadline, "detection", face_pipeline.detect_image, profile_raw)
+        observe_worker_timings(profile)
+        embedding = await embedding_batcher.embed(profile["pixels"], deadline)
+    except Exception as e:
+        raise pipeline_http_error(e)
+    remember_profile(uid, profile_hash, embedding)
+    return embedding, False
+
+async def score_frame(profile_embedding, frame_raw: bytes, deadline: float = None) -> dict:
+    """Detect, embed and compare one streamed login frame against the profile embedding"""
+    try:
+        login = await worker_pool.run(run_before, deadline, "detection", face_pipeline.detect_image, frame_raw)
+        observe_worker_timings(login)
+        login_embedding = await embedding_batcher.embed(login["pixels"], deadline)
+        t0 = time.perf_counter()
+        result = face_pipeline.compare_embeddings(profile_embedding, login_embedding)
+        STAGE_SECONDS.labels(stage="distance").observe(time.perf_counter() - t0)
+    except Exception as e:
+        raise pipeline_http_error(e)
+    return {
+        "verified": bool(result["verified"]),
+        "distance": float(result["distance"]),
+        "model": result.get("model", "unknown"),
+    }
+
+async def receive_frame(websocket: WebSocket, deadline: float):
+    """Next login frame: raw bytes (binary message) or a data URL (text), None when the client sends "end" """
+    message = await asyncio.wait_for(websocket.receive(), max(0.0, deadline - time.monotonic()))
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    text = message.get("text") or ""
+    return None if text.strip() == "end" else text
+
+def decode_frame(frame) -> bytes:
+    if isinstance(frame, bytes):
+        return frame
+    try:
+        return face_pipeline.decode_data_url(frame)
+    except Exception as e:
+        logger.error(f"❌ Request validation failed: {e}")
+        raise http_error(400, f"Invalid frame: {e}", "invalid")
+
+async def close_stream(websocket: WebSocket, code: int, detail: str, outcome: str):
+    """Report why the session stopped, then close with `code` (1013 = try again later)"""
+    try:
+        await websocket.send_json({"type": "error", "error": outcome, "detail": detail})
+        await websocket.close(code)
+    except Exception:
+        pass  # the client is already gone
+
+async def run_stream_verification(websocket: WebSocket, deadline: float) -> str:
+    """Streaming verification session, returns its outcome label.
+
+    The first message is {"filename": "profile_UID.jpg", "img1": "data:image/jpeg;base64,..."}.
+    The profile embedding comes from the cache when this picture was seen before.
+    Then every message is one login frame, scored in arrival order; the session
+    ends at the first verified frame, after FACE_API_STREAM_MAX_FRAMES frames,
+    when the client sends "end" or at the deadline. Frames still in flight
+    then are never read, decoded or scored.
+    """
+    try:
+        start = await asyncio.wait_for(websocket.receive_json(), max(0.0, deadline - time.monotonic()))
+        uid = extract_uid_from_filename(start["filename"])
+        profile_raw = face_pipeline.decode_data_url(start["img1"])
+    except (asyncio.TimeoutError, WebSocketDisconnect):
+        raise
+    except Exception as e:
+        logger.error(f"❌ Request validation failed: {e}")
+        raise http_error(400, f"Invalid start message: {e}", "invalid")
+
+    async with admitted(websocket, deadline, profile_raw):
+        profile_embedding, cache_hit = await profile_embedding_for(uid, profile_raw, deadline)
+    await websocket.send_json({"type": "ready", "uid": uid, "profile_cache": "hit" if cache_hit else "miss"})
+
+    best = None
+    scored = 0
+    while scored < STREAM_MAX_FRAMES:
+        frame = await receive_frame(websocket, deadline)
+        if frame is None:
+            break
+        scored += 1
+        try:
+            frame_raw = decode_frame(frame)
+            async with admitted(websocket, deadline, frame_raw):
+                result = await score_frame(profile_embedding, frame_raw, deadline)
+        except HTTPException as e:
+            outcome = getattr(e, "outcome", "error")
+            if outcome not in STREAM_FRAME_ERRORS:
+                raise
+            STREAM_FRAMES.labels(outcome=outcome).inc()
+            await websocket.send_json({"type": "frame", "frame": scored, "error": outcome, "detail": e.detail})
+            continue
+
+        STREAM_FRAMES.labels(outcome="verified" if result["verified"] else "not_verified").inc()
+        await websocket.send_json({"type": "frame", "frame": scored, **result})
+        if best is None or result["distance"] < best["distance"]:
+            best = result
+        if result["verified"]:
+            break
+
+    verified = best is not None and best["verified"]
+    logger.info(f"📊 Stream: verified={verified} frames={scored} best_distance={best['distance'] if best else None}")
+    await websocket.send_json({
+        "type": "result",
+        "verified": verified,
+        "distance": best["distance"] if best else None,
+        "model": face_pipeline.MODEL_NAME,
+        "uid": uid,
+        "frames": scored,
+        "customToken": await mint_token(uid, best) if verified else None,
+    })
+    return "verified" if verified else "not_verified"
 
 # -------------------------------
 # Routes
 # -------------------------------
 @app.post("/verify")
-async def verify(images: Images):
+@instrumented()
+async def verify(images: Images, request: Request):
     logger.info("🔍 New verification request")
+    deadline = time.monotonic() + REQUEST_DEADLINE_S
 
     try:
         uid = extract_uid_from_filename(images.filename)
-        img1 = b64_to_rgb_array(images.img1)
-        img2 = b64_to_rgb_array(images.img2)
+        t0 = time.perf_counter()
+        profile_raw = face_pipeline.decode_data_url(images.img1)
+        login_raw = face_pipeline.decode_data_url(images.img2)
+        decode_seconds = time.perf_counter() - t0
+        decode_ms = decode_seconds * 1000
+    except Exception as e:
+        logger.error(f"❌ Request validation failed: {e}")
+        raise http_error(400, str(e), "invalid")
+
+    STAGE_SECONDS.labels(stage="base64_decode").observe(decode_seconds)
 
-        # ✅ Ensure only one face in each
-        validate_faces(img1)
-        validate_faces(img2)
+    logger.info(
+        f"📦 JSON payload: {request.headers.get('content-length', '?')} bytes, "
+        f"images {len(profile_raw)} + {len(login_raw)} bytes, base64 decode {decode_ms:.1f} ms"
+    )
+    return await run_verification(uid, profile_raw, login_raw, request, deadline)
 
+@app.post("/verify/upload")
+@instrumented()
+async def verify_upload(
+    request: Request,
+    img1: UploadFile = File(...),  # profile image, raw JPEG/PNG bytes
+    img2: UploadFile = File(...),  # login image, raw JPEG/PNG bytes
+    filename: str = Form(...),  # profile_UID.jpg format
+):
+    """Binary variant of /verify: multipart/form-data parts are decoded straight from their buffers"""
+    logger.info("🔍 New verification request (multipart)")
+    deadline = time.monotonic() + REQUEST_DEADLINE_S
+
+    try:
+        uid = extract_uid_from_filename(filename)
+        t0 = time.perf_counter()
+        profile_raw = await img1.read()
+        login_raw = await img2.read()
+        read_ms = (time.perf_counter() - t0) * 1000
     except Exception as e:
         logger.error(f"❌ Request validation failed: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
+        raise http_error(400, str(e), "invalid")
+    finally:
+        await img1.close()
+        await img2.close()
+
+    if not profile_raw or not login_raw:
+        logger.error("❌ Request validation failed: empty image part")
+        raise http_error(400, "Empty image part", "invalid")
+
+    logger.info(
+        f"📦 Multipart payload: {request.headers.get('content-length', '?')} bytes, "
+        f"images {len(profile_raw)} + {len(login_raw)} bytes, read {read_ms:.1f} ms"
+    )
+    return await run_verification(uid, profile_raw, login_raw, request, deadline)
 
+@app.websocket("/verify/stream")
+async def verify_stream(websocket: WebSocket):
+    """/verify over one WebSocket: a profile picture, then login frames until one matches"""
+    await websocket.accept()
+    logger.info("🔍 New streaming verification")
+    deadline = time.monotonic() + REQUEST_DEADLINE_S
+    IN_FLIGHT.inc()
+    outcome = "error"
     try:
-        result = DeepFace.verify(
-            img1_path=img1,  # numpy arrays allowed
-            img2_path=img2,
-            model_name="Facenet512",
-            detector_backend=DETECTOR_BACKEND,
-            enforce_detection=False  # we already validated
-        )
-        logger.info(f"📊 DeepFace: verified={result['verified']} distance={result['distance']:.4f}")
+        outcome = await run_stream_verification(websocket, deadline)
+        await websocket.close()
+    except WebSocketDisconnect:
+        outcome = "disconnected"
+    except asyncio.TimeoutError:
+        outcome = "deadline_exceeded"
+        await close_stream(websocket, 1013, "Deadline passed while waiting for frames", outcome)
+    except HTTPException as e:
+        outcome = getattr(e, "outcome", "error")
+        await close_stream(websocket, 1013 if e.status_code == 503 else 1008 if e.status_code < 500 else 1011,
+                           str(e.detail), outcome)
+    finally:
+        IN_FLIGHT.dec()
+        STREAM_SESSIONS.labels(outcome=outcome).inc()
+
+@app.post("/identify")
+@instrumented(IDENTIFY_REQUESTS, "identified")
+async def identify(image: LoginImage, request: Request):
+    """Find which registered profile the login face belongs to, without a filename"""
+    logger.info("🔍 New identification request")
+    deadline = time.monotonic() + REQUEST_DEADLINE_S
+
+    try:
+        t0 = time.perf_counter()
+        login_raw = face_pipeline.decode_data_url(image.img)
+        decode_seconds = time.perf_counter() - t0
     except Exception as e:
-        logger.error(f"❌ DeepFace error: {e}")
-        raise HTTPException(status_code=500, detail=f"DeepFace error: {e}")
+        logger.error(f"❌ Request validation failed: {e}")
+        raise http_error(400, str(e), "invalid")
 
-    custom_token = None
-    if bool(result["verified"]):
-        try:
-            verification_data = {
-                "distance": float(result["distance"]),
-                "model": result.get("model", "unknown")
-            }
-            custom_token = create_firebase_token(uid, verification_data)
-        except Exception as e:
-            logger.error(f"❌ Firebase token generation failed: {e}")
-            raise HTTPException(status_code=500, detail=str(e))
+    STAGE_SECONDS.labels(stage="base64_decode").observe(decode_seconds)
+    async with admitted(request, deadline, login_raw):
+        return await run_identification(login_raw, deadline)
 
+@app.post("/predict-price")
+async def predict_price(body: PriceRequest):
+    """Predicted monthly price of every room in the request, in one batched model run"""
+    if not 1 <= len(body.rooms) <= PRICE_MAX_ROOMS:
+        raise HTTPException(status_code=400, detail=f"Expected 1 to {PRICE_MAX_ROOMS} rooms, got {len(body.rooms)}")
+
+    t0 = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    try:
+        prices = await loop.run_in_executor(None, predict_room_prices, body.rooms)
+    except (TypeError, ValueError) as e:
+        logger.error(f"❌ Invalid room data: {e}")
+        raise HTTPException(status_code=400, detail=f"Invalid room data: {e}")
+    except Exception as e:
+        logger.error(f"❌ Price prediction failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Price prediction failed: {e}")
+    seconds = time.perf_counter() - t0
+    STAGE_SECONDS.labels(stage="price_prediction").observe(seconds)
+
+    logger.info(f"💰 Predicted {len(prices)} prices in {seconds * 1000:.1f} ms")
     return {
-        "verified": bool(result["verified"]),
-        "distance": float(result["distance"]),
-        "model": result.get("model", "unknown"),
-        "uid": uid,
-        "customToken": custom_token
+        "predictedPrices": [None if price != price else round(float(price), 2) for price in prices.tolist()],
+        "model": os.path.basename(price_predictor.model_path),
     }
 
 @app.get("/health")
@@ -170,8 +771,46 @@ async def health():
     return {
         "status": "OK",
         "message": "Face verification API with Firebase tokens",
-        "firebase_sdk_version": firebase_admin.__version__
+        "firebase_sdk_version": firebase_admin.__version__,
+        "inference": {
+            "backend": face_pipeline.INFERENCE_BACKEND,
+            "detector": face_pipeline.DETECTOR_BACKEND,
+            "cascade": face_pipeline.CASCADE_DETECTOR or None,
+            "onnx_precision": face_pipeline.ONNX_PRECISION if face_pipeline.INFERENCE_BACKEND == "onnx" else None,
+        },
+        "executor": {
+            "backend": worker_pool.backend,
+            "workers": worker_pool.size,
+            "queue_depth": worker_pool.queue_depths(),
+        },
+        "embedding_cache": embedding_cache.stats(),
+        "profile_index": {**profile_index.stats(), "identify_tokens": IDENTIFY_TOKENS},
+        "batching": embedding_batcher.stats(),
+        "admission": admission.stats(),
+        "verify_dedup": verification_flight.stats(),
+        "auth": {"backend": AUTH_BACKEND, **token_minter.stats()},
+    }
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once every worker has loaded and warmed its models, 503 before"""
+    body = {
+        "ready": readiness["ready"],
+        "startup_seconds": readiness["startup_seconds"],
+        "workers": readiness["workers"],
     }
+    if readiness["error"]:
+        body["error"] = readiness["error"]
+    return JSONResponse(body, status_code=200 if readiness["ready"] else 503)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text exposition of stage latencies, outcomes and pool state"""
+    for i, depth in enumerate(worker_pool.queue_depths()):
+        QUEUE_DEPTH.labels(worker=i).set(depth)
+    ADMISSION_BYTES.set(admission.in_use)
+    ADMISSION_WAITING.set(admission.waiting)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,91 @@
+import asyncio, hashlib, logging, time
+
+from admission import DeadlineExceeded, check_deadline
+from token_service import TTLCache
+
+logger = logging.getLogger("face-api")
+
+
+def payload_key(*parts: bytes) -> str:
+    """Fast content hash of a request made of several byte strings (length-prefixed, so parts cannot shift)"""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+class SingleFlight:
+    """Runs one computation per key at a time and remembers its result for `ttl` seconds.
+
+    Callers with the same key while the computation runs wait for it instead
+    of starting their own (coalesced), callers within `ttl` after it succeeded
+    get its result directly (cached). Failures are shared with the callers
+    that were waiting but never cached, the next call computes again.
+
+    Every caller keeps its own deadline: one that has passed is not joined to
+    a computation, and a caller waiting for someone else's computation gives
+    up at its own deadline. Failures that belong to the caller that started
+    the computation (`private(error)` true, e.g. its deadline or its place in
+    the admission queue) are not shared: the callers waiting for it start a
+    computation of their own instead.
+
+    The computation runs in its own task, so it is not cancelled when the
+    caller that started it goes away: its result then serves the retry.
+    Not thread-safe, it is only used from the event loop.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.results = TTLCache(max_entries)
+        self._in_flight = {}  # key -> task
+        self.counts = {"computed": 0, "coalesced": 0, "cached": 0}
+
+    async def run(self, key: str, compute, deadline: float = None, private=lambda error: False) -> tuple:
+        """(result, source) where source is "computed", "coalesced" or "cached"; compute() returns an awaitable.
+
+        `deadline` is the caller's time.monotonic() deadline; DeadlineExceeded
+        is raised when it passes before the caller gets a result from another
+        caller's computation.
+        """
+        while True:
+            if self.ttl > 0:
+                result = self.results.get(key)
+                if result is not None:
+                    self.counts["cached"] += 1
+                    return result, "cached"
+            check_deadline(deadline, "verification")
+
+            task = self._in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(compute())
+                self._in_flight[key] = task
+                task.add_done_callback(lambda done: self._finish(key, done))
+                self.counts["computed"] += 1
+                return await asyncio.shield(task), "computed"
+
+            self.counts["coalesced"] += 1
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), timeout), "coalesced"
+            except Exception as e:
+                if not task.done():  # wait_for gave up at this caller's deadline
+                    raise DeadlineExceeded("Deadline passed while waiting for a duplicate verification") from None
+                if not private(e):
+                    raise
+                # not ours to report: compute again with this caller's own deadline
+
+    def _finish(self, key: str, task):
+        self._in_flight.pop(key, None)
+        # exception() also marks a failure nobody awaited any more as retrieved
+        if task.cancelled() or task.exception() is not None:
+            return
+        if self.ttl > 0:
+            self.results.set(key, task.result(), self.ttl)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def stats(self) -> dict:
+        return {"ttl_s": self.ttl, "in_flight": self.in_flight, "cached_results": len(self.results), **self.counts}
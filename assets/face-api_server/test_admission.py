@@ -0,0 +1,120 @@
+import asyncio, time
+
+import pytest
+
+from admission import AdmissionController, DeadlineExceeded, Overloaded, PayloadTooLarge, check_deadline, run_before
+
+
+def test_admits_within_budget_and_rejects_oversized():
+    async def scenario():
+        admission = AdmissionController(100)
+        await admission.acquire(60)
+        await admission.acquire(40)
+        assert admission.in_use == 100
+        with pytest.raises(PayloadTooLarge):
+            await admission.acquire(101)
+        admission.release(60)
+        admission.release(40)
+        assert admission.in_use == 0
+        assert admission.admitted == 2
+
+    asyncio.run(scenario())
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    async def scenario():
+        admission = AdmissionController(100)
+        await admission.acquire(90)
+        order = []
+
+        async def request(name, cost):
+            await admission.acquire(cost)
+            order.append(name)
+
+        # the small request must not overtake the large one ahead of it
+        large = asyncio.ensure_future(request("large", 80))
+        await asyncio.sleep(0)
+        small = asyncio.ensure_future(request("small", 10))
+        await asyncio.sleep(0)
+        assert admission.waiting == 2 and order == []
+
+        admission.release(90)
+        await asyncio.gather(large, small)
+        assert order == ["large", "small"]
+        assert admission.in_use == 90
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        admission = AdmissionController(10, max_queue=1, retry_after=3.0)
+        await admission.acquire(10)
+        waiting = asyncio.ensure_future(admission.acquire(5))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as excinfo:
+            await admission.acquire(5)
+        assert excinfo.value.retry_after == 3.0
+        assert admission.rejected == 1
+        admission.release(10)
+        await waiting
+
+    asyncio.run(scenario())
+
+
+def test_deadline_while_waiting_frees_the_line():
+    async def scenario():
+        admission = AdmissionController(10)
+        await admission.acquire(10)
+        with pytest.raises(Overloaded):
+            await admission.acquire(5, deadline=time.monotonic() + 0.01)
+        assert admission.waiting == 0
+        assert admission.expired == 1
+        admission.release(10)
+        await admission.acquire(10)
+
+    asyncio.run(scenario())
+
+
+def test_expired_head_lets_the_next_waiter_in():
+    async def scenario():
+        admission = AdmissionController(10)
+        await admission.acquire(6)
+        head = asyncio.ensure_future(admission.acquire(8, deadline=time.monotonic() + 0.01))
+        await asyncio.sleep(0)
+        # 3 bytes would fit now, but waits behind the head of the line
+        small = asyncio.ensure_future(admission.acquire(3))
+        await asyncio.sleep(0)
+        assert not small.done()
+        with pytest.raises(Overloaded):
+            await head
+        await asyncio.wait_for(small, 1)
+        assert admission.in_use == 9
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_no_trace():
+    async def scenario():
+        admission = AdmissionController(10)
+        await admission.acquire(10)
+        waiter = asyncio.ensure_future(admission.acquire(5))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert admission.waiting == 0
+        admission.release(10)
+        assert admission.in_use == 0
+
+    asyncio.run(scenario())
+
+
+def test_deadline_checks():
+    check_deadline(None, "detection")
+    check_deadline(time.monotonic() + 10, "detection")
+    with pytest.raises(DeadlineExceeded, match="detection"):
+        check_deadline(time.monotonic() - 1, "detection")
+    assert run_before(time.monotonic() + 10, "embedding", lambda x: x * 2, 21) == 42
+    with pytest.raises(DeadlineExceeded):
+        run_before(time.monotonic() - 1, "embedding", pytest.fail, "must not run")
@@ -0,0 +1,102 @@
+import asyncio, gc, time
+
+import numpy as np
+import pytest
+
+from admission import DeadlineExceeded
+from embedding_batcher import EmbeddingBatcher
+
+
+def face(value):
+    return np.full((1, 2, 2, 3), value, dtype=np.float32)
+
+
+class FakeModel:
+    """run_batch returning each face's first pixel as its embedding, recording the batch sizes"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    async def __call__(self, batch):
+        self.batches.append(len(batch))
+        await asyncio.sleep(self.delay)
+        return batch[:, 0, 0, :1]
+
+
+def test_full_batch_flushes_without_waiting():
+    async def scenario():
+        model = FakeModel()
+        batcher = EmbeddingBatcher(model, max_batch_size=4, max_wait_ms=10_000)
+        t0 = time.perf_counter()
+        embeddings = await asyncio.gather(*(batcher.embed(face(i)) for i in range(4)))
+        assert time.perf_counter() - t0 < 1.0  # did not wait for the 10 s window
+        assert model.batches == [4]
+        assert [float(e[0]) for e in embeddings] == [0, 1, 2, 3]  # every caller gets its own row
+
+    asyncio.run(scenario())
+
+
+def test_partial_batch_flushes_after_max_wait():
+    async def scenario():
+        model = FakeModel()
+        batcher = EmbeddingBatcher(model, max_batch_size=16, max_wait_ms=30)
+        t0 = time.perf_counter()
+        embeddings = await asyncio.gather(batcher.embed(face(1)), batcher.embed(face(2)))
+        assert time.perf_counter() - t0 >= 0.025
+        assert model.batches == [2]
+        assert [float(e[0]) for e in embeddings] == [1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_leftovers_go_to_the_next_batch():
+    async def scenario():
+        model = FakeModel()
+        batcher = EmbeddingBatcher(model, max_batch_size=3, max_wait_ms=20)
+        embeddings = await asyncio.gather(*(batcher.embed(face(i)) for i in range(5)))
+        assert model.batches == [3, 2]
+        assert [float(e[0]) for e in embeddings] == [0, 1, 2, 3, 4]
+        assert batcher.stats()["queued"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_expired_faces_are_dropped_and_errors_reach_every_caller():
+    async def scenario():
+        model = FakeModel()
+        batcher = EmbeddingBatcher(model, max_batch_size=2, max_wait_ms=10)
+        results = await asyncio.gather(batcher.embed(face(1), deadline=time.monotonic() - 1), batcher.embed(face(2)),
+                                       return_exceptions=True)
+        assert isinstance(results[0], DeadlineExceeded)
+        assert float(results[1][0]) == 2
+        assert model.batches == [1]
+
+        async def failing(batch):
+            raise RuntimeError("model crashed")
+
+        batcher = EmbeddingBatcher(failing, max_batch_size=2, max_wait_ms=10)
+        results = await asyncio.gather(batcher.embed(face(1)), batcher.embed(face(2)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_running_batches_survive_garbage_collection():
+    async def scenario():
+        model = FakeModel(delay=0.02)
+        batcher = EmbeddingBatcher(model, max_batch_size=2, max_wait_ms=10)
+        pending = asyncio.gather(batcher.embed(face(1)), batcher.embed(face(2)))
+        await asyncio.sleep(0.005)
+        assert len(batcher._tasks) == 1  # the batcher holds the running batch
+        gc.collect()
+        embeddings = await asyncio.wait_for(pending, 1.0)
+        assert [float(e[0]) for e in embeddings] == [1, 2]
+        assert not batcher._tasks
+
+    asyncio.run(scenario())
+
+
+def test_invalid_batch_size():
+    with pytest.raises(ValueError):
+        EmbeddingBatcher(FakeModel(), max_batch_size=0)
@@ -0,0 +1,87 @@
+import json
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+DIM = 8
+
+
+def vector(value):
+    return np.full(DIM, value, dtype=np.float32)
+
+
+def test_put_and_get_by_uid_and_hash():
+    cache = EmbeddingCache("", dim=DIM, capacity=4, memory_size=2)
+    cache.put("alice", "h1", vector(1))
+    assert np.array_equal(cache.get("alice", "h1"), vector(1))
+    assert cache.get("alice", "h2") is None  # another photo of the same UID
+    cache.put("alice", "h2", vector(2))
+    assert cache.get("alice", "h1") is None  # the new photo replaced the old vector
+    assert float(cache.get("alice", "h2")[0]) == 2
+    assert len(cache) == 1
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_full_store_evicts_the_oldest_write():
+    cache = EmbeddingCache("", dim=DIM, capacity=3, memory_size=1)
+    evicted = []
+    cache.on_evict = evicted.append
+    for i, uid in enumerate(("a", "b", "c")):
+        cache.put(uid, "h", vector(i))
+    cache.put("a", "h2", vector(9))  # rewriting a UID makes it the newest
+    cache.put("d", "h", vector(3))
+    assert evicted == ["b"]
+    assert cache.get("b", "h") is None
+    assert [uid for uid, _ in cache.items()] == ["c", "a", "d"]
+    # only "d" is still in memory, "c" is read back from its row
+    assert float(cache.get("c", "h")[0]) == 2
+
+
+def test_reload_from_disk(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=DIM, capacity=4, flush_interval=0.01)
+    cache.put("alice", "h1", vector(1))
+    cache.put("bob", "h1", vector(2))
+    cache.remove("bob")
+    cache.close()
+
+    reloaded = EmbeddingCache(str(tmp_path), dim=DIM, capacity=4)
+    assert float(reloaded.get("alice", "h1")[0]) == 1
+    assert reloaded.get("bob", "h1") is None
+    assert len(reloaded) == 1
+    reloaded.close()
+
+
+def test_rows_overwritten_after_the_last_index_write_are_dropped(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=DIM, capacity=4, flush_interval=0.01)
+    cache.put("alice", "h1", vector(1))
+    cache.put("bob", "h1", vector(2))
+    cache.close()
+
+    # a crash after the matrix got alice's new row but before the index was rewritten
+    index = json.loads((tmp_path / "profile_embeddings.json").read_text())
+    vectors = np.load(tmp_path / "profile_embeddings.npy", mmap_mode="r+")
+    vectors[index["alice"]["slot"]] = vector(7)
+    vectors.flush()
+    del vectors
+
+    reloaded = EmbeddingCache(str(tmp_path), dim=DIM, capacity=4)
+    assert reloaded.get("alice", "h1") is None
+    assert float(reloaded.get("bob", "h1")[0]) == 2
+    # the dropped row is free again
+    reloaded.put("carol", "h1", vector(3))
+    reloaded.put("dave", "h1", vector(4))
+    reloaded.put("erin", "h1", vector(5))
+    assert len(reloaded) == 4
+    reloaded.close()
+
+
+def test_mismatched_shape_rebuilds_the_store(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=DIM, capacity=4, flush_interval=0.01)
+    cache.put("alice", "h1", vector(1))
+    cache.close()
+
+    resized = EmbeddingCache(str(tmp_path), dim=DIM, capacity=8)
+    assert len(resized) == 0
+    assert resized.get("alice", "h1") is None
+    resized.close()
@@ -0,0 +1,182 @@
+import numpy as np
+import pytest
+
+from embedding_index import EmbeddingIndex, PartitionedEmbeddingIndex, build_index, normalize
+
+DIM = 16
+
+
+def random_vectors(n, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, DIM)).astype(np.float32)
+
+
+def brute_force(uids, vectors, query, k):
+    distances = 1.0 - normalize(vectors) @ normalize(query)[0]
+    order = np.argsort(distances)[:k]
+    return [uids[i] for i in order]
+
+
+def test_search_matches_brute_force():
+    vectors = random_vectors(200)
+    uids = [f"u{i}" for i in range(200)]
+    index = EmbeddingIndex(DIM, capacity=4)  # grows several times
+    index.add_many(uids, vectors)
+
+    for query in random_vectors(10, seed=1):
+        found = index.search(query, k=5)
+        assert [uid for uid, _ in found] == brute_force(uids, vectors, query, 5)
+        distances = [d for _, d in found]
+        assert distances == sorted(distances)
+
+
+def test_exact_vector_is_at_distance_zero():
+    vectors = random_vectors(20)
+    index = EmbeddingIndex(DIM)
+    index.add_many([f"u{i}" for i in range(20)], vectors)
+    uid, distance = index.search(vectors[7] * 3.0)[0]  # scale does not matter
+    assert uid == "u7"
+    assert distance == pytest.approx(0.0, abs=1e-5)
+
+
+def test_add_replaces_existing_uid():
+    vectors = random_vectors(3)
+    index = EmbeddingIndex(DIM)
+    index.add_many(["a", "b"], vectors[:2])
+    index.add("a", vectors[2])
+    assert len(index) == 2
+    assert index.search(vectors[2])[0] == ("a", pytest.approx(0.0, abs=1e-5))
+    assert dict(index.search(vectors[0], k=2))["a"] > 1e-3  # the old vector is gone
+
+
+def test_remove_then_search_stays_consistent():
+    vectors = random_vectors(50)
+    uids = [f"u{i}" for i in range(50)]
+    index = EmbeddingIndex(DIM)
+    index.add_many(uids, vectors)
+
+    # removing from the middle moves the last row into the hole
+    removed = {"u0", "u17", "u49", "u25"}
+    for uid in removed:
+        assert index.remove(uid)
+    assert not index.remove("u17")
+    assert len(index) == 46
+
+    kept = [i for i, uid in enumerate(uids) if uid not in removed]
+    for i in kept:
+        uid, distance = index.search(vectors[i])[0]
+        assert uid == uids[i]
+        assert distance == pytest.approx(0.0, abs=1e-5)
+    found = {uid for uid, _ in index.search(vectors[0], k=50)}
+    assert found == {uids[i] for i in kept}
+
+
+def test_float16_close_to_float32():
+    vectors = random_vectors(3000)  # more than one upcast block
+    uids = [f"u{i}" for i in range(3000)]
+    exact = EmbeddingIndex(DIM)
+    half = EmbeddingIndex(DIM, dtype="float16")
+    exact.add_many(uids, vectors)
+    half.add_many(uids, vectors)
+    query = random_vectors(1, seed=2)[0]
+    assert half.search(query)[0][0] == exact.search(query)[0][0]
+    assert half.search(query)[0][1] == pytest.approx(exact.search(query)[0][1], abs=1e-2)
+
+
+def test_empty_index_and_invalid_arguments():
+    assert EmbeddingIndex(DIM).search(random_vectors(1)[0], k=3) == []
+    with pytest.raises(ValueError):
+        EmbeddingIndex(DIM, dtype="int8")
+    with pytest.raises(ValueError):
+        EmbeddingIndex(DIM).add_many(["a", "b"], random_vectors(3))
+    with pytest.raises(ValueError):
+        build_index("hnsw")
+
+
+def test_partitioned_is_exact_until_trained():
+    vectors = random_vectors(100)
+    uids = [f"u{i}" for i in range(100)]
+    index = PartitionedEmbeddingIndex(DIM, n_lists=8, n_probe=1)
+    index.add_many(uids, vectors)
+    assert not index.trained
+    query = random_vectors(1, seed=3)[0]
+    assert [uid for uid, _ in index.search(query, k=5)] == brute_force(uids, vectors, query, 5)
+
+
+def test_partitioned_train_keeps_every_profile():
+    vectors = random_vectors(400)
+    uids = [f"u{i}" for i in range(400)]
+    index = PartitionedEmbeddingIndex(DIM, n_lists=16, n_probe=16)
+    index.add_many(uids, vectors)
+    index.train(iterations=5)
+
+    assert index.trained
+    assert len(index._lists) == 16
+    assert sum(len(partition) for partition in index._lists) == 400
+    for uid, list_id in index._list_of.items():
+        assert uid in index._lists[list_id]
+    # probing every partition is an exact search
+    query = random_vectors(1, seed=4)[0]
+    assert [uid for uid, _ in index.search(query, k=10)] == brute_force(uids, vectors, query, 10)
+
+
+def test_partitioned_train_reseeds_empty_partitions():
+    # 4 distinct points for 12 partitions: centroids drawn from the same point
+    # tie, the first one takes every member and the others come out empty
+    vectors = np.repeat(random_vectors(4, seed=5), 50, axis=0)
+    uids = [f"u{i}" for i in range(200)]
+    index = PartitionedEmbeddingIndex(DIM, n_lists=12, n_probe=12)
+    index.add_many(uids, vectors)
+    index.train(iterations=10)
+
+    assert np.all(np.isfinite(index.centroids))
+    assert np.allclose(np.linalg.norm(index.centroids, axis=1), 1.0, atol=1e-5)
+    assert sum(len(partition) for partition in index._lists) == 200
+    for i in (0, 60, 130, 199):
+        assert index.search(vectors[i])[0][1] == pytest.approx(0.0, abs=1e-5)
+
+
+def test_partitioned_moves_and_removes_after_training():
+    vectors = random_vectors(300)
+    uids = [f"u{i}" for i in range(300)]
+    index = PartitionedEmbeddingIndex(DIM, n_lists=10, n_probe=10)
+    index.add_many(uids, vectors)
+    index.train(iterations=5)
+
+    # a new photo for u3 may land in another partition: the old row must go
+    index.add("u3", -vectors[3])
+    assert len(index) == 300
+    assert sum(len(partition) for partition in index._lists) == 300
+    assert index.search(-vectors[3])[0][0] == "u3"
+
+    assert index.remove("u5")
+    assert not index.remove("u5")
+    assert "u5" not in index
+    assert all("u5" not in partition for partition in index._lists)
+    assert "u5" not in {uid for uid, _ in index.search(vectors[5], k=300)}
+
+
+def test_partitioned_train_needs_enough_profiles():
+    index = PartitionedEmbeddingIndex(DIM, n_lists=8)
+    index.add_many(["a", "b"], random_vectors(2))
+    index.train()
+    assert not index.trained
+    assert len(index) == 2
+
+
+def test_partitioned_counts_additions_since_training():
+    vectors = random_vectors(300)
+    uids = [f"u{i}" for i in range(300)]
+    index = PartitionedEmbeddingIndex(DIM, n_lists=10, n_probe=10)
+    index.add_many(uids[:200], vectors[:200])
+    assert index.added_since_training == 200
+    index.train(iterations=5)
+    assert index.added_since_training == 0
+
+    index.add_many(uids[200:], vectors[200:])
+    assert index.added_since_training == 100
+    # retraining re-clusters every profile, including those added after the first training
+    index.train(iterations=5, seed=1)
+    assert index.added_since_training == 0
+    assert sum(len(partition) for partition in index._lists) == 300
+    query = random_vectors(1, seed=6)[0]
+    assert [uid for uid, _ in index.search(query, k=10)] == brute_force(uids, vectors, query, 10)
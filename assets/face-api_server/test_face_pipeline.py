@@ -0,0 +1,118 @@
+import cv2
+import numpy as np
+import pytest
+
+import face_pipeline
+from face_pipeline import bytes_to_rgb_array, decode_memory, jpeg_size, png_size, reduced_decode, to_original_region
+from fast_detector import build_fast_detector
+
+
+def encoded(width, height, ext=".jpg"):
+    image = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    return cv2.imencode(ext, image)[1].tobytes()
+
+
+def test_header_sizes():
+    assert jpeg_size(encoded(1000, 600)) == (1000, 600)
+    assert png_size(encoded(320, 200, ".png")) == (320, 200)
+    assert jpeg_size(encoded(320, 200, ".png")) is None
+    assert png_size(encoded(320, 200)) is None
+    assert jpeg_size(b"\xff\xd8 truncated") is None
+
+
+def test_reduced_decode_picks_the_largest_scale_covering_max_edge():
+    assert reduced_decode((4000, 3000), 640) == (cv2.IMREAD_REDUCED_COLOR_4, 4)  # 1000 px, 1/8 would be 500
+    assert reduced_decode((3000, 6000), 640) == (cv2.IMREAD_REDUCED_COLOR_8, 8)
+    assert reduced_decode((1400, 900), 640) == (cv2.IMREAD_REDUCED_COLOR_2, 2)
+    assert reduced_decode((1000, 600), 640) == (cv2.IMREAD_COLOR, 1)
+    assert reduced_decode((4000, 3000), 0) == (cv2.IMREAD_COLOR, 1)  # full resolution requested
+    assert reduced_decode(None, 640) == (cv2.IMREAD_COLOR, 1)  # not a JPEG
+
+
+def test_decode_resizes_to_max_edge_and_reports_the_scale():
+    raw = encoded(2600, 1300)
+    image, scale = bytes_to_rgb_array(raw, max_edge=640)
+    assert image.shape == (320, 640, 3)
+    assert scale == pytest.approx(2600 / 640, rel=0.01)
+    assert to_original_region([100, 50, 64, 32], scale) == {"x": 406, "y": 203, "w": 260, "h": 130}
+
+    full, scale = bytes_to_rgb_array(raw)
+    assert full.shape == (1300, 2600, 3) and scale == 1.0
+
+    small, scale = bytes_to_rgb_array(encoded(300, 200, ".png"), max_edge=640)
+    assert small.shape == (200, 300, 3) and scale == 1.0
+
+    with pytest.raises(ValueError):
+        bytes_to_rgb_array(b"")
+    with pytest.raises(ValueError):
+        bytes_to_rgb_array(b"not an image", max_edge=640)
+
+
+def test_decode_memory_covers_the_decode():
+    raw = encoded(2600, 1300)
+    # 1/4 scale decode (650x325), resized copy and RGB conversion at 640x320
+    assert decode_memory(raw, 640) == len(raw) + 3 * (650 * 325 + 2 * 640 * 320)
+    assert decode_memory(raw, 0) == len(raw) + 3 * 3 * 2600 * 1300
+    width, height = face_pipeline.UNKNOWN_IMAGE_SIZE
+    assert decode_memory(b"garbage", 0) == len(b"garbage") + 9 * width * height
+
+
+class FakeFastDetector:
+    name = "yunet"
+
+    def __init__(self, *faces):
+        self.faces = faces  # (width, score) of every face above CASCADE_AMBIGUOUS_SCORE
+
+    def detect_faces(self, image, align=True):
+        return [(np.ones((w, w, 3), dtype=np.uint8), [10, 10, w, w], score) for w, score in self.faces]
+
+
+@pytest.fixture
+def full_detector(monkeypatch):
+    """Stand-in for MTCNN finding one face; returns the images it was asked to detect"""
+    calls = []
+
+    def detect_faces(detector, backend, image, align=True):
+        calls.append(image)
+        return [(np.zeros((60, 60, 3), dtype=np.uint8), [5, 5, 60, 60], 0.99)]
+
+    monkeypatch.setattr(face_pipeline, "load_models", lambda: "mtcnn model")
+    monkeypatch.setattr(face_pipeline.FaceDetector, "detect_faces", detect_faces)
+    return calls
+
+
+def test_cascade_decides_a_clear_single_face(monkeypatch, full_detector):
+    monkeypatch.setattr(face_pipeline, "fast_detector", FakeFastDetector((80, 0.97)))
+    face, region, detector = face_pipeline.detect_single_face(np.zeros((480, 640, 3), dtype=np.uint8))
+    assert (region, detector) == ([10, 10, 80, 80], "yunet")
+    assert face.shape == (80, 80, 3)
+    assert full_detector == []
+
+
+@pytest.mark.parametrize("faces", [
+    (),  # no face is never decided by the fast detector
+    ((80, 0.8),),  # not confident enough
+    ((30, 0.97),),  # too small
+    ((80, 0.97), (80, 0.6)),  # a possible second face
+])
+def test_cascade_falls_back_to_the_full_detector(monkeypatch, full_detector, faces):
+    monkeypatch.setattr(face_pipeline, "fast_detector", FakeFastDetector(*faces))
+    _, region, detector = face_pipeline.detect_single_face(np.zeros((480, 640, 3), dtype=np.uint8))
+    assert (region, detector) == ([5, 5, 60, 60], face_pipeline.DETECTOR_BACKEND)
+    assert len(full_detector) == 1
+
+
+def test_cascade_rejects_two_clear_faces(monkeypatch, full_detector):
+    monkeypatch.setattr(face_pipeline, "fast_detector", FakeFastDetector((80, 0.97), (70, 0.95)))
+    with pytest.raises(face_pipeline.MultipleFacesError):
+        face_pipeline.detect_single_face(np.zeros((480, 640, 3), dtype=np.uint8))
+    # the full detector alone when the cascade is off for this call
+    face_pipeline.detect_single_face(np.zeros((480, 640, 3), dtype=np.uint8), cascade=False)
+    assert len(full_detector) == 1
+
+
+def test_missing_fast_detector_model_turns_the_cascade_off(tmp_path):
+    assert build_fast_detector("yunet", str(tmp_path), 0.5) is None
+    assert build_fast_detector("", str(tmp_path), 0.5) is None
+    with pytest.raises(ValueError):
+        build_fast_detector("haar", str(tmp_path), 0.5)
@@ -0,0 +1,59 @@
+import pytest
+
+from metrics import Histogram, Registry
+
+
+def test_counters_and_gauges_render_in_prometheus_text_format():
+    registry = Registry()
+    requests = registry.counter("face_api_requests_total", "Requests by outcome", labelnames=("outcome",))
+    in_flight = registry.gauge("face_api_in_flight", "Requests in flight")
+    requests.labels(outcome="verified").inc()
+    requests.labels(outcome="verified").inc()
+    requests.labels(outcome="no_face").inc()
+    in_flight.inc(3)
+    in_flight.dec()
+
+    assert registry.render() == (
+        "# HELP face_api_requests_total Requests by outcome\n"
+        "# TYPE face_api_requests_total counter\n"
+        'face_api_requests_total{outcome="no_face"} 1\n'
+        'face_api_requests_total{outcome="verified"} 2\n'
+        "# HELP face_api_in_flight Requests in flight\n"
+        "# TYPE face_api_in_flight gauge\n"
+        "face_api_in_flight 2\n"
+    )
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = Registry()
+    seconds = registry.histogram("stage_seconds", "Stage latency", buckets=[0.1, 1], labelnames=("stage",))
+    for value in (0.05, 0.1, 0.5, 3):
+        seconds.labels(stage="embedding").observe(value)
+
+    assert registry.render().splitlines()[2:] == [
+        'stage_seconds_bucket{stage="embedding",le="0.1"} 2',  # le is inclusive
+        'stage_seconds_bucket{stage="embedding",le="1"} 3',
+        'stage_seconds_bucket{stage="embedding",le="+Inf"} 4',
+        'stage_seconds_sum{stage="embedding"} 3.65',
+        'stage_seconds_count{stage="embedding"} 4',
+    ]
+
+
+def test_attached_histograms_and_label_escaping():
+    registry = Registry()
+    batch_sizes = Histogram([1, 8])
+    registry.histogram("batch_size", "Faces per batch", labelnames=("kind",)).attach(batch_sizes, kind="embedding")
+    batch_sizes.observe(4)
+    registry.counter("errors_total", "Errors", labelnames=("detail",)).labels(detail='bad "x"\\\n').inc()
+
+    text = registry.render()
+    assert 'batch_size_bucket{kind="embedding",le="8"} 1' in text
+    assert 'errors_total{detail="bad \\"x\\"\\\\\\n"} 1' in text
+    assert batch_sizes.snapshot() == {"buckets": {"1": 0, "8": 1, "+Inf": 1}, "sum": 4, "count": 1}
+
+
+def test_duplicate_names_are_rejected():
+    registry = Registry()
+    registry.counter("face_api_requests_total", "Requests")
+    with pytest.raises(ValueError):
+        registry.gauge("face_api_requests_total", "Requests")
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+import tensorflow as tf
+from mtcnn.utils.bboxes import generate_bounding_box
+from mtcnn.utils.images import build_scale_pyramid
+
+from onnx_backend import crop_and_resize, pnet_proposals, scale_pyramid
+
+
+def test_crop_and_resize_matches_tensorflow():
+    rng = np.random.default_rng(0)
+    image = rng.uniform(-1, 1, (90, 120, 3)).astype(np.float32)
+    # boxes inside the image, across its border and fully outside it
+    x1, y1 = rng.uniform(-30, 110, 40), rng.uniform(-30, 80, 40)
+    boxes = np.stack([x1, y1, x1 + rng.uniform(5, 60, 40), y1 + rng.uniform(5, 60, 40)], axis=1)
+
+    for size in (24, 48):
+        # the call of mtcnn.utils.images.extract_patches
+        normalized = boxes[:, [1, 0, 3, 2]] / np.asarray([[90, 120, 90, 120]])
+        expected = tf.image.crop_and_resize(image[None], normalized, np.zeros(len(boxes), dtype=int), (size, size)).numpy()
+        assert crop_and_resize(image, boxes, size) == pytest.approx(expected, abs=1e-4)  # float32 rounding
+
+
+def test_pnet_proposals_match_mtcnn():
+    rng = np.random.default_rng(1)
+    bbox_reg = rng.normal(0, 0.1, (1, 30, 40, 4)).astype(np.float32)
+    bbox_class = rng.uniform(0, 1, (1, 30, 40, 2)).astype(np.float32)
+    expected = generate_bounding_box(tf.constant(bbox_reg), tf.constant(bbox_class), 0.6)
+    assert pnet_proposals(bbox_reg, bbox_class, 0.6) == pytest.approx(expected)
+    assert len(pnet_proposals(bbox_reg, np.zeros_like(bbox_class), 0.6)) == 0
+
+
+def test_scale_pyramid_matches_mtcnn():
+    for width, height in ((640, 480), (33, 900), (24, 24)):
+        assert scale_pyramid(width, height, 20, 0.709) == pytest.approx(build_scale_pyramid(width, height, 20, 0.709))
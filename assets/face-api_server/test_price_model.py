@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+
+from price_model import (
+    InvalidRoomsError, PricePredictor, default_model_path, features_from_csv, features_from_rooms, invalid_fields,
+)
+
+ROOM = {"postcode": "1950", "sizeSqm": 18, "rooms": 1, "type": "room", "furnished": True,
+        "amenities": ["Internet", "Laundry"], "proximHessoKm": 1.5}
+WHOLE = {"postcode": "CH-1920", "sizeSqm": 65.5, "rooms": 3, "type": "whole", "amenities": ["Parking"]}
+
+
+def test_features_match_the_app():
+    features = features_from_rooms([ROOM, WHOLE])
+    assert features.dtype == np.float32
+    assert features.tolist() == [
+        [1950, 18, 1, 1.5, 0, 1, 0, 1, 0, 1, 1, 0],
+        [1920, 65.5, 3, 0, 1, 0, 1, 0, 1, 0, 0, 1],  # no proximHessoKm counts as 0 km
+    ]
+
+
+def test_features_from_csv_match_features_from_rooms():
+    columns = {
+        "postal_code": ["1950", "1920"], "surface_m2": ["18", "65.5"], "num_rooms": ["1", "3"],
+        "proxim_hesso_km": ["1.5", "0"], "type": ["room", "entire_home"], "is_furnished": ["True", "False"],
+        "wifi_incl": ["True", "False"], "car_park": ["False", "True"],
+    }
+    assert np.array_equal(features_from_csv(columns), features_from_rooms([ROOM, WHOLE]))
+
+
+def test_invalid_fields():
+    assert invalid_fields(ROOM) == []
+    assert invalid_fields({}) == ["postcode", "sizeSqm", "rooms", "type"]
+    assert invalid_fields({**ROOM, "postcode": "Sion", "sizeSqm": None}) == ["postcode", "sizeSqm"]
+    assert invalid_fields({**ROOM, "type": "studio", "rooms": ""}) == ["rooms", "type"]
+    assert invalid_fields({**ROOM, "rooms": 0}) == []  # 0 is a value, only missing ones are rejected
+
+
+def test_invalid_rooms_are_all_named():
+    with pytest.raises(InvalidRoomsError) as error:
+        features_from_rooms([ROOM, {**ROOM, "type": None}, ROOM, {"sizeSqm": 20}])
+    assert error.value.problems == {1: ["type"], 3: ["postcode", "rooms", "type"]}
+    assert str(error.value) == "Missing or invalid required fields: room 1: type; room 3: postcode, rooms, type"
+
+    many = InvalidRoomsError({i: ["type"] for i in range(12)}, shown=2)
+    assert str(many).endswith("room 1: type; and 10 more rooms")
+
+
+@pytest.mark.skipif(not os.path.exists(default_model_path()), reason="ss2_unistay_price.tflite not found")
+def test_batched_predictions_match_one_room_at_a_time():
+    predictor = PricePredictor(max_batch=3)
+    features = features_from_rooms([ROOM, WHOLE] * 4)
+    prices = predictor.predict(features)
+    assert prices.shape == (8,)
+    assert prices == pytest.approx(np.concatenate([predictor.predict(row[None]) for row in features]), rel=1e-5)
+    assert len(predictor.predict(np.empty((0, 12)))) == 0
@@ -0,0 +1,165 @@
+import asyncio, time
+
+import pytest
+
+from admission import DeadlineExceeded
+from single_flight import SingleFlight, payload_key
+
+
+def test_payload_key_separates_parts():
+    assert payload_key(b"ab", b"c") != payload_key(b"a", b"bc")
+    assert payload_key(b"ab", b"c") == payload_key(b"ab", b"c")
+
+
+def test_concurrent_callers_share_one_computation():
+    async def scenario():
+        flight = SingleFlight(ttl=30)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"verified": True}
+
+        results = await asyncio.gather(*(flight.run("k", compute) for _ in range(5)))
+        assert len(calls) == 1
+        assert sorted(source for _, source in results) == ["coalesced"] * 4 + ["computed"]
+        assert all(result == {"verified": True} for result, _ in results)
+        assert flight.in_flight == 0
+
+        # a retry within the TTL is answered from the result cache
+        result, source = await flight.run("k", compute)
+        assert source == "cached" and len(calls) == 1
+        # another payload is computed on its own
+        _, source = await flight.run("other", compute)
+        assert source == "computed" and len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_failures_are_shared_but_not_cached():
+    async def scenario():
+        flight = SingleFlight(ttl=30)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ValueError("no face")
+
+        results = await asyncio.gather(*(flight.run("k", compute) for _ in range(3)), return_exceptions=True)
+        assert len(calls) == 1
+        assert all(isinstance(result, ValueError) for result in results)
+        with pytest.raises(ValueError):
+            await flight.run("k", compute)
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_results_expire_after_ttl():
+    async def scenario():
+        flight = SingleFlight(ttl=0.05)
+
+        async def compute():
+            return time.monotonic()
+
+        first, _ = await flight.run("k", compute)
+        assert (await flight.run("k", compute)) == (first, "cached")
+        await asyncio.sleep(0.06)
+        second, source = await flight.run("k", compute)
+        assert source == "computed" and second > first
+
+    asyncio.run(scenario())
+
+
+def test_zero_ttl_only_coalesces():
+    async def scenario():
+        flight = SingleFlight(ttl=0)
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            return 1
+
+        sources = [source for _, source in await asyncio.gather(flight.run("k", compute), flight.run("k", compute))]
+        assert sorted(sources) == ["coalesced", "computed"]
+        assert (await flight.run("k", compute))[1] == "computed"
+        assert len(flight.results) == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_the_computation():
+    async def scenario():
+        flight = SingleFlight(ttl=30)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.run("k", compute))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        # the retry joins the computation that is still running
+        assert await flight.run("k", compute) == ("done", "coalesced")
+        assert len(calls) == 1
+
+    asyncio.run(scenario())
+
+
+class Shed(Exception):
+    """A failure that belongs to the caller that started the computation"""
+
+
+def test_joiner_gives_up_at_its_own_deadline():
+    async def scenario():
+        flight = SingleFlight(ttl=30)
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(flight.run("k", compute))
+        await asyncio.sleep(0)
+        with pytest.raises(DeadlineExceeded):
+            await flight.run("k", compute, deadline=time.monotonic() + 0.01)
+        # the computation it waited for is not affected
+        assert await first == ("done", "computed")
+
+        # a caller whose deadline has already passed is not joined
+        with pytest.raises(DeadlineExceeded):
+            await flight.run("other", compute, deadline=time.monotonic() - 1)
+        assert flight.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_private_failures_are_computed_again_by_joiners():
+    async def scenario():
+        flight = SingleFlight(ttl=30)
+        calls = []
+
+        def compute_for(caller, fails):
+            async def compute():
+                calls.append(caller)
+                await asyncio.sleep(0.01)
+                if fails:
+                    raise Shed(caller)
+                return caller
+            return compute
+
+        private = lambda error: isinstance(error, Shed)
+        first = asyncio.ensure_future(flight.run("k", compute_for("first", True), private=private))
+        await asyncio.sleep(0)
+        retry = asyncio.ensure_future(flight.run("k", compute_for("retry", False), private=private))
+        with pytest.raises(Shed):
+            await first
+        # the retry does not get the first caller's failure, it runs its own computation
+        assert await retry == ("retry", "computed")
+        assert calls == ["first", "retry"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+import asyncio, base64, json
+
+import pytest
+
+import token_service
+from token_service import FakeAuth, TTLCache, TokenMinter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(token_service.time, "monotonic", clock)
+    cache = TTLCache()
+    cache.set("alice", True, ttl=600)
+    cache.set("bob", False, ttl=60)
+    clock.now += 61
+    assert cache.get("alice") is True
+    assert cache.get("bob") is None  # negative entries expire first
+    assert cache.get("bob", "default") == "default"
+    assert len(cache) == 1  # the expired entry is dropped on read
+    clock.now += 600
+    assert cache.get("alice") is None
+
+
+def test_ttl_cache_evicts_the_least_recently_used():
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3, ttl=60)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def claims_of(token):
+    payload = token.split(".")[1]
+    return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+
+
+def test_user_lookups_are_cached():
+    async def scenario():
+        auth = FakeAuth(missing_uids={"ghost"})
+        minter = TokenMinter(auth, lookup_mode="sync")
+        token = await minter.mint("alice", {"distance": 0.2, "model": "Facenet512"})
+        await minter.mint("alice")
+        assert auth.lookups == 1
+        assert claims_of(token)["claims"]["verification_distance"] == 0.2
+
+        await minter.mint("ghost")  # unknown users only warn, and are cached too
+        await minter.mint("ghost")
+        assert auth.lookups == 2
+        assert minter.stats()["cached_users"] == 2
+        minter.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_background_lookups_run_once_per_uid():
+    async def scenario():
+        auth = FakeAuth(latency=0.05)
+        minter = TokenMinter(auth, lookup_mode="async")
+        tokens = await asyncio.gather(*(minter.mint("alice") for _ in range(5)))
+        assert all(claims_of(token)["uid"] == "alice" for token in tokens)
+        await asyncio.gather(*minter._background)
+        assert auth.lookups == 1
+        assert minter.known_users.get("alice") is True
+
+        off = TokenMinter(auth, lookup_mode="off")
+        await off.mint("bob")
+        assert auth.lookups == 1
+        minter.shutdown()
+        off.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_invalid_lookup_mode():
+    with pytest.raises(ValueError):
+        TokenMinter(FakeAuth(), lookup_mode="sometimes")
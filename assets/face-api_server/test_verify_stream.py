@@ -0,0 +1,97 @@
+import base64, os
+
+os.environ.setdefault("FACE_API_AUTH_BACKEND", "fake")
+os.environ.setdefault("FACE_API_CACHE_DIR", "")
+
+import numpy as np
+import pytest
+from starlette.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import server
+from face_pipeline import NoFaceError
+
+START = {"filename": "profile_alice.jpg", "img1": "data:image/jpeg;base64," + base64.b64encode(b"profile").decode()}
+
+
+@pytest.fixture
+def scored(monkeypatch):
+    """Fake pipeline: a frame's bytes are its distance, b"no_face" has no face; returns the scored frames"""
+    frames = []
+
+    async def profile_embedding_for(uid, profile_raw, deadline=None):
+        return np.ones((1, 512), dtype=np.float32), False
+
+    async def score_frame(profile_embedding, frame_raw, deadline=None):
+        frames.append(frame_raw)
+        if frame_raw == b"no_face":
+            raise server.pipeline_http_error(NoFaceError("No face detected"))
+        distance = float(frame_raw)
+        return {"verified": distance < 0.3, "distance": distance, "model": "Facenet512"}
+
+    monkeypatch.setattr(server, "profile_embedding_for", profile_embedding_for)
+    monkeypatch.setattr(server, "score_frame", score_frame)
+    return frames
+
+
+def frame_count(outcome):
+    return server.STREAM_FRAMES.labels(outcome=outcome).value
+
+
+def test_stream_stops_at_the_first_verified_frame(scored):
+    before = {outcome: frame_count(outcome) for outcome in ("verified", "not_verified", "no_face")}
+    with TestClient(server.app).websocket_connect("/verify/stream") as websocket:
+        websocket.send_json(START)
+        assert websocket.receive_json() == {"type": "ready", "uid": "alice", "profile_cache": "miss"}
+        for frame in (b"0.8", b"no_face", b"0.1", b"0.05"):
+            websocket.send_bytes(frame)
+
+        assert websocket.receive_json() == {"type": "frame", "frame": 1, "verified": False, "distance": 0.8,
+                                            "model": "Facenet512"}
+        error = websocket.receive_json()
+        assert (error["frame"], error["error"]) == (2, "no_face")
+        assert websocket.receive_json()["verified"]
+        result = websocket.receive_json()
+        assert result["type"] == "result"
+        assert (result["verified"], result["distance"], result["frames"]) == (True, 0.1, 3)
+        assert result["customToken"]
+        with pytest.raises(WebSocketDisconnect):
+            websocket.receive_json()
+
+    assert scored == [b"0.8", b"no_face", b"0.1"]  # the frame sent after the decision is never scored
+    assert frame_count("verified") - before["verified"] == 1
+    assert frame_count("not_verified") - before["not_verified"] == 1
+    assert frame_count("no_face") - before["no_face"] == 1
+
+
+def test_stream_ends_on_end_or_after_max_frames(scored, monkeypatch):
+    with TestClient(server.app).websocket_connect("/verify/stream") as websocket:
+        websocket.send_json(START)
+        websocket.receive_json()
+        # a data URL text frame, then "end"
+        websocket.send_text("data:image/jpeg;base64," + base64.b64encode(b"0.6").decode())
+        websocket.send_text("end")
+        assert websocket.receive_json()["distance"] == 0.6
+        result = websocket.receive_json()
+        assert (result["verified"], result["distance"], result["frames"], result["customToken"]) == (False, 0.6, 1, None)
+
+    monkeypatch.setattr(server, "STREAM_MAX_FRAMES", 2)
+    with TestClient(server.app).websocket_connect("/verify/stream") as websocket:
+        websocket.send_json(START)
+        websocket.receive_json()
+        for frame in (b"0.7", b"0.5", b"0.4"):
+            websocket.send_bytes(frame)
+        for _ in range(2):
+            websocket.receive_json()
+        result = websocket.receive_json()
+        assert (result["verified"], result["distance"], result["frames"]) == (False, 0.5, 2)
+
+
+def test_stream_rejects_an_invalid_start_message(scored):
+    with TestClient(server.app).websocket_connect("/verify/stream") as websocket:
+        websocket.send_json({"filename": "not-a-profile.png", "img1": START["img1"]})
+        assert websocket.receive_json()["error"] == "invalid"
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+        assert closed.value.code == 1008
+    assert scored == []
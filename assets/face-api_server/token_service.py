@@ -0,0 +1,163 @@
+import asyncio, base64, json, time, logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import Histogram, LATENCY_BUCKETS
+
+logger = logging.getLogger("face-api")
+
+USER_LOOKUP_MODES = ("sync", "async", "off")
+
+
+class TTLCache:
+    """Bounded LRU whose entries expire after a per-entry TTL"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._data = OrderedDict()  # key -> (value, expires_at)
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float):
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FakeAuth:
+    """Local stand-in for firebase_admin.auth, for tests and benchmarks without Firebase.
+
+    Every UID exists unless listed in `missing_uids`. Tokens are unsigned JWTs
+    carrying the uid and claims, they are not accepted by Firebase.
+    """
+
+    class UserNotFoundError(Exception):
+        pass
+
+    def __init__(self, missing_uids=(), latency: float = 0.0):
+        self.missing_uids = set(missing_uids)
+        self.latency = latency
+        self.lookups = 0
+
+    def get_user(self, uid: str) -> dict:
+        self.lookups += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if uid in self.missing_uids:
+            raise self.UserNotFoundError(f"No user record found for the provided user ID: {uid}")
+        return {"uid": uid}
+
+    def create_custom_token(self, uid: str, developer_claims: dict = None) -> bytes:
+        header = {"alg": "none", "typ": "JWT"}
+        payload = {"uid": uid, "iat": int(time.time())}
+        if developer_claims:
+            payload["claims"] = developer_claims
+        parts = [base64.urlsafe_b64encode(json.dumps(p).encode()).rstrip(b"=") for p in (header, payload)]
+        return b".".join(parts) + b"."
+
+
+class TokenMinter:
+    """Mints Firebase custom tokens off the event loop.
+
+    Signing uses the service-account key already loaded by firebase_admin, so
+    it is local CPU work run on a small thread pool. The `auth.get_user`
+    existence check only ever produced a warning, so its result is cached
+    (positive and negative) and, depending on `lookup_mode`:
+      - "sync":  awaited before minting (a lookup error fails the login)
+      - "async": run in the background, never delays the response
+      - "off":   skipped
+    """
+
+    def __init__(self, auth_api, lookup_mode: str = "async", cache_size: int = 10000,
+                 ttl: float = 600.0, negative_ttl: float = 60.0, workers: int = 2):
+        if lookup_mode not in USER_LOOKUP_MODES:
+            raise ValueError(f"Invalid user lookup mode '{lookup_mode}', expected one of {USER_LOOKUP_MODES}")
+        self.auth = auth_api
+        self.lookup_mode = lookup_mode
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.known_users = TTLCache(cache_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="token-minter")
+        self._background = set()
+        self._in_flight = set()  # UIDs with a background lookup running
+        self.lookup_seconds = Histogram(LATENCY_BUCKETS)
+        self.mint_seconds = Histogram(LATENCY_BUCKETS)
+
+    def _lookup_user(self, uid: str) -> bool:
+        """Blocking existence check"""
+        try:
+            self.auth.get_user(uid)
+            return True
+        except self.auth.UserNotFoundError:
+            return False
+
+    async def _check_user(self, uid: str):
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        try:
+            exists = await loop.run_in_executor(self._executor, self._lookup_user, uid)
+        except Exception as e:
+            if self.lookup_mode == "sync":
+                raise Exception(f"Error verifying user: {e}")
+            logger.warning(f"⚠️ Background lookup of UID {uid} failed: {e}")
+            return
+        finally:
+            self.lookup_seconds.observe(time.perf_counter() - t0)
+
+        # cache updates stay on the event loop, the TTLCache is not thread-safe
+        self.known_users.set(uid, exists, self.ttl if exists else self.negative_ttl)
+        if not exists:
+            logger.warning(f"⚠️ UID {uid} not found in Firebase Auth, continuing...")
+
+    def _sign(self, uid: str, claims: dict) -> str:
+        try:
+            token = self.auth.create_custom_token(uid, developer_claims=claims)
+        except Exception as e:
+            logger.error(f"❌ Token creation with claims failed: {e}, falling back")
+            token = self.auth.create_custom_token(uid)
+        return token.decode("utf-8") if isinstance(token, bytes) else str(token)
+
+    async def mint(self, uid: str, verification_data: dict = None) -> str:
+        """Create Firebase custom token with optional verification claims"""
+        if self.lookup_mode != "off" and self.known_users.get(uid) is None:
+            if self.lookup_mode == "sync":
+                await self._check_user(uid)
+            elif uid not in self._in_flight:
+                self._in_flight.add(uid)
+                task = asyncio.ensure_future(self._check_user(uid))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+                task.add_done_callback(lambda _: self._in_flight.discard(uid))
+
+        claims = {"authMethod": "face_recognition"}
+        if verification_data:
+            claims.update({
+                "verification_distance": verification_data.get("distance", 0.0),
+                "verification_model": verification_data.get("model", "unknown")
+            })
+
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, self._sign, uid, claims)
+        finally:
+            self.mint_seconds.observe(time.perf_counter() - t0)
+
+    def stats(self) -> dict:
+        return {"lookup_mode": self.lookup_mode, "cached_users": len(self.known_users)}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,75 @@
+import asyncio, logging, multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+logger = logging.getLogger("face-api")
+
+EXECUTOR_BACKENDS = ("thread", "process")
+
+
+class WorkerPool:
+    """Bounded pool of single-slot workers for the CPU-heavy verification stages.
+
+    Each worker is its own one-slot executor so the pool can track how many
+    jobs are queued on every worker and always dispatch to the least loaded one.
+    Every worker runs `initializer` once when it starts. With the "process"
+    backend each worker is a spawned process, so models are loaded exactly
+    once per worker; thread workers share the models of the parent.
+    """
+
+    def __init__(self, backend: str = "thread", size: int = 1, initializer=None):
+        if backend not in EXECUTOR_BACKENDS:
+            raise ValueError(f"Invalid executor backend '{backend}', expected one of {EXECUTOR_BACKENDS}")
+        if size < 1:
+            raise ValueError(f"Worker pool size must be >= 1, got {size}")
+
+        self.backend = backend
+        self._pending = [0] * size
+
+        if backend == "process":
+            # spawn, not fork: TensorFlow does not survive being forked after init
+            ctx = multiprocessing.get_context("spawn")
+            self._executors = [
+                ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=initializer)
+                for _ in range(size)
+            ]
+        else:
+            # threads share the parent's models, `initializer` must make loading idempotent
+            self._executors = [
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"face-worker-{i}", initializer=initializer)
+                for i in range(size)
+            ]
+
+        logger.info(f"✅ Worker pool started: {size} {backend} worker(s)")
+
+    @property
+    def size(self) -> int:
+        return len(self._executors)
+
+    def queue_depths(self) -> list:
+        """Jobs queued or running on each worker"""
+        return list(self._pending)
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the least loaded worker and await its result"""
+        idx = min(range(len(self._pending)), key=self._pending.__getitem__)
+        self._pending[idx] += 1
+        try:
+            future = self._executors[idx].submit(fn, *args)
+            return await asyncio.wrap_future(future)
+        finally:
+            self._pending[idx] -= 1
+
+    async def run_on_each(self, fn, *args) -> list:
+        """Run fn(*args) once on every worker (e.g. warm-up) and return all results"""
+        async def run_on(idx):
+            self._pending[idx] += 1
+            try:
+                return await asyncio.wrap_future(self._executors[idx].submit(fn, *args))
+            finally:
+                self._pending[idx] -= 1
+
+        return await asyncio.gather(*[run_on(i) for i in range(self.size)])
+
+    def shutdown(self):
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
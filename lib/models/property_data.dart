@@ -1,6 +1,7 @@
 import 'package:flutter/material.dart';
 import 'package:cloud_firestore/cloud_firestore.dart';
 import 'package:latlong2/latlong.dart' as ll;
+import 'package:unistay/services/utils.dart';
 
 /// Property data model for rental properties
 class PropertyData {
@@ -51,6 +52,8 @@ class PropertyData {
   });
 
   Map<String, dynamic> toFirestore() {
+    // stored like the import does, so the detail page predicts from the same distance
+    final (nearestCampus, proximHessoKm) = nearestHesSoCampus(position.latitude, position.longitude);
     return {
       'title': title,
       'price': price,
@@ -70,6 +73,8 @@ class PropertyData {
       'ownerUid': ownerUid,
       'photoUrls': photoUrls,  // CHANGED: from 'photos' to 'photoUrls'
       'walkMins': walkMins,
+      'proximHessoKm': proximHessoKm,
+      'nearestCampus': nearestCampus,
       'utilitiesIncluded': utilitiesIncluded,
       'amenities': amenities,
       'availabilityRanges': availabilityRanges.map((range) => {
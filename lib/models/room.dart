@@ -27,6 +27,8 @@ class Room {
   final List<DateTimeRange> availabilityRanges; // Multiple availability ranges
   final List<String> amenities;
   final String status; // 'active' | 'deleted'
+  final double? proximHessoKm; // distance to the nearest HES-SO campus, set by the import/backfill
+  final String? nearestCampus;
 
   Room({
     required this.id,
@@ -53,6 +55,8 @@ class Room {
     this.availabilityRanges = const [],
     this.amenities = const [],
     this.status = 'active',
+    this.proximHessoKm,
+    this.nearestCampus,
   });
 
   // Generate full address string
@@ -172,6 +176,8 @@ class Room {
       availabilityRanges: ranges,
       amenities: (m['amenities'] as List?)?.cast<String>() ?? const [],
       status: (m['status'] ?? 'active') as String,
+      proximHessoKm: (m['proximHessoKm'] as num?)?.toDouble(),
+      nearestCampus: m['nearestCampus'] as String?,
     );
   }
 
@@ -203,6 +209,8 @@ class Room {
       }).toList(),
       'amenities': amenities,
       'status': status,
+      if (proximHessoKm != null) 'proximHessoKm': proximHessoKm,
+      if (nearestCampus != null) 'nearestCampus': nearestCampus,
     };
   }
 }
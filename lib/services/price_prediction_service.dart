@@ -60,7 +60,7 @@ class PricePredictionService {
     // Basic room properties
     final surface = room.sizeSqm.toDouble();
     final numRooms = room.rooms.toDouble();
-    final proxim = 0.0; // Future: distance to campus could be added here
+    final proxim = room.proximHessoKm ?? 0.0; // precomputed by campus_proximity.py
 
     // Property type encoding (one-hot)
     final isEntire = room.type == 'whole';
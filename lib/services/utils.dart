@@ -36,4 +36,29 @@ const Map<String, (double, double)> institutionCoords = {
   'EPAC - École professionnelle des arts contemporains (Saxon)': (46.1381, 7.1747),
   'César Ritz Colleges (Brig)': (46.31900, 7.98950),
   'FFHS / Swiss Distance University (Brig)': (46.31719, 7.98789),
-};
\ No newline at end of file
+};
+
+/// Campuses of [institutionCoords] that `proximHessoKm` is measured to
+/// (same list as CAMPUSES in assets/data_gen/campus_proximity.py)
+const List<String> hesSoCampuses = [
+  'HES-SO Valais-Wallis (Sion - HEI, ingénierie)',
+  'HES-SO Valais-Wallis (Sion - HEdS, santé)',
+  'HES-SO Valais-Wallis (Sierre - HEG, gestion)',
+  'HEdS - Filière Physiothérapie (Loèche-les-Bains)',
+];
+
+/// Nearest HES-SO campus and its distance in km rounded to 0.01, the values
+/// the import stores as `nearestCampus` and `proximHessoKm`
+(String, double) nearestHesSoCampus(double lat, double lng) {
+  var nearest = hesSoCampuses.first;
+  var nearestKm = double.infinity;
+  for (final name in hesSoCampuses) {
+    final (campusLat, campusLng) = institutionCoords[name]!;
+    final km = haversineKm(lat, lng, campusLat, campusLng);
+    if (km < nearestKm) {
+      nearest = name;
+      nearestKm = km;
+    }
+  }
+  return (nearest, (nearestKm * 100).round() / 100);
+}
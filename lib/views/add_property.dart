@@ -8,6 +8,7 @@ import 'package:unistay/widgets/photo_picker_widget.dart';
 import 'package:unistay/widgets/availability_calendar.dart';
 import 'package:unistay/models/room.dart';
 import 'package:unistay/services/price_prediction_service.dart';
+import 'package:unistay/services/utils.dart';
 
 class AddPropertyPage extends StatefulWidget {
   static const route = '/add-property';
@@ -392,6 +393,10 @@ class _AddPropertyPageState extends State<AddPropertyPage> {
     try {
       // Create a temporary Room object to use PricePredictionService
       // This ensures consistency with property detail page
+      final position = vm.position;
+      final (campus, campusKm) = position != null
+          ? nearestHesSoCampus(position.latitude, position.longitude)
+          : (null, null);
       final tempRoom = Room(
         id: '',
         title: vm.titleController.text,
@@ -406,14 +411,16 @@ class _AddPropertyPageState extends State<AddPropertyPage> {
         rooms: int.tryParse(vm.roomsController.text) ?? 1,
         bathrooms: int.tryParse(vm.bathroomsController.text) ?? 1,
         description: vm.descriptionController.text,
-        lat: 0.0,
-        lng: 0.0,
+        lat: position?.latitude ?? 0.0,
+        lng: position?.longitude ?? 0.0,
         ownerUid: '',
         photoUrls: vm.photoUrls,
         walkMins: 10,
         utilitiesIncluded: vm.utilitiesIncluded,
         amenities: vm.selectedAmenities,
         availabilityRanges: vm.availabilityRanges,
+        proximHessoKm: campusKm,
+        nearestCampus: campus,
       );
 
       // Use the same service as property detail page